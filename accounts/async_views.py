@@ -0,0 +1,48 @@
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+from rest_framework.renderers import JSONRenderer
+
+from livraria_api.metricas import medir_serializacao
+from livraria_api.roteamento import aescolher_banco, lendo_de
+
+from .authentication import aauthenticate, jwt_ativo
+from .views import dados_usuario
+
+
+class AsyncAuthenticatedView(View):
+    """
+    Base das views async (ASGI nativas). O APIView do DRF é síncrono e,
+    sob ASGI, cada requisição passaria por sync_to_async; aqui a
+    autenticação e o ORM usam a API async do Django.
+    """
+
+    renderer_class = JSONRenderer
+    # Como LeituraEmReplicaMixin: o banco é escolhido depois da autenticação
+    leitura_em_replica = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await aauthenticate(request)
+        if user is None:
+            response = JsonResponse(
+                {"detail": "As credenciais de autenticação não foram fornecidas ou são inválidas."},
+                status=401
+            )
+            response["WWW-Authenticate"] = "Bearer" if jwt_ativo() else "Token"
+            return response
+
+        request.user = user
+        banco = await aescolher_banco(user.id) if self.leitura_em_replica else None
+        with lendo_de(banco):
+            return await super().dispatch(request, *args, **kwargs)
+
+    def render(self, dados, status=200):
+        # Mesmo renderer das views DRF, para respostas idênticas.
+        with medir_serializacao():
+            conteudo = self.renderer_class().render(dados)
+        return HttpResponse(conteudo, content_type="application/json", status=status)
+
+
+class UserAsyncView(AsyncAuthenticatedView):
+    async def get(self, request):
+        # Só campos que vêm do cache ou das claims do JWT: nenhuma consulta
+        return self.render(dados_usuario(request.user))
@@ -4,13 +4,18 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 class EmailBackend(ModelBackend):
-    def authenticate(self, request, email=None, password=None, **kwargs):
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return None
+    def authenticate(self, request, email=None, password=None, user=None, **kwargs):
+        # `user` permite a quem já buscou o usuário (LoginView) evitar uma
+        # segunda consulta pelo mesmo email.
+        if user is None:
+            try:
+                user = User.objects.get(email=email)
+            except User.DoesNotExist:
+                return None
 
-        if user.check_password(password):
+        # check_password recalcula e salva o hash quando o hasher preferido
+        # ou o custo configurado mudaram (rehash transparente no login).
+        if user.check_password(password) and self.user_can_authenticate(user):
             return user
 
         return None
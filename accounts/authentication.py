@@ -0,0 +1,232 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+def get_cache():
+    return caches[getattr(settings, "ACCOUNTS_TOKEN_CACHE", "default")]
+
+
+def token_cache_key(key):
+    # Guarda só o hash: a chave do token não aparece no backend de cache.
+    return "accounts:token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidar_tokens(keys):
+    get_cache().delete_many([token_cache_key(key) for key in keys])
+
+
+# Campos do usuário guardados no cache da autenticação por token: os que
+# as views leem (request.user.is_superuser, /accounts/me/), nunca o hash
+# da senha. Os sinais em accounts.signals apagam a entrada quando o
+# usuário muda.
+CAMPOS_EM_CACHE = ("id", "is_active", "email", "first_name", "last_name", "is_staff", "is_superuser")
+
+
+def dados_para_cache(user):
+    return {campo: getattr(user, campo) for campo in CAMPOS_EM_CACHE}
+
+
+class UsuarioEmCache:
+    """
+    Usuário de uma autenticação resolvida pelo cache, montado com os
+    CAMPOS_EM_CACHE (nunca o modelo, que carrega o hash da senha). Os
+    demais atributos vêm do usuário lido do banco no primeiro acesso.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, dados):
+        self.__dict__.update(dados)
+        self.pk = self.id
+        self._usuario = None
+
+    def carregar(self):
+        if self._usuario is None:
+            self._usuario = get_user_model()._default_manager.get(pk=self.id)
+        return self._usuario
+
+    def __getattr__(self, nome):
+        # Só chamado para o que não está na instância: os CAMPOS_EM_CACHE
+        # não vão ao banco.
+        if nome.startswith("_"):
+            raise AttributeError(nome)
+        return getattr(self.carregar(), nome)
+
+    def __eq__(self, outro):
+        return self.pk == getattr(outro, "pk", None)
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return self.email
+
+
+def _credenciais_do_cache(key, dados):
+    if not dados["is_active"]:
+        raise AuthenticationFailed("User inactive or deleted.")
+    # Token sem consulta: basta a chave (pk) para o logout apagá-lo.
+    return UsuarioEmCache(dados), Token(key=key, user_id=dados["id"])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication com a resolução token -> usuário em cache por
+    ACCOUNTS_TOKEN_CACHE_TIMEOUT segundos. Em cache hit a autenticação não
+    consulta o banco; os sinais em accounts.signals removem a entrada
+    quando o token é apagado (logout) ou o usuário é alterado. O cache
+    precisa ser compartilhado entre os workers (check livraria_api.E002),
+    senão o logout só valeria no processo que o atendeu.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_cache()
+        cache_key = token_cache_key(key)
+
+        dados = cache.get(cache_key)
+        if dados is not None:
+            return _credenciais_do_cache(key, dados)
+
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key, dados_para_cache(user), getattr(settings, "ACCOUNTS_TOKEN_CACHE_TIMEOUT", 300))
+        return user, token
+
+
+# --- Modo JWT (ACCOUNTS_AUTH_MODE = "jwt") ---------------------------------
+
+# Claims copiadas do usuário para o token, lidas por TokenUser sem ir ao banco.
+CLAIMS_USUARIO = ("email", "first_name", "last_name", "is_staff", "is_superuser")
+
+
+def jwt_ativo():
+    return getattr(settings, "ACCOUNTS_AUTH_MODE", "token") == "jwt"
+
+
+# Instante da emissão com fração de segundo: `iat` é inteiro e não separa
+# um refresh emitido logo antes da troca de senha de um emitido logo depois.
+CLAIM_EMITIDO_EM = "emitido_em"
+
+
+def _copiar_claims(token, user):
+    for claim in CLAIMS_USUARIO:
+        token[claim] = getattr(user, claim)
+
+
+def gerar_tokens_jwt(user):
+    refresh = RefreshToken.for_user(user)
+    refresh[CLAIM_EMITIDO_EM] = time.time()
+    _copiar_claims(refresh, user)
+    return {"access": str(refresh.access_token), "refresh": str(refresh)}
+
+
+def renovar_access(refresh, user):
+    # As claims vêm do usuário atual, não do refresh: uma permissão
+    # retirada depois do login não sobrevive à renovação.
+    access = refresh.access_token
+    _copiar_claims(access, user)
+    return str(access)
+
+
+def _denylist_key(jti):
+    return f"accounts:jwt:revogado:{jti}"
+
+
+def _revogados_antes_key(user_id):
+    return f"accounts:jwt:revogados-antes:{user_id}"
+
+
+def revogar_refresh(refresh):
+    # A entrada expira junto com o token: depois disso ele já seria
+    # recusado pela validação de `exp`, então a denylist não cresce.
+    restante = int(refresh["exp"] - time.time())
+    if restante > 0:
+        get_cache().set(_denylist_key(refresh["jti"]), True, restante)
+
+
+def revogar_refresh_do_usuario(user_id):
+    # Usado na troca de senha: invalida todo refresh emitido até agora.
+    vida = int(jwt_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+    get_cache().set(_revogados_antes_key(user_id), time.time(), vida)
+
+
+def refresh_revogado(refresh):
+    cache = get_cache()
+    if cache.get(_denylist_key(refresh["jti"])):
+        return True
+    revogados_antes = cache.get(_revogados_antes_key(refresh[jwt_settings.USER_ID_CLAIM]))
+    if revogados_antes is None:
+        return False
+    # Refresh sem a claim (emitido antes dela existir): pelo `iat`, em
+    # segundos inteiros, revogado também quando cai no mesmo segundo.
+    return refresh.get(CLAIM_EMITIDO_EM, refresh["iat"]) < revogados_antes
+
+
+class ModeAuthentication(BaseAuthentication):
+    """
+    Autenticação padrão da API: delega para CachedTokenAuthentication ou,
+    com ACCOUNTS_AUTH_MODE = "jwt", para JWTStatelessUserAuthentication,
+    que valida a assinatura do access token e monta um TokenUser a partir
+    das claims, sem consultar banco nem cache.
+    """
+
+    def get_backend(self):
+        if jwt_ativo():
+            return JWTStatelessUserAuthentication()
+        return CachedTokenAuthentication()
+
+    def authenticate(self, request):
+        return self.get_backend().authenticate(request)
+
+    def authenticate_header(self, request):
+        return self.get_backend().authenticate_header(request)
+
+
+async def aauthenticate(request):
+    """
+    Versão async de ModeAuthentication para as views ASGI nativas: usa a
+    API async do cache e do ORM (aget) e devolve o usuário ou None.
+    """
+    if jwt_ativo():
+        # Só valida assinatura e claims; não há I/O para esperar.
+        try:
+            resultado = JWTStatelessUserAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        return resultado[0] if resultado else None
+
+    partes = get_authorization_header(request).split()
+    if len(partes) != 2 or partes[0].lower() != b"token":
+        return None
+    try:
+        key = partes[1].decode()
+    except UnicodeError:
+        return None
+
+    cache = get_cache()
+    cache_key = token_cache_key(key)
+    dados = await cache.aget(cache_key)
+    if dados is not None:
+        try:
+            return _credenciais_do_cache(key, dados)[0]
+        except AuthenticationFailed:
+            return None
+
+    try:
+        token = await Token.objects.select_related("user").aget(key=key)
+    except Token.DoesNotExist:
+        return None
+    if not token.user.is_active:
+        return None
+    await cache.aset(cache_key, dados_para_cache(token.user), getattr(settings, "ACCOUNTS_TOKEN_CACHE_TIMEOUT", 300))
+    return token.user
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def _custo(nome, parametro, padrao):
+    return getattr(settings, nome, {}).get(parametro, padrao)
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """
+    Scrypt com custo definido em ACCOUNTS_SCRYPT. Como must_update() compara
+    os parâmetros do hash salvo com os atuais, mudar o custo faz cada senha
+    ser recalculada no próximo login bem-sucedido.
+    """
+
+    @property
+    def work_factor(self):
+        return _custo("ACCOUNTS_SCRYPT", "work_factor", 2**14)
+
+    @property
+    def block_size(self):
+        return _custo("ACCOUNTS_SCRYPT", "block_size", 8)
+
+    @property
+    def parallelism(self):
+        return _custo("ACCOUNTS_SCRYPT", "parallelism", 1)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2 com custo definido em ACCOUNTS_ARGON2 (requer argon2-cffi)."""
+
+    @property
+    def time_cost(self):
+        return _custo("ACCOUNTS_ARGON2", "time_cost", 2)
+
+    @property
+    def memory_cost(self):
+        return _custo("ACCOUNTS_ARGON2", "memory_cost", 102400)
+
+    @property
+    def parallelism(self):
+        return _custo("ACCOUNTS_ARGON2", "parallelism", 8)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 com número de iterações em ACCOUNTS_PBKDF2."""
+
+    @property
+    def iterations(self):
+        return _custo("ACCOUNTS_PBKDF2", "iterations", hashers.PBKDF2PasswordHasher.iterations)
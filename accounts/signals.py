@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidar_tokens
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def invalidar_token_removido(sender, instance, **kwargs):
+    invalidar_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_tokens_do_usuario(sender, instance, **kwargs):
+    # Troca de senha, desativação etc.: o usuário em cache ficou velho.
+    invalidar_tokens(Token.objects.filter(user_id=instance.pk).values_list("key", flat=True))
@@ -1,3 +1,220 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.authentication import get_cache, token_cache_key
+from livraria_api.checks import cache_dos_tokens
+
+User = get_user_model()
+
+
+class AccountsTestCase(APITestCase):
+    senha = "senha-forte-123"
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="leitor@teste.com", password=self.senha,
+            first_name="Leitor", last_name="Teste"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+
+class CachedTokenAuthenticationTests(AccountsTestCase):
+    def test_cache_hit_nao_consulta_o_banco(self):
+        self.assertEqual(self.client.get("/accounts/me/").status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get("/accounts/me/")
+        self.assertEqual(response.data["email"], self.user.email)
+        self.assertEqual(response.data["name"], "Leitor")
+        self.assertFalse(response.data["bibliotecario"])
+
+    def test_cache_nao_guarda_a_senha(self):
+        self.client.get("/accounts/me/")
+        dados = get_cache().get(token_cache_key(self.token.key))
+        self.assertEqual(dados["id"], self.user.pk)
+        self.assertTrue(dados["is_active"])
+        self.assertNotIn("password", dados)
+        self.assertNotIn(self.user.password, dados.values())
+
+    def test_alterar_usuario_invalida_o_cache(self):
+        self.client.get("/accounts/me/")
+        self.user.first_name = "Outro"
+        self.user.save()
+        self.assertEqual(self.client.get("/accounts/me/").data["name"], "Outro")
+
+    @override_settings(LIVRARIA_PERMITIR_CACHE_LOCAL=False)
+    def test_check_exige_cache_compartilhado(self):
+        self.assertEqual([erro.id for erro in cache_dos_tokens(None)], ["livraria_api.E002"])
+
+    def test_logout_invalida_o_cache(self):
+        self.client.get("/accounts/me/")
+        self.assertEqual(self.client.post("/accounts/logout/").status_code, 200)
+        self.assertEqual(self.client.get("/accounts/me/").status_code, 401)
+
+    def test_alterar_senha_invalida_o_cache(self):
+        self.client.get("/accounts/me/")
+        response = self.client.post("/accounts/alterar-senha/", {
+            "senha_atual": self.senha, "nova_senha": "outra-senha-456"
+        })
+        self.assertEqual(response.status_code, 201)
+
+        # Com o usuário em cache desatualizado, a senha antiga ainda valeria.
+        response = self.client.post("/accounts/alterar-senha/", {
+            "senha_atual": self.senha, "nova_senha": "mais-uma-789"
+        })
+        self.assertEqual(response.status_code, 401)
+
+    def test_usuario_desativado_perde_acesso(self):
+        self.client.get("/accounts/me/")
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/accounts/me/").status_code, 401)
+
+    def test_token_invalido(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalido")
+        self.assertEqual(self.client.get("/accounts/me/").status_code, 401)
+
+
+@override_settings(ACCOUNTS_AUTH_MODE="jwt")
+class JWTAuthenticationTests(AccountsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.credentials()
+        response = self.client.post("/accounts/login/", {"email": self.user.email, "password": self.senha})
+        self.assertEqual(response.status_code, 200)
+        self.tokens = response.data
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+
+    def test_login_retorna_par_access_refresh(self):
+        self.assertEqual(set(self.tokens), {"access", "refresh"})
+
+    def test_requisicao_autenticada_sem_consultar_o_banco(self):
+        with self.assertNumQueries(0):
+            response = self.client.get("/accounts/me/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["email"], self.user.email)
+        self.assertEqual(response.data["name"], "Leitor")
+        self.assertFalse(response.data["bibliotecario"])
+
+    def test_refresh_gera_novo_access(self):
+        response = self.client.post("/accounts/token/refresh/", {"refresh": self.tokens["refresh"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.data)
+
+    def test_logout_revoga_refresh(self):
+        response = self.client.post("/accounts/logout/", {"refresh": self.tokens["refresh"]})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post("/accounts/token/refresh/", {"refresh": self.tokens["refresh"]})
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout_sem_refresh(self):
+        self.assertEqual(self.client.post("/accounts/logout/").status_code, 400)
+
+    def test_alterar_senha_revoga_refresh_anteriores(self):
+        # A troca acontece um segundo depois da emissão do refresh
+        with mock.patch("accounts.authentication.time.time", return_value=time.time() + 1):
+            response = self.client.post("/accounts/alterar-senha/", {
+                "senha_atual": self.senha, "nova_senha": "outra-senha-456"
+            })
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post("/accounts/token/refresh/", {"refresh": self.tokens["refresh"]})
+        self.assertEqual(response.status_code, 401)
+
+    def test_troca_de_senha_no_mesmo_segundo_revoga_o_refresh(self):
+        response = self.client.post("/accounts/alterar-senha/", {
+            "senha_atual": self.senha, "nova_senha": "outra-senha-456"
+        })
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post("/accounts/token/refresh/", {"refresh": self.tokens["refresh"]})
+        self.assertEqual(response.status_code, 401)
+
+        # O refresh emitido depois da troca continua valendo
+        self.client.credentials()
+        novos = self.client.post("/accounts/login/", {"email": self.user.email, "password": "outra-senha-456"}).data
+        response = self.client.post("/accounts/token/refresh/", {"refresh": novos["refresh"]})
+        self.assertEqual(response.status_code, 200)
+
+    def test_refresh_usa_as_permissoes_atuais(self):
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.credentials()
+        tokens = self.client.post("/accounts/login/", {"email": self.user.email, "password": self.senha}).data
+
+        self.user.is_superuser = False
+        self.user.save()
+        response = self.client.post("/accounts/token/refresh/", {"refresh": tokens["refresh"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(AccessToken(response.data["access"])["is_superuser"])
+
+    def test_refresh_de_usuario_desativado(self):
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.post("/accounts/token/refresh/", {"refresh": self.tokens["refresh"]})
+        self.assertEqual(response.status_code, 401)
+
+    def test_token_invalido(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer invalido")
+        self.assertEqual(self.client.get("/accounts/me/").status_code, 401)
+
+
+class LoginTests(AccountsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.credentials()
+
+    def login(self, senha=None, email=None, **extra):
+        return self.client.post("/accounts/login/", {
+            "email": email or self.user.email, "password": senha or self.senha
+        }, **extra)
+
+    def test_login_busca_o_usuario_uma_vez(self):
+        # SELECT do usuário + SELECT do token
+        with self.assertNumQueries(2):
+            response = self.login()
+        self.assertEqual(response.data["token"], self.token.key)
+
+    def test_senha_incorreta(self):
+        self.assertEqual(self.login(senha="errada-123").status_code, 400)
+
+    def test_rehash_para_o_hasher_preferido(self):
+        with self.settings(PASSWORD_HASHERS=["accounts.hashers.PBKDF2PasswordHasher"],
+                           ACCOUNTS_PBKDF2={"iterations": 1000}):
+            self.user.set_password(self.senha)
+            self.user.save()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$1000$"))
+
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("scrypt$16384$"))
+
+    def test_rehash_quando_o_custo_muda(self):
+        with self.settings(ACCOUNTS_SCRYPT={"work_factor": 2**12}):
+            self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("scrypt$4096$"))
+
+    @override_settings(ACCOUNTS_LOGIN_RATES={"email": "2/min"})
+    def test_limite_por_email(self):
+        self.login(senha="errada-123")
+        self.login(senha="errada-123")
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        # Outro email continua liberado
+        self.assertEqual(self.login(email="outro@teste.com").status_code, 400)
+
+    @override_settings(ACCOUNTS_LOGIN_RATES={"ip": "3/min"})
+    def test_limite_por_ip(self):
+        for i in range(3):
+            self.login(email=f"x{i}@teste.com")
+        self.assertEqual(self.login().status_code, 429)
+        self.assertEqual(self.login(REMOTE_ADDR="10.0.0.2").status_code, 200)
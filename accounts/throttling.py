@@ -0,0 +1,75 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+PERIODOS = {"s": 1, "sec": 1, "m": 60, "min": 60, "h": 3600, "hour": 3600, "d": 86400, "day": 86400}
+
+
+def parse_rate(rate):
+    quantidade, periodo = rate.split("/")
+    return int(quantidade), PERIODOS[periodo]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket guardado no cache: cada chave tem até `capacidade` fichas,
+    repostas continuamente à taxa capacidade/período. Uma rajada de até
+    `capacidade` tentativas passa; depois disso só a taxa de reposição.
+
+    A leitura e a escrita do balde não são atômicas entre workers: sob
+    concorrência alta algumas tentativas a mais podem passar, o que é
+    aceitável para um limitador de carga.
+    """
+
+    scope = None
+
+    def get_rate(self):
+        return getattr(settings, "ACCOUNTS_LOGIN_RATES", {}).get(self.scope)
+
+    def get_ident_key(self, request):
+        """Identidade limitada pelo balde; None libera a requisição. Por padrão, o IP."""
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        rate = self.get_rate()
+        if rate is None:
+            return True
+        ident = self.get_ident_key(request)
+        if ident is None:
+            return True
+
+        capacidade, periodo = parse_rate(rate)
+        taxa = capacidade / periodo
+        cache = caches[getattr(settings, "ACCOUNTS_LOGIN_THROTTLE_CACHE", "default")]
+        chave = f"accounts:throttle:{self.scope}:" + hashlib.sha1(ident.encode()).hexdigest()
+
+        agora = time.time()
+        fichas, ultimo = cache.get(chave, (capacidade, agora))
+        fichas = min(capacidade, fichas + (agora - ultimo) * taxa)
+
+        if fichas < 1:
+            self.espera = (1 - fichas) / taxa
+            return False
+
+        cache.set(chave, (fichas - 1, agora), periodo)
+        return True
+
+    def wait(self):
+        return getattr(self, "espera", None)
+
+
+class LoginIPThrottle(TokenBucketThrottle):
+    scope = "ip"
+
+
+class LoginEmailThrottle(TokenBucketThrottle):
+    scope = "email"
+
+    def get_ident_key(self, request):
+        email = request.data.get("email")
+        if not isinstance(email, str) or not email:
+            return None
+        return email.strip().lower()
@@ -1,12 +1,15 @@
 from django.urls import path
-from .views import RegisterView, LoginView, LogoutView, UserView, AlterarSenhaView
+from .async_views import UserAsyncView
+from .views import RegisterView, LoginView, LogoutView, UserView, AlterarSenhaView, RefreshTokenView
 
 urlpatterns = [
     path("register/", RegisterView.as_view()), 
     path("login/", LoginView.as_view()), 
     path("logout/", LogoutView.as_view()), 
+    path("token/refresh/", RefreshTokenView.as_view()),
     path("alterar-senha/", AlterarSenhaView.as_view()),
     path("me/", UserView.as_view()), #rota protegida
+    path("async/me/", UserAsyncView.as_view()),
  
 ]
 
@@ -5,7 +5,13 @@ from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth import get_user_model
 from .serializers import RegisterSerializer
-from rest_framework.authentication import TokenAuthentication
+from .throttling import LoginEmailThrottle, LoginIPThrottle
+from .authentication import (
+    gerar_tokens_jwt, jwt_ativo, refresh_revogado, renovar_access, revogar_refresh, revogar_refresh_do_usuario,
+)
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth.hashers import check_password
 from drf_yasg.utils import swagger_auto_schema
@@ -36,6 +42,8 @@ class RegisterView(APIView):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
+            if jwt_ativo():
+                return Response(gerar_tokens_jwt(user), status=201)
             token, _ = Token.objects.get_or_create(user=user)
             return Response({"token": token.key}, status=201)
         return Response(serializer.errors, status=400)
@@ -44,9 +52,10 @@ class RegisterView(APIView):
 class LoginView(APIView):
     permission_classes = [AllowAny]
     authentication_classes = []
+    throttle_classes = [LoginIPThrottle, LoginEmailThrottle]
 
     @swagger_auto_schema(
-        operation_description="Realiza login e retorna o token.",
+        operation_description="Realiza login e retorna o token (ou o par access/refresh no modo JWT).",
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             required=["email", "password"],
@@ -60,7 +69,8 @@ class LoginView(APIView):
                 type=openapi.TYPE_OBJECT,
                 properties={"token": openapi.Schema(type=openapi.TYPE_STRING)}
             ),
-            400: "Email não encontrado ou senha incorreta"
+            400: "Email não encontrado ou senha incorreta",
+            429: "Muitas tentativas de login"
         }
     )
 
@@ -73,9 +83,11 @@ class LoginView(APIView):
         except User.DoesNotExist:
             return Response({"error": "Email não encontrado"}, status=400)
         
-        user = authenticate(email=user_obj.email, password=password)
+        user = authenticate(request, user=user_obj, password=password)
 
         if user:
+            if jwt_ativo():
+                return Response(gerar_tokens_jwt(user))
             token, _ = Token.objects.get_or_create(user=user)
             #login(request, user)
             return Response({"token": token.key})
@@ -84,15 +96,28 @@ class LoginView(APIView):
     
 
 class LogoutView(APIView):
-    authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated] 
 
     @swagger_auto_schema(
-        operation_description="Realiza logout do usuário autenticado.",
-        responses={200: "Logout realizado com sucesso"}
+        operation_description="Realiza logout do usuário autenticado. No modo JWT, revoga o refresh token enviado.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={"refresh": openapi.Schema(type=openapi.TYPE_STRING)}
+        ),
+        responses={200: "Logout realizado com sucesso", 400: "Refresh token ausente ou inválido"}
     )
 
     def post(self, request):
+        if jwt_ativo():
+            try:
+                refresh = RefreshToken(request.data.get("refresh", ""))
+            except TokenError:
+                return Response({"erro": "Refresh token ausente ou inválido"}, status=400)
+            if str(refresh.get(jwt_settings.USER_ID_CLAIM)) != str(request.user.id):
+                return Response({"erro": "Refresh token ausente ou inválido"}, status=400)
+            revogar_refresh(refresh)
+            return Response({"message": "Logout realizado com sucesso"})
+
         request.auth.delete()
         #logout(request)
         return Response({"message": "Logout realizado com sucesso"})
@@ -101,9 +126,18 @@ class LogoutView(APIView):
 def is_bibliotecario(user):
     return user.is_superuser
 
+
+def dados_usuario(user):
+    return {
+        "id": user.id,
+        "name": user.first_name, 
+        "last_name": user.last_name,
+        "email": user.email,
+        "bibliotecario": is_bibliotecario(user)
+    }
+
 class UserView(APIView):
     
-    authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
@@ -123,23 +157,7 @@ class UserView(APIView):
     )
 
     def get(self, request):
-        user = request.user
-        if is_bibliotecario(user):
-            return Response({
-                "id": user.id,
-                "name": user.first_name, 
-                "last_name": user.last_name,
-                "email": user.email,
-                "bibliotecario": True
-            })
-
-        return Response({
-                "id": user.id,
-                "name": user.first_name, 
-                "last_name": user.last_name,
-                "email": user.email,
-                "bibliotecario": False
-            })
+        return Response(dados_usuario(request.user))
     
 
 class AlterarSenhaView(APIView):
@@ -171,12 +189,58 @@ class AlterarSenhaView(APIView):
             return Response({"erro": "Faltam dados"}, status=400)
         
         user = request.user
+        if not isinstance(user, User):
+            # No modo JWT request.user vem das claims do token
+            user = User.objects.get(pk=user.pk)
 
-        if not check_password(senha_atual, request.user.password):
+        if not check_password(senha_atual, user.password):
             return Response({"erro": "Senha atual incorreta"}, status=401)
         
         user.set_password(nova_senha) 
         user.save()
 
+        if jwt_ativo():
+            revogar_refresh_do_usuario(user.pk)
+
         return Response({"status": "Senha alterada com sucesso!"}, status=201)
 
+
+class RefreshTokenView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    @swagger_auto_schema(
+        operation_description="Modo JWT: troca um refresh token válido e não revogado por um novo access token.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=["refresh"],
+            properties={"refresh": openapi.Schema(type=openapi.TYPE_STRING)}
+        ),
+        responses={
+            200: openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={"access": openapi.Schema(type=openapi.TYPE_STRING)}
+            ),
+            400: "Modo JWT desativado",
+            401: "Refresh token inválido, expirado ou revogado"
+        }
+    )
+
+    def post(self, request):
+        if not jwt_ativo():
+            return Response({"erro": "Modo JWT desativado"}, status=400)
+
+        try:
+            refresh = RefreshToken(request.data.get("refresh", ""))
+        except TokenError:
+            return Response({"erro": "Refresh token inválido ou expirado"}, status=401)
+
+        if refresh_revogado(refresh):
+            return Response({"erro": "Refresh token revogado"}, status=401)
+
+        user = User.objects.filter(pk=refresh[jwt_settings.USER_ID_CLAIM], is_active=True).first()
+        if user is None:
+            return Response({"erro": "Usuário inativo ou removido"}, status=401)
+
+        return Response({"access": renovar_access(refresh, user)})
+
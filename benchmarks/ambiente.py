@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def configurar_django(banco=None):
+    """
+    Inicializa o Django com benchmarks.settings, que aponta o banco
+    `default` para um arquivo SQLite descartável, para que os benchmarks
+    nunca toquem o db.sqlite3 real. Retorna o caminho do banco usado.
+    """
+    if str(RAIZ) not in sys.path:
+        sys.path.insert(0, str(RAIZ))
+
+    if banco is None:
+        fd, banco = tempfile.mkstemp(prefix="bench_", suffix=".sqlite3")
+        os.close(fd)
+    os.environ["LIVRARIA_BENCH_DB"] = banco
+    os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.settings"
+
+    import django
+    django.setup()
+    return banco
+
+
+def remover_banco(banco):
+    for sufixo in ("", "-wal", "-shm", "-journal"):
+        try:
+            os.remove(banco + sufixo)
+        except FileNotFoundError:
+            pass
+
+
+def em_lotes(iteravel, tamanho):
+    lote = []
+    for item in iteravel:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
@@ -0,0 +1,70 @@
+"""
+Custo por requisição da autenticação: token do DRF (uma query por
+requisição), token com cache e JWT sem estado.
+
+    python -m benchmarks.autenticacao --requisicoes 20000
+"""
+import argparse
+import time
+
+from benchmarks.ambiente import configurar_django, remover_banco
+
+
+def medir(nome, autenticador, cabecalho, requisicoes):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    factory = APIRequestFactory()
+    requests = [Request(factory.get("/", HTTP_AUTHORIZATION=cabecalho)) for _ in range(requisicoes)]
+
+    autenticador.authenticate(requests[0])  # aquece o cache, quando houver
+
+    with CaptureQueriesContext(connection) as queries:
+        inicio = time.perf_counter()
+        for request in requests:
+            user, _ = autenticador.authenticate(request)
+        duracao = time.perf_counter() - inicio
+
+    print(f"{nome:<32} {duracao / requisicoes * 1e6:>9.1f} µs/req "
+          f"{len(queries) / requisicoes:>6.2f} queries/req")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requisicoes", type=int, default=20_000)
+    args = parser.parse_args()
+
+    banco = configurar_django()
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test.utils import override_settings
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.authtoken.models import Token
+
+    from accounts.authentication import CachedTokenAuthentication, ModeAuthentication, gerar_tokens_jwt
+    from accounts.models import User
+
+    try:
+        call_command("migrate", verbosity=0)
+        settings.DEBUG = True  # para o CaptureQueriesContext registrar as queries
+        user = User.objects.create_user(
+            email="bench@bench.com", password="senha-forte-123", first_name="Bench", last_name="Mark"
+        )
+        token = Token.objects.create(user=user)
+        access = gerar_tokens_jwt(user)["access"]
+
+        print(f"{args.requisicoes} autenticações por modo\n")
+        medir("token (TokenAuthentication)", TokenAuthentication(), f"Token {token.key}", args.requisicoes)
+        medir("token com cache", CachedTokenAuthentication(), f"Token {token.key}", args.requisicoes)
+        with override_settings(ACCOUNTS_AUTH_MODE="jwt"):
+            medir("jwt sem estado", ModeAuthentication(), f"Bearer {access}", args.requisicoes)
+    finally:
+        connection.close()
+        remover_banco(banco)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Teste de carga sob uvicorn: views síncronas (APIView do DRF) contra as
+variantes async nativas, com alta concorrência. Requer `pip install uvicorn`.
+
+    python -m benchmarks.carga_asgi --concorrencia 200 --duracao 10
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.ambiente import RAIZ, configurar_django, remover_banco
+
+CENARIOS = [
+    ("catálogo paginado", "/livros/?page_size=50", "/livros/async/?page_size=50"),
+    ("meus empréstimos", "/livros/meus-emprestimos/", "/livros/async/meus-emprestimos/"),
+    ("me", "/accounts/me/", "/accounts/async/me/"),
+]
+
+
+def semear(args):
+    from django.core.management import call_command
+    from django.utils import timezone
+    from rest_framework.authtoken.models import Token
+
+    from accounts.models import User
+    from livros.models import Copia, Emprestimo, Livro
+
+    call_command("migrate", verbosity=0)
+    user = User.objects.create_user(
+        email="bench@bench.com", password="senha-forte-123", first_name="Bench", last_name="Mark"
+    )
+    livros = Livro.objects.bulk_create(
+        Livro(titulo=f"Livro {i}", autor=f"Autor {i % 100}", ano=2000) for i in range(args.livros)
+    )
+    copias = Copia.objects.criar_para(livros)
+    Emprestimo.objects.bulk_create(
+        Emprestimo(livro=copia.livro, copia=copia, usuario=user, data_devolucao=timezone.now())
+        for copia in copias[:args.emprestimos]
+    )
+    return Token.objects.create(user=user).key
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(args, banco, porta):
+    env = dict(os.environ, LIVRARIA_BENCH_DB=banco, DJANGO_SETTINGS_MODULE="benchmarks.settings")
+    if args.sem_cache:
+        env["LIVRARIA_BENCH_SEM_CACHE"] = "1"
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "livraria_api.asgi:application",
+         "--port", str(porta), "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        cwd=RAIZ, env=env,
+    )
+    limite = time.time() + 30
+    while time.time() < limite:
+        try:
+            socket.create_connection(("127.0.0.1", porta), timeout=0.2).close()
+            return processo
+        except OSError:
+            if processo.poll() is not None:
+                raise SystemExit("uvicorn não iniciou (está instalado?)")
+            time.sleep(0.1)
+    processo.terminate()
+    raise SystemExit("uvicorn não respondeu em 30s")
+
+
+async def cliente(porta, caminho, token, fim, latencias, erros):
+    reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+    pedido = (
+        f"GET {caminho} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+        f"Authorization: Token {token}\r\n\r\n"
+    ).encode()
+    try:
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            writer.write(pedido)
+            await writer.drain()
+            cabecalho = await reader.readuntil(b"\r\n\r\n")
+            linhas = cabecalho.decode("latin-1").split("\r\n")
+            tamanho = 0
+            for linha in linhas[1:]:
+                nome, _, valor = linha.partition(":")
+                if nome.lower() == "content-length":
+                    tamanho = int(valor)
+            await reader.readexactly(tamanho)
+            latencias.append(time.perf_counter() - inicio)
+            if not linhas[0].split()[1].startswith("2"):
+                erros.append(linhas[0])
+    finally:
+        writer.close()
+
+
+async def carga(porta, caminho, token, concorrencia, duracao):
+    latencias, erros = [], []
+    fim = time.perf_counter() + duracao
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        cliente(porta, caminho, token, fim, latencias, erros) for _ in range(concorrencia)
+    ))
+    total = time.perf_counter() - inicio
+    return latencias, erros, total
+
+
+def relatorio(nome, latencias, erros, total):
+    ordenadas = sorted(latencias)
+    p99 = ordenadas[int(len(ordenadas) * 0.99) - 1] if ordenadas else 0
+    print(f"  {nome:<6} {len(latencias) / total:>9.1f} req/s   "
+          f"p50 {statistics.median(ordenadas) * 1000 if ordenadas else 0:>7.1f} ms   "
+          f"p99 {p99 * 1000:>7.1f} ms   erros {len(erros)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concorrencia", type=int, default=200)
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos por cenário")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--livros", type=int, default=1000)
+    parser.add_argument("--emprestimos", type=int, default=50)
+    parser.add_argument("--sem-cache", action="store_true", help="desliga o cache do catálogo")
+    args = parser.parse_args()
+
+    banco = configurar_django()
+    from django.db import connection
+
+    processo = None
+    try:
+        token = semear(args)
+        connection.close()
+
+        porta = porta_livre()
+        processo = iniciar_servidor(args, banco, porta)
+        print(f"uvicorn com {args.workers} worker(s), {args.concorrencia} conexões, {args.duracao}s por cenário")
+
+        for nome, caminho_sync, caminho_async in CENARIOS:
+            print(f"\n{nome}")
+            for rotulo, caminho in (("sync", caminho_sync), ("async", caminho_async)):
+                relatorio(rotulo, *asyncio.run(carga(porta, caminho, token, args.concorrencia, args.duracao)))
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+        remover_banco(banco)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Aluguéis e devoluções concorrentes no SQLite, com leitores do catálogo
+ao mesmo tempo: o perfil padrão (LIVRARIA_BANCO=sqlite: journal de
+rollback, transações DEFERRED e o timeout de 5 s do módulo sqlite3) contra
+o perfil de produção (LIVRARIA_BANCO=sqlite-producao: WAL, busy_timeout,
+BEGIN IMMEDIATE e conexões persistentes). Cada linha do resultado mostra o
+journal_mode e o modo de transação efetivos do perfil medido.
+
+    python -m benchmarks.escritas_concorrentes --escritores 8 --leitores 4 --duracao 10
+
+Cada perfil roda num processo próprio (o perfil é lido nas settings) e
+cada escritor ou leitor também, para que o GIL não limite a carga.
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.ambiente import RAIZ, configurar_django, remover_banco
+
+PERFIS = ("sqlite", "sqlite-producao")
+
+
+def semear(args):
+    from django.core.management import call_command
+    from rest_framework.authtoken.models import Token
+
+    from accounts.models import User
+    from livros.models import Copia, Livro
+
+    call_command("migrate", verbosity=0)
+    # Cópias de sobra: os conflitos medidos são de lock, não de estoque
+    livros = Livro.objects.bulk_create(
+        Livro(titulo=f"Livro {i}", autor=f"Autor {i}", ano=2000, copias_disponiveis=args.escritores * 2)
+        for i in range(args.livros)
+    )
+    Copia.objects.criar_para(livros)
+    tokens = []
+    for i in range(args.escritores + args.leitores):
+        user = User.objects.create_user(
+            email=f"bench{i}@bench.com", password="senha-forte-123", first_name="Bench", last_name=str(i)
+        )
+        tokens.append(Token.objects.create(user=user).key)
+    return [livro.id for livro in livros], tokens
+
+
+def escritor(token, livro_ids, fim, resultados):
+    from django.db import OperationalError, connections
+    from django.test import Client
+
+    client = Client(headers={"Authorization": f"Token {token}"})
+    contagem, erros = [], []
+    i = 0
+    try:
+        while time.perf_counter() < fim:
+            livro_id = livro_ids[i % len(livro_ids)]
+            i += 1
+            try:
+                response = client.post(f"/livros/{livro_id}/alugar/")
+                if response.status_code != 201:
+                    erros.append(response.status_code)
+                    continue
+                response = client.post(f"/livros/emprestimo/{response.json()['id']}/devolver/")
+                if response.status_code != 200:
+                    erros.append(response.status_code)
+                    continue
+                contagem.append(2)
+            except OperationalError as exc:  # "database is locked"
+                erros.append(str(exc))
+    finally:
+        connections.close_all()
+        resultados.put(("escrita", sum(contagem), erros))
+
+
+def leitor(token, fim, resultados):
+    from django.db import OperationalError, connections
+    from django.test import Client
+
+    client = Client(headers={"Authorization": f"Token {token}"})
+    contagem, erros = [], []
+    try:
+        while time.perf_counter() < fim:
+            try:
+                if client.get("/livros/?page_size=50").status_code == 200:
+                    contagem.append(1)
+            except OperationalError as exc:
+                erros.append(str(exc))
+    finally:
+        connections.close_all()
+        resultados.put(("leitura", sum(contagem), erros))
+
+
+def medir(args):
+    os.environ["LIVRARIA_BANCO"] = args.perfil
+    os.environ["LIVRARIA_BENCH_SEM_CACHE"] = "1"
+    banco = configurar_django()
+    from django.db import connection
+
+    try:
+        livro_ids, tokens = semear(args)
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            journal = cursor.fetchone()[0]
+        transacoes = connection.settings_dict["OPTIONS"].get("transaction_mode") or "DEFERRED"
+        connection.close()
+
+        # fork: os processos herdam o Django já configurado (e nenhuma conexão aberta)
+        contexto = multiprocessing.get_context("fork")
+        resultados = contexto.Queue()
+        fim = time.perf_counter() + args.duracao
+        processos = [
+            contexto.Process(target=escritor, args=(token, livro_ids, fim, resultados))
+            for token in tokens[:args.escritores]
+        ] + [
+            contexto.Process(target=leitor, args=(token, fim, resultados))
+            for token in tokens[args.escritores:]
+        ]
+        inicio = time.perf_counter()
+        for processo in processos:
+            processo.start()
+        medidas = [resultados.get() for _ in processos]
+        for processo in processos:
+            processo.join()
+        duracao = time.perf_counter() - inicio
+
+        escritas = sum(n for tipo, n, _ in medidas if tipo == "escrita")
+        leituras = sum(n for tipo, n, _ in medidas if tipo == "leitura")
+        erros_escrita = [e for tipo, _, erros in medidas if tipo == "escrita" for e in erros]
+        erros_leitura = [e for tipo, _, erros in medidas if tipo == "leitura" for e in erros]
+
+        print(f"{args.perfil:<16} journal {journal:<6} {transacoes:<9}  escritas {escritas / duracao:>8.1f}/s  erros {len(erros_escrita):>5}   "
+              f"leituras {leituras / duracao:>8.1f}/s  erros {len(erros_leitura):>5}")
+        for erro in sorted(set(map(str, erros_escrita + erros_leitura)))[:3]:
+            print(f"{'':<16} ex.: {erro}")
+    finally:
+        remover_banco(banco)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--escritores", type=int, default=8)
+    parser.add_argument("--leitores", type=int, default=4)
+    parser.add_argument("--livros", type=int, default=50)
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos por perfil")
+    parser.add_argument("--perfil", choices=PERFIS, help="roda só este perfil, neste processo")
+    args = parser.parse_args()
+
+    if args.perfil:
+        medir(args)
+        return
+
+    print(f"{args.escritores} escritores (aluga e devolve) e {args.leitores} leitores, {args.duracao}s por perfil\n")
+    for perfil in PERFIS:
+        subprocess.run([sys.executable, "-m", "benchmarks.escritas_concorrentes", *sys.argv[1:], "--perfil", perfil],
+                       cwd=RAIZ, check=True)
+
+
+if __name__ == "__main__":
+    main()
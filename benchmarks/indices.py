@@ -0,0 +1,132 @@
+"""
+Planos de consulta e tempos dos caminhos quentes antes e depois da
+migração de índices (livros 0003).
+
+    python -m benchmarks.indices --livros 1000000 --emprestimos 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks.ambiente import configurar_django, em_lotes, remover_banco
+
+LOTE = 50_000
+
+
+def semear(args):
+    from django.db import connection, transaction
+
+    rnd = random.Random(args.semente)
+    agora = "2025-01-01 00:00:00"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO accounts_user (id, password, is_superuser, first_name, last_name, "
+            "is_staff, is_active, date_joined, email) VALUES (%s, '!', 0, 'Leitor', %s, 0, 1, %s, %s)",
+            [(i, str(i), agora, f"leitor{i}@bench.com") for i in range(1, args.usuarios + 1)],
+        )
+
+        emprestados = args.livros // 10
+        livros = (
+            (i, f"Livro {i}", f"Autor {i % 5000}", 1900 + i % 125, i <= args.livros - emprestados)
+            for i in range(1, args.livros + 1)
+        )
+        for lote in em_lotes(livros, LOTE):
+            cursor.executemany(
+                "INSERT INTO livros_livro (id, titulo, autor, ano, disponivel) VALUES (%s, %s, %s, %s, %s)",
+                lote,
+            )
+
+        # Os últimos 10% dos livros estão emprestados (um empréstimo ativo
+        # cada); o restante do histórico são empréstimos já devolvidos.
+        ativos = min(emprestados, args.emprestimos)
+        emprestimos = (
+            (
+                i,
+                args.livros - i + 1 if i <= ativos else rnd.randint(1, args.livros),
+                rnd.randint(1, args.usuarios),
+                agora,
+                None if i <= ativos else agora,
+            )
+            for i in range(1, args.emprestimos + 1)
+        )
+        for lote in em_lotes(emprestimos, LOTE):
+            cursor.executemany(
+                "INSERT INTO livros_emprestimo (id, livro_id, usuario_id, data_emprestimo, data_devolucao) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                lote,
+            )
+
+
+def consultas(args):
+    from livros.models import Emprestimo, Livro
+
+    # Só as colunas que existem desde a livros 0002, para comparar os
+    # mesmos SELECTs antes e depois das migrações de índices.
+    livros = Livro.objects.values("id", "titulo", "autor", "ano", "disponivel")
+    emprestimos = Emprestimo.objects.values("id", "livro_id", "usuario_id", "data_emprestimo", "data_devolucao")
+    meio = args.livros // 2
+    return {
+        "livros disponíveis, página profunda (LivroListView)":
+            livros.filter(disponivel=True, id__gt=meio).order_by("id")[:50],
+        "livros emprestados (LivroListView ?disponivel=false)":
+            livros.filter(disponivel=False).order_by("id")[:50],
+        "empréstimos pendentes do usuário (ListaEmprestimos)":
+            emprestimos.filter(usuario_id=1, data_devolucao__isnull=True).order_by("id"),
+        "empréstimo ativo do livro (DeletarLivroView)":
+            emprestimos.filter(livro_id=meio, data_devolucao__isnull=True),
+    }
+
+
+def medir(args, rotulo):
+    print(f"\n=== {rotulo} ===")
+    for nome, queryset in consultas(args).items():
+        tempos = []
+        for _ in range(args.repeticoes):
+            inicio = time.perf_counter()
+            list(queryset.all())
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        print(f"\n{nome}: mediana {statistics.median(tempos):.2f} ms")
+        for linha in queryset.explain().splitlines():
+            print(f"    {linha}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--livros", type=int, default=1_000_000)
+    parser.add_argument("--emprestimos", type=int, default=1_000_000)
+    parser.add_argument("--usuarios", type=int, default=10_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--banco", help="Arquivo SQLite a usar (padrão: temporário, removido ao final)")
+    args = parser.parse_args()
+
+    banco = configurar_django(args.banco)
+    from django.core.management import call_command
+    from django.db import connection
+
+    try:
+        call_command("migrate", "livros", "0002", verbosity=0)
+        call_command("migrate", "accounts", verbosity=0)
+        inicio = time.perf_counter()
+        semear(args)
+        print(f"Semeados {args.livros} livros e {args.emprestimos} empréstimos "
+              f"em {time.perf_counter() - inicio:.1f}s")
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        medir(args, "antes (livros 0002)")
+
+        call_command("migrate", "livros", verbosity=0)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        medir(args, "depois (livros 0003 em diante)")
+    finally:
+        connection.close()
+        if args.banco is None:
+            remover_banco(banco)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Linhas por segundo das listagens: serializers do DRF + JSONRenderer
+contra o caminho rápido de livros.serializacao (.values() + dicts +
+FastJSONRenderer).
+
+    python -m benchmarks.serializacao --livros 100000 --emprestimos 100000
+"""
+import argparse
+import time
+
+from benchmarks.ambiente import configurar_django, em_lotes, remover_banco
+
+LOTE = 50_000
+
+
+def semear(args):
+    from django.db import connection, transaction
+
+    agora = "2025-01-01 00:00:00"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO accounts_user (id, password, is_superuser, first_name, last_name, "
+            "is_staff, is_active, date_joined, email) VALUES (1, '!', 0, 'Leitor', 'Bench', 0, 1, %s, %s)",
+            [agora, "leitor@bench.com"],
+        )
+        livros = (
+            (i, f"Livro {i}", f"Autor {i % 5000}", 1900 + i % 125, True, 1, i)
+            for i in range(1, args.livros + 1)
+        )
+        for lote in em_lotes(livros, LOTE):
+            cursor.executemany(
+                "INSERT INTO livros_livro (id, titulo, autor, ano, disponivel, copias_disponiveis, sequencia) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                lote,
+            )
+        # Uma cópia por livro, com o mesmo id
+        cursor.execute("INSERT INTO livros_copia (id, livro_id, disponivel) SELECT id, id, 1 FROM livros_livro")
+        emprestimos = (
+            (i, i % args.livros + 1, i % args.livros + 1, 1, agora, agora) for i in range(1, args.emprestimos + 1)
+        )
+        for lote in em_lotes(emprestimos, LOTE):
+            cursor.executemany(
+                "INSERT INTO livros_emprestimo (id, livro_id, copia_id, usuario_id, data_emprestimo, data_devolucao) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                lote,
+            )
+
+
+def medir(nome, funcao, linhas, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        tamanho = len(funcao())
+        tempos.append(time.perf_counter() - inicio)
+    melhor = min(tempos)
+    print(f"{nome:<40} {linhas / melhor:>12,.0f} linhas/s {tamanho / 1e6:>8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--livros", type=int, default=100_000)
+    parser.add_argument("--emprestimos", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    banco = configurar_django()
+    from django.core.management import call_command
+    from django.db import connection
+    from rest_framework.renderers import JSONRenderer
+
+    from livros.models import Emprestimo, Livro
+    from livros.serializacao import (
+        FastJSONRenderer, emprestimos_dicts, emprestimos_values, livros_dicts, livros_values, orjson
+    )
+    from livros.serializers import EmprestimoSerializer, LivroSerializer
+
+    try:
+        call_command("migrate", verbosity=0)
+        semear(args)
+
+        livros = Livro.objects.order_by("id")
+        emprestimos = Emprestimo.objects.filter(usuario_id=1).select_related("livro").order_by("id")
+
+        print(f"renderer rápido usando {'orjson' if orjson else 'json da stdlib'}\n")
+        medir("livros: LivroSerializer",
+              lambda: JSONRenderer().render(LivroSerializer(livros, many=True).data),
+              args.livros, args.repeticoes)
+        medir("livros: values() + FastJSONRenderer",
+              lambda: FastJSONRenderer().render(livros_dicts(livros_values(livros))),
+              args.livros, args.repeticoes)
+        medir("empréstimos: EmprestimoSerializer",
+              lambda: JSONRenderer().render(EmprestimoSerializer(emprestimos, many=True).data),
+              args.emprestimos, args.repeticoes)
+        medir("empréstimos: values() + FastJSONRenderer",
+              lambda: FastJSONRenderer().render(emprestimos_dicts(emprestimos_values(emprestimos))),
+              args.emprestimos, args.repeticoes)
+    finally:
+        connection.close()
+        remover_banco(banco)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+Settings dos benchmarks: as do projeto com o banco apontado para o arquivo
+descartável em LIVRARIA_BENCH_DB (ver benchmarks.ambiente).
+"""
+import os
+
+from livraria_api.settings import *  # noqa: F401,F403
+from livraria_api.settings import CACHES, DATABASES
+
+DEBUG = False
+ALLOWED_HOSTS = ["*"]
+
+DATABASES["default"]["NAME"] = os.environ["LIVRARIA_BENCH_DB"]
+
+# LIVRARIA_BENCH_SEM_CACHE=1 desliga o cache do catálogo, para medir a view
+# e o banco em vez de só o cache.
+if os.environ.get("LIVRARIA_BENCH_SEM_CACHE"):
+    CACHES["sem_cache"] = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+    LIVROS_CATALOGO_CACHE = "sem_cache"
+
+# A mistura de tráfego (benchmarks.trafego) faz logins em sequência a partir
+# do mesmo IP; limites altos mantêm o custo do throttle sem barrar a carga.
+ACCOUNTS_LOGIN_RATES = {"ip": "1000000/min", "email": "1000000/min"}
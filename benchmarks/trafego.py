@@ -0,0 +1,375 @@
+"""
+Carga com mistura de tráfego realista (busca, catálogo, aluguel,
+devolução, me e login), com relatório por endpoint e comparação com uma
+linha de base.
+
+    python -m benchmarks.trafego --livros 20000 --usuarios 200 --requisicoes 5000
+    python -m benchmarks.trafego --salvar-baseline baseline.json
+    python -m benchmarks.trafego --baseline baseline.json   # sai com erro se regredir
+
+Por padrão as requisições passam pelo cliente WSGI do Django, no mesmo
+processo; com --servidor, um `manage.py runserver` é iniciado sobre o
+mesmo banco e recebe requisições HTTP de verdade. As queries por
+requisição vêm do cabeçalho Server-Timing (livraria_api.metricas).
+
+O req/s de cada endpoint é o inverso da latência média (o que uma conexão
+sustentaria só com ele); o total é o da mistura, em tempo de relógio.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import quote
+
+from benchmarks.ambiente import RAIZ, configurar_django, em_lotes, remover_banco
+
+LOTE = 5000
+SENHA = "senha-forte-123"
+
+PALAVRAS = [
+    "amor", "guerra", "noite", "mar", "cidade", "tempo", "sombra", "rio", "casa", "sol",
+    "memória", "viagem", "silêncio", "vento", "segredo", "jardim", "estrela", "caminho", "fogo", "ilha",
+]
+
+# Parâmetros que mudam os números; a linha de base só é comparável com os mesmos
+CARGA = ("livros", "copias", "usuarios", "emprestimos", "requisicoes", "concorrencia", "semente", "servidor", "sem_cache")
+
+# (endpoint, peso)
+MISTURA = [
+    ("busca", 30),
+    ("catalogo", 30),
+    ("aluguel", 10),
+    ("devolucao", 10),
+    ("me", 15),
+    ("login", 5),
+]
+
+
+def semear(args):
+    """Fábricas em lote: livros (com cópias e índice de busca), usuários com token e histórico."""
+    from django.contrib.auth.hashers import make_password
+    from django.core.management import call_command
+    from django.db import transaction
+    from django.utils import timezone
+    from rest_framework.authtoken.models import Token
+
+    from accounts.models import User
+    from livros.models import Copia, Emprestimo, Livro
+    from livros.search import get_search_backend
+
+    rng = random.Random(args.semente)
+    call_command("migrate", verbosity=0)
+
+    with transaction.atomic():
+        for lote in em_lotes(range(args.livros), LOTE):
+            livros = [
+                Livro(
+                    titulo=f"{rng.choice(PALAVRAS).capitalize()} e {rng.choice(PALAVRAS)} {i}",
+                    autor=f"Autor {i % 500}", ano=1900 + i % 125, copias_disponiveis=args.copias,
+                )
+                for i in lote
+            ]
+            Copia.objects.criar_para(Livro.objects.bulk_create(livros))
+        get_search_backend().rebuild()
+
+        senha = make_password(SENHA)  # um hash só: cada make_password custa dezenas de ms
+        usuarios = User.objects.bulk_create(
+            User(email=f"leitor{i}@bench.com", password=senha, first_name="Leitor", last_name=str(i))
+            for i in range(args.usuarios)
+        )
+        tokens = Token.objects.bulk_create(Token(key=Token.generate_key(), user=u) for u in usuarios)
+
+        # Histórico de empréstimos já devolvidos, espalhado entre os usuários
+        copias = list(Copia.objects.values_list("id", "livro_id")[:args.emprestimos])
+        agora = timezone.now()
+        for lote in em_lotes(range(len(copias)), LOTE):
+            Emprestimo.objects.bulk_create(
+                Emprestimo(
+                    livro_id=copias[i][1], copia_id=copias[i][0],
+                    usuario=usuarios[i % len(usuarios)], data_devolucao=agora,
+                )
+                for i in lote
+            )
+
+    return [(u.email, t.key) for u, t in zip(usuarios, tokens)]
+
+
+class ClienteWSGI:
+    def __init__(self):
+        from django.test import Client
+
+        self.client = Client()
+
+    def pedir(self, metodo, caminho, token=None, corpo=None):
+        cabecalhos = {"Authorization": f"Token {token}"} if token else {}
+        if metodo == "GET":
+            response = self.client.get(caminho, headers=cabecalhos)
+        else:
+            response = self.client.post(caminho, corpo, content_type="application/json", headers=cabecalhos)
+        return response.status_code, response.headers.get("Server-Timing"), response.content
+
+    def fechar(self):
+        from django.db import connections
+
+        connections.close_all()
+
+
+class ConexaoHTTP(http.client.HTTPConnection):
+    def connect(self):
+        # Sem o atraso de Nagle entre cabeçalho e corpo, que somaria ~40 ms
+        super().connect()
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class ClienteHTTP:
+    def __init__(self, porta):
+        self.conexao = ConexaoHTTP("127.0.0.1", porta)
+
+    def pedir(self, metodo, caminho, token=None, corpo=None):
+        cabecalhos = {"Content-Type": "application/json"}
+        if token:
+            cabecalhos["Authorization"] = f"Token {token}"
+        self.conexao.request(metodo, caminho, json.dumps(corpo) if corpo is not None else None, cabecalhos)
+        if hasattr(socket, "TCP_QUICKACK") and self.conexao.sock:
+            # O runserver envia cabeçalho e corpo em escritas separadas; sem
+            # o ACK imediato, o Nagle do servidor espera o ACK atrasado (Linux)
+            self.conexao.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+        response = self.conexao.getresponse()
+        return response.status, response.getheader("Server-Timing"), response.read()
+
+    def fechar(self):
+        self.conexao.close()
+
+
+def queries_de(server_timing):
+    encontrado = re.search(r'desc="(\d+) queries"', server_timing or "")
+    return int(encontrado.group(1)) if encontrado else None
+
+
+class Leitor:
+    """Um usuário simulado: escolhe o próximo endpoint pela mistura e lembra o que alugou."""
+
+    def __init__(self, cliente, credenciais, args, rng):
+        self.cliente = cliente
+        self.email, self.token = credenciais
+        self.args = args
+        self.rng = rng
+        self.emprestimos = []
+
+    def pedido(self, endpoint):
+        rng = self.rng
+        if endpoint == "busca":
+            return "GET", f"/livros/?q={quote(rng.choice(PALAVRAS))}&page_size=20", None
+        if endpoint == "catalogo":
+            return "GET", "/livros/?page_size=50&disponivel=true", None
+        if endpoint == "aluguel":
+            return "POST", f"/livros/{rng.randint(1, self.args.livros)}/alugar/", None
+        if endpoint == "devolucao":
+            return "POST", f"/livros/emprestimo/{self.emprestimos.pop(0)}/devolver/", None
+        if endpoint == "me":
+            return "GET", "/accounts/me/", None
+        return "POST", "/accounts/login/", {"email": self.email, "password": SENHA}
+
+    def executar(self, endpoint):
+        if endpoint == "devolucao" and not self.emprestimos:
+            endpoint = "aluguel"
+        metodo, caminho, corpo = self.pedido(endpoint)
+        token = None if endpoint == "login" else self.token
+
+        inicio = time.perf_counter()
+        status, server_timing, conteudo = self.cliente.pedir(metodo, caminho, token, corpo)
+        latencia = time.perf_counter() - inicio
+
+        if endpoint == "aluguel" and status == 201:
+            self.emprestimos.append(json.loads(conteudo)["id"])
+        return endpoint, status, latencia, queries_de(server_timing)
+
+
+def trabalhador(criar_cliente, credenciais, args, semente, quantidade, resultados):
+    rng = random.Random(semente)
+    cliente = criar_cliente()
+    leitores = [Leitor(cliente, c, args, rng) for c in credenciais]
+    endpoints, pesos = zip(*MISTURA)
+    try:
+        for _ in range(quantidade):
+            resultados.append(rng.choice(leitores).executar(rng.choices(endpoints, pesos)[0]))
+    finally:
+        cliente.fechar()
+
+
+def rodar(criar_cliente, credenciais, args, quantidade, semente):
+    resultados = []
+    threads = [
+        threading.Thread(target=trabalhador, args=(
+            criar_cliente, credenciais[i::args.concorrencia], args, semente + i,
+            quantidade // args.concorrencia, resultados,
+        ))
+        for i in range(args.concorrencia)
+    ]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultados, time.perf_counter() - inicio
+
+
+def percentil(ordenadas, p):
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))]
+
+
+def resumir(resultados):
+    por_endpoint = {}
+    for endpoint, status, latencia, queries in resultados:
+        por_endpoint.setdefault(endpoint, []).append((status, latencia, queries))
+
+    resumo = {}
+    for endpoint, _ in MISTURA:
+        medidas = por_endpoint.get(endpoint)
+        if not medidas:
+            continue
+        latencias = sorted(latencia for _, latencia, _ in medidas)
+        queries = [q for _, _, q in medidas if q is not None]
+        resumo[endpoint] = {
+            "requisicoes": len(medidas),
+            "req_s": len(latencias) / sum(latencias),
+            "p50_ms": statistics.median(latencias) * 1000,
+            "p95_ms": percentil(latencias, 0.95) * 1000,
+            "p99_ms": percentil(latencias, 0.99) * 1000,
+            "queries": statistics.mean(queries) if queries else None,
+            "erros": sum(1 for status, _, _ in medidas if status >= 400),
+        }
+    return resumo
+
+
+def imprimir(resumo, total, duracao):
+    print(f"{'endpoint':<10} {'n':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'erros':>6}")
+    for endpoint, m in resumo.items():
+        queries = f"{m['queries']:.2f}" if m["queries"] is not None else "-"
+        print(f"{endpoint:<10} {m['requisicoes']:>6} {m['req_s']:>9.1f} {m['p50_ms']:>8.2f} "
+              f"{m['p95_ms']:>8.2f} {m['p99_ms']:>8.2f} {queries:>8} {m['erros']:>6}")
+    print(f"\nmistura: {total / duracao:.1f} req/s ({total} requisições em {duracao:.1f}s)")
+
+
+def comparar(resumo, baseline, tolerancia, tolerancia_queries):
+    """Lista as regressões em relação à linha de base."""
+    regressoes = []
+    for endpoint, base in baseline["endpoints"].items():
+        atual = resumo.get(endpoint)
+        if atual is None:
+            continue
+        if atual["p95_ms"] > base["p95_ms"] * (1 + tolerancia):
+            regressoes.append(f"{endpoint}: p95 {atual['p95_ms']:.2f} ms (base {base['p95_ms']:.2f} ms)")
+        if atual["req_s"] < base["req_s"] * (1 - tolerancia):
+            regressoes.append(f"{endpoint}: {atual['req_s']:.1f} req/s (base {base['req_s']:.1f} req/s)")
+        if None not in (atual["queries"], base["queries"]) and (
+            atual["queries"] > base["queries"] * (1 + tolerancia_queries)
+        ):
+            regressoes.append(f"{endpoint}: {atual['queries']:.2f} queries/req (base {base['queries']:.2f})")
+    return regressoes
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_runserver(banco, porta):
+    env = dict(os.environ, LIVRARIA_BENCH_DB=banco, DJANGO_SETTINGS_MODULE="benchmarks.settings")
+    processo = subprocess.Popen(
+        [sys.executable, "manage.py", "runserver", "--noreload", str(porta)],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    limite = time.time() + 30
+    while time.time() < limite:
+        try:
+            socket.create_connection(("127.0.0.1", porta), timeout=0.2).close()
+            return processo
+        except OSError:
+            if processo.poll() is not None:
+                raise SystemExit("runserver não iniciou")
+            time.sleep(0.1)
+    processo.terminate()
+    raise SystemExit("runserver não respondeu em 30s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--livros", type=int, default=20_000)
+    parser.add_argument("--copias", type=int, default=3, help="cópias por livro")
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--emprestimos", type=int, default=20_000, help="histórico de empréstimos devolvidos")
+    parser.add_argument("--requisicoes", type=int, default=5000)
+    parser.add_argument("--aquecimento", type=int, default=200)
+    parser.add_argument("--concorrencia", type=int, default=1)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--servidor", action="store_true", help="usa o runserver em vez do cliente WSGI")
+    parser.add_argument("--sem-cache", action="store_true", help="desliga o cache do catálogo")
+    parser.add_argument("--baseline", help="JSON com a linha de base a comparar")
+    parser.add_argument("--salvar-baseline", help="grava o resultado como nova linha de base")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="piora aceita em p95 e req/s")
+    parser.add_argument("--tolerancia-queries", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.sem_cache:
+        os.environ["LIVRARIA_BENCH_SEM_CACHE"] = "1"
+    banco = configurar_django()
+    from django.db import connection
+
+    processo = None
+    try:
+        credenciais = semear(args)
+        connection.close()
+
+        if args.servidor:
+            porta = porta_livre()
+            processo = iniciar_runserver(banco, porta)
+            criar_cliente = lambda: ClienteHTTP(porta)  # noqa: E731
+        else:
+            criar_cliente = ClienteWSGI
+
+        print(f"{args.livros} livros, {args.usuarios} usuários, {args.concorrencia} conexão(ões), "
+              f"{'runserver' if args.servidor else 'cliente WSGI'}\n")
+        rodar(criar_cliente, credenciais, args, args.aquecimento, args.semente - 1)
+        resultados, duracao = rodar(criar_cliente, credenciais, args, args.requisicoes, args.semente)
+        resumo = resumir(resultados)
+        imprimir(resumo, len(resultados), duracao)
+
+        if args.salvar_baseline:
+            with open(args.salvar_baseline, "w") as arquivo:
+                json.dump({"args": vars(args), "endpoints": resumo}, arquivo, indent=2)
+            print(f"\nlinha de base gravada em {args.salvar_baseline}")
+
+        if args.baseline:
+            with open(args.baseline) as arquivo:
+                baseline = json.load(arquivo)
+            diferentes = [
+                nome for nome in CARGA if baseline.get("args", {}).get(nome) != getattr(args, nome)
+            ]
+            if diferentes:
+                print(f"\natenção: linha de base gerada com outros parâmetros ({', '.join(diferentes)})")
+            regressoes = comparar(resumo, baseline, args.tolerancia, args.tolerancia_queries)
+            if regressoes:
+                print("\nregressões em relação à linha de base:")
+                for regressao in regressoes:
+                    print(f"  {regressao}")
+                raise SystemExit(1)
+            print("\nsem regressões em relação à linha de base")
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+        remover_banco(banco)
+
+
+if __name__ == "__main__":
+    main()
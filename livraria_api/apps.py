@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class LivrariaApiConfig(AppConfig):
+    name = 'livraria_api'
+
+    def ready(self):
+        from . import checks  # noqa: F401
+        from .banco import configurar_conexao
+
+        connection_created.connect(configurar_conexao)
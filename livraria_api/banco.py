@@ -0,0 +1,19 @@
+"""
+Ajustes de cada conexão nova do banco, aplicados pelo sinal
+connection_created (registrado em LivrariaApiConfig.ready).
+
+No SQLite, os PRAGMAs de SQLITE_PRAGMAS valem por conexão (journal_mode=WAL
+fica gravado no arquivo, os demais não), então precisam ser repetidos a
+cada conexão aberta; com CONN_MAX_AGE isso acontece só uma vez por worker.
+"""
+from django.conf import settings
+
+
+def configurar_conexao(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    # Direto na conexão do sqlite3: fora do debug e da instrumentação, que
+    # contariam estas queries na primeira requisição do worker.
+    for nome, valor in pragmas.items():
+        connection.connection.execute(f"PRAGMA {nome} = {valor}")
@@ -0,0 +1,39 @@
+"""
+Checks de sistema da configuração de produção.
+
+Estado que precisa valer para todos os workers (versão do catálogo,
+tokens em cache, revogações) não pode ficar num cache por processo: cada
+worker veria o seu. Fora do DEBUG, os caches usados para isso devem ser
+compartilhados (Redis, Memcached, banco); LIVRARIA_PERMITIR_CACHE_LOCAL
+libera o LocMemCache, por exemplo para um único processo.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+
+def exigir_cache_compartilhado(alias, uso, id):
+    if getattr(settings, "LIVRARIA_PERMITIR_CACHE_LOCAL", False):
+        return []
+    if not isinstance(caches[alias], LocMemCache):
+        return []
+    return [Error(
+        f"O cache '{alias}' ({uso}) é um LocMemCache, separado em cada processo.",
+        hint="Use um backend compartilhado entre os workers (ex.: RedisCache, via LIVRARIA_CACHE_URL) "
+             "ou defina LIVRARIA_PERMITIR_CACHE_LOCAL = True se houver um único processo.",
+        id=id,
+    )]
+
+
+@register(Tags.caches)
+def cache_do_catalogo(app_configs, **kwargs):
+    alias = getattr(settings, "LIVROS_CATALOGO_CACHE", "default")
+    return exigir_cache_compartilhado(alias, "versão e ETag do catálogo", "livraria_api.E001")
+
+
+@register(Tags.caches)
+def cache_dos_tokens(app_configs, **kwargs):
+    # Nos dois modos: tokens em cache (token) ou denylist de refresh (jwt)
+    alias = getattr(settings, "ACCOUNTS_TOKEN_CACHE", "default")
+    return exigir_cache_compartilhado(alias, "tokens e revogações", "livraria_api.E002")
@@ -0,0 +1,247 @@
+"""
+Instrumentação das requisições: para cada view, tempo total, quantidade
+e tempo das queries, tempo de serialização e tamanho da resposta.
+
+Cada resposta sai com o cabeçalho Server-Timing (visível no DevTools do
+navegador) e os valores se acumulam em histogramas expostos em GET
+/metrics, no formato texto do Prometheus. Os histogramas são do
+processo: com vários workers, cada coleta do Prometheus vê um deles.
+
+Requisições com mais queries que o orçamento da view
+(METRICAS_ORCAMENTO_QUERIES_POR_VIEW, ou METRICAS_ORCAMENTO_QUERIES para
+as demais) são registradas no log `livraria_api.metricas` e contadas em
+livraria_orcamento_queries_excedido_total.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_QUERIES = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histograma:
+    def __init__(self, nome, descricao, buckets):
+        self.nome = nome
+        self.descricao = descricao
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observar(self, view, valor):
+        with self.lock:
+            serie = self.series.setdefault(view, {"buckets": [0] * len(self.buckets), "soma": 0, "total": 0})
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie["buckets"][i] += 1
+            serie["soma"] += valor
+            serie["total"] += 1
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        with self.lock:
+            for view, serie in sorted(self.series.items()):
+                for limite, contagem in zip(self.buckets, serie["buckets"]):
+                    linhas.append(f'{self.nome}_bucket{{view="{view}",le="{limite}"}} {contagem}')
+                linhas.append(f'{self.nome}_bucket{{view="{view}",le="+Inf"}} {serie["total"]}')
+                linhas.append(f'{self.nome}_sum{{view="{view}"}} {serie["soma"]}')
+                linhas.append(f'{self.nome}_count{{view="{view}"}} {serie["total"]}')
+        return linhas
+
+
+class Contador:
+    def __init__(self, nome, descricao):
+        self.nome = nome
+        self.descricao = descricao
+        self.valores = {}
+        self.lock = threading.Lock()
+
+    def incrementar(self, view):
+        with self.lock:
+            self.valores[view] = self.valores.get(view, 0) + 1
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} counter"]
+        with self.lock:
+            for view, valor in sorted(self.valores.items()):
+                linhas.append(f'{self.nome}{{view="{view}"}} {valor}')
+        return linhas
+
+
+DURACAO = Histograma("livraria_requisicao_segundos", "Tempo total da requisição.", BUCKETS_SEGUNDOS)
+QUERIES = Histograma("livraria_queries", "Queries executadas por requisição.", BUCKETS_QUERIES)
+TEMPO_DB = Histograma("livraria_db_segundos", "Tempo gasto no banco por requisição.", BUCKETS_SEGUNDOS)
+SERIALIZACAO = Histograma(
+    "livraria_serializacao_segundos", "Tempo de serialização da resposta.", BUCKETS_SEGUNDOS
+)
+TAMANHO = Histograma("livraria_resposta_bytes", "Tamanho do corpo da resposta.", BUCKETS_BYTES)
+ORCAMENTO_EXCEDIDO = Contador(
+    "livraria_orcamento_queries_excedido_total", "Requisições acima do orçamento de queries da view."
+)
+METRICAS = [DURACAO, QUERIES, TEMPO_DB, SERIALIZACAO, TAMANHO, ORCAMENTO_EXCEDIDO]
+
+
+class Coleta:
+    """Medições de uma requisição."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.queries = 0
+        self.tempo_db = 0.0
+        self.serializacao = 0.0
+
+
+# A coleta da requisição atual. Um ContextVar, e não um atributo da
+# conexão, porque nas views async as queries rodam em outras threads
+# (sync_to_async), que herdam o contexto.
+_coleta = contextvars.ContextVar("coleta_metricas", default=None)
+
+
+def medir_query(execute, sql, params, many, context):
+    coleta = _coleta.get()
+    if coleta is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        coleta.queries += 1
+        coleta.tempo_db += time.perf_counter() - inicio
+
+
+def instalar(conexao):
+    if medir_query not in conexao.execute_wrappers:
+        conexao.execute_wrappers.append(medir_query)
+
+
+def instalar_na_conexao(sender, connection, **kwargs):
+    instalar(connection)
+
+
+# Cada conexão aberta depois deste import já nasce medida; as abertas
+# antes são cobertas pelo próprio middleware.
+connection_created.connect(instalar_na_conexao)
+
+
+@contextmanager
+def medir_serializacao():
+    """Soma o tempo do bloco à serialização da requisição atual."""
+    coleta = _coleta.get()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if coleta is not None:
+            coleta.serializacao += time.perf_counter() - inicio
+
+
+def orcamento_de_queries(view):
+    # None, no padrão ou na view, desliga o aviso
+    por_view = getattr(settings, "METRICAS_ORCAMENTO_QUERIES_POR_VIEW", {})
+    if view in por_view:
+        return por_view[view]
+    return getattr(settings, "METRICAS_ORCAMENTO_QUERIES", None)
+
+
+def nome_da_view(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "sem_rota"
+    return getattr(match.func, "view_class", match.func).__name__
+
+
+class MetricasMiddleware:
+    """
+    Deve ser o primeiro do MIDDLEWARE, para que o tempo total inclua os
+    demais. Funciona nos dois modos, sem trocar de thread nas views async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        for conexao in connections.all(initialized_only=True):
+            instalar(conexao)
+        coleta = Coleta()
+        token = _coleta.set(coleta)
+        try:
+            response = self.get_response(request)
+        finally:
+            _coleta.reset(token)
+        return self.registrar(request, response, coleta)
+
+    async def __acall__(self, request):
+        coleta = Coleta()
+        token = _coleta.set(coleta)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _coleta.reset(token)
+        return self.registrar(request, response, coleta)
+
+    def process_template_response(self, request, response):
+        # As respostas do DRF são renderizadas (serializadas para JSON)
+        # logo depois deste hook, que roda por último por ser o middleware
+        # mais externo; o callback fecha a medição.
+        coleta = _coleta.get()
+        if coleta is not None:
+            inicio = time.perf_counter()
+
+            def fim(response):
+                coleta.serializacao += time.perf_counter() - inicio
+
+            response.add_post_render_callback(fim)
+        return response
+
+    def registrar(self, request, response, coleta):
+        total = time.perf_counter() - coleta.inicio
+        view = nome_da_view(request)
+
+        DURACAO.observar(view, total)
+        QUERIES.observar(view, coleta.queries)
+        TEMPO_DB.observar(view, coleta.tempo_db)
+        SERIALIZACAO.observar(view, coleta.serializacao)
+        if not response.streaming:
+            TAMANHO.observar(view, len(response.content))
+
+        orcamento = orcamento_de_queries(view)
+        if orcamento is not None and coleta.queries > orcamento:
+            ORCAMENTO_EXCEDIDO.incrementar(view)
+            logger.warning(
+                "%s %s (%s): %d queries, orçamento de %d",
+                request.method, request.path, view, coleta.queries, orcamento
+            )
+
+        response["Server-Timing"] = ", ".join([
+            f"total;dur={total * 1000:.2f}",
+            f'db;dur={coleta.tempo_db * 1000:.2f};desc="{coleta.queries} queries"',
+            f"serializacao;dur={coleta.serializacao * 1000:.2f}",
+        ])
+        return response
+
+
+def metricas_view(request):
+    permitidos = getattr(settings, "METRICAS_IPS_PERMITIDOS", None)
+    if permitidos is not None and request.META.get("REMOTE_ADDR") not in permitidos:
+        return HttpResponseForbidden()
+    linhas = [linha for metrica in METRICAS for linha in metrica.exportar()]
+    return HttpResponse("\n".join(linhas) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,150 @@
+"""
+Leituras em réplicas com read-your-writes.
+
+As views só de leitura (LeituraEmReplicaMixin: catálogo, empréstimos do
+usuário e /me, e as variantes async com `leitura_em_replica`) leem de uma
+das réplicas em LIVRARIA_REPLICAS; todo o resto, inclusive a
+autenticação dessas views, lê do primário, e as escritas sempre vão
+para ele.
+
+Depois de uma escrita bem-sucedida (qualquer POST/PUT/PATCH/DELETE com
+status < 400), PrimarioAposEscritaMiddleware fixa o usuário no primário
+por LIVRARIA_REPLICA_JANELA segundos, para que ele veja o que acabou de
+escrever mesmo com a réplica atrasada. A marca fica no cache
+LIVRARIA_REPLICA_CACHE, compartilhado entre os workers.
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+METODOS_SEGUROS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+# Banco das leituras da requisição atual; None lê do primário.
+_leitura = contextvars.ContextVar("banco_de_leitura", default=None)
+
+
+def get_replicas():
+    return getattr(settings, "LIVRARIA_REPLICAS", [])
+
+
+def get_janela():
+    return getattr(settings, "LIVRARIA_REPLICA_JANELA", 5)
+
+
+def _cache():
+    return caches[getattr(settings, "LIVRARIA_REPLICA_CACHE", "default")]
+
+
+def _chave(usuario_id):
+    return f"roteamento:primario:{usuario_id}"
+
+
+def fixar_no_primario(usuario_id):
+    if get_replicas():
+        _cache().set(_chave(usuario_id), True, get_janela())
+
+
+async def afixar_no_primario(usuario_id):
+    if get_replicas():
+        await _cache().aset(_chave(usuario_id), True, get_janela())
+
+
+def escolher_banco(usuario_id):
+    """Uma réplica, ou o primário se não houver réplicas ou o usuário escreveu há pouco."""
+    replicas = get_replicas()
+    if not replicas or _cache().get(_chave(usuario_id)):
+        return DEFAULT_DB_ALIAS
+    return random.choice(replicas)
+
+
+async def aescolher_banco(usuario_id):
+    replicas = get_replicas()
+    if not replicas or await _cache().aget(_chave(usuario_id)):
+        return DEFAULT_DB_ALIAS
+    return random.choice(replicas)
+
+
+@contextmanager
+def lendo_de(banco):
+    """Bloco cujas leituras vão para `banco`; usado pelas views async (ver AsyncAuthenticatedView)."""
+    token = _leitura.set(banco)
+    try:
+        yield
+    finally:
+        _leitura.reset(token)
+
+
+def banco_de_leitura():
+    return _leitura.get() or DEFAULT_DB_ALIAS
+
+
+class LeituraEmReplicaMixin:
+    """
+    Para APIViews só de leitura. O banco é escolhido depois da
+    autenticação: o token de um login recém-feito pode ainda não ter
+    chegado à réplica.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _leitura.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _leitura.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        _leitura.set(escolher_banco(request.user.id))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _leitura.get()
+
+    def db_for_write(self, model, **hints):
+        # Explícito: sem isso, salvar uma instância lida da réplica
+        # escreveria na réplica (o Django usaria instance._state.db).
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bancos = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+
+class PrimarioAposEscritaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self.escreveu(request, response):
+            fixar_no_primario(request.user.id)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.escreveu(request, response):
+            await afixar_no_primario(request.user.id)
+        return response
+
+    def escreveu(self, request, response):
+        # request.user é o definido pela autenticação do DRF (ou das views async)
+        if request.method in METODOS_SEGUROS or response.status_code >= 400:
+            return False
+        usuario = getattr(request, "user", None)
+        return usuario is not None and usuario.is_authenticated
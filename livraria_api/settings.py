@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'livraria_api',
     'livros',
     'users', 
     'accounts',
@@ -50,7 +53,7 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.ModeAuthentication',
     ],
 
     'DEFAULT_PERMISSION_CLASSES': [
@@ -60,6 +63,9 @@ REST_FRAMEWORK = {
 
 
 MIDDLEWARE = [
+    # Primeiro, para medir também os demais (Server-Timing e /metrics)
+    'livraria_api.metricas.MetricasMiddleware',
+    'livraria_api.roteamento.PrimarioAposEscritaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -141,12 +147,111 @@ WSGI_APPLICATION = 'livraria_api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Perfil do banco (variável de ambiente LIVRARIA_BANCO):
+#   sqlite           desenvolvimento e testes, configuração padrão do SQLite;
+#   sqlite-producao  WAL, synchronous=NORMAL, mmap/cache maiores, espera por
+#                    locks e conexões persistentes (ver livraria_api.banco);
+#   postgres         PostgreSQL com o pool de conexões do psycopg
+#                    (pip install "psycopg[pool]"), via POSTGRES_* no ambiente.
+LIVRARIA_BANCO = os.environ.get('LIVRARIA_BANCO', 'sqlite')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Banco de teste em arquivo: o SQLite em memória compartilhada não
+        # espera por locks, o que impede testar escritas concorrentes.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+# PRAGMAs aplicados a cada conexão SQLite nova (livraria_api.banco)
+SQLITE_PRAGMAS = {}
+
+if LIVRARIA_BANCO == 'sqlite-producao':
+    SQLITE_PRAGMAS = {
+        # Leitores não bloqueiam o escritor nem são bloqueados por ele
+        'journal_mode': 'WAL',
+        # Em WAL, só o checkpoint sincroniza com o disco; uma queda de
+        # energia pode perder os últimos commits, mas não corrompe o banco
+        'synchronous': 'NORMAL',
+        'busy_timeout': 20000,        # ms esperando o lock de escrita
+        'cache_size': -64000,         # 64 MB por conexão
+        'mmap_size': 268435456,       # 256 MB
+        'temp_store': 'MEMORY',
+    }
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        # BEGIN IMMEDIATE: a transação pega o lock de escrita no início e
+        # espera o busy_timeout, em vez de falhar com "database is locked"
+        # ao tentar promover uma leitura a escrita.
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    })
+elif LIVRARIA_BANCO == 'postgres':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB', 'livraria'),
+        'USER': os.environ.get('POSTGRES_USER', 'livraria'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', '127.0.0.1'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        # Com o pool do psycopg, CONN_MAX_AGE deve ficar em 0
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('POSTGRES_POOL_MIN', 2)),
+                'max_size': int(os.environ.get('POSTGRES_POOL_MAX', 10)),
+                'timeout': 10,
+            },
+        },
     }
+    if os.environ.get('POSTGRES_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.environ['POSTGRES_REPLICA_HOST'],
+            'TEST': {'MIRROR': 'default'},
+        }
+
+# Leituras em réplicas (livraria_api.roteamento): aliases de DATABASES
+# lidos pelas views de listagem, e quantos segundos um usuário lê do
+# primário depois de escrever.
+DATABASE_ROUTERS = ['livraria_api.roteamento.ReplicaRouter']
+LIVRARIA_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+if not LIVRARIA_REPLICAS:
+    # Sem réplica configurada, o alias só existe para os testes de
+    # roteamento, que o ligam com override_settings(LIVRARIA_REPLICAS=...).
+    # Nos testes é um espelho (MIRROR) do banco de teste, sem banco próprio.
+    DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+LIVRARIA_REPLICA_JANELA = 5
+LIVRARIA_REPLICA_CACHE = 'default'
+
+
+# Password hashing
+# O primeiro hasher é usado para senhas novas; os demais só verificam hashes
+# antigos, que são recalculados com o primeiro no próximo login. Para usar
+# Argon2 como padrão, instale argon2-cffi e mova-o para o topo da lista.
+
+PASSWORD_HASHERS = [
+    'accounts.hashers.ScryptPasswordHasher',
+    'accounts.hashers.PBKDF2PasswordHasher',
+    'accounts.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+# Custo dos hashers. Valores maiores deixam cada login mais caro.
+ACCOUNTS_SCRYPT = {'work_factor': 2**14, 'block_size': 8, 'parallelism': 1}
+ACCOUNTS_PBKDF2 = {'iterations': 1_000_000}
+ACCOUNTS_ARGON2 = {'time_cost': 2, 'memory_cost': 102400, 'parallelism': 8}
+
+# Limite de tentativas de login (token bucket: rajada de N, reposição N/período)
+ACCOUNTS_LOGIN_RATES = {
+    'ip': '20/min',
+    'email': '5/min',
 }
+ACCOUNTS_LOGIN_THROTTLE_CACHE = 'default'
 
 
 # Password validation
@@ -189,3 +294,82 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Paginação por cursor do catálogo (GET /livros/?page_size=...)
+LIVROS_PAGE_SIZE = 50
+LIVROS_MAX_PAGE_SIZE = 500
+
+# Cache do catálogo, dos tokens e das revogações. Em produção deve ser
+# compartilhado entre os workers: defina LIVRARIA_CACHE_URL (Redis, ex.:
+# redis://127.0.0.1:6379). Sem ela, o LocMemCache (por processo) só é
+# aceito pelos checks de sistema com LIVRARIA_PERMITIR_CACHE_LOCAL, ligado
+# em DEBUG (ver livraria_api.checks).
+if os.environ.get('LIVRARIA_CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['LIVRARIA_CACHE_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+LIVRARIA_PERMITIR_CACHE_LOCAL = DEBUG
+
+LIVROS_CATALOGO_CACHE = 'default'
+LIVROS_CATALOGO_CACHE_TIMEOUT = 300
+
+# Pub/sub das mudanças de disponibilidade (SSE em GET /livros/eventos/).
+# O InMemoryBroker só alcança as conexões do próprio processo; com vários
+# workers, use o Redis:
+#   LIVROS_EVENTOS_BACKEND = 'livros.eventos.RedisBroker'
+#   LIVROS_EVENTOS_OPTIONS = {'url': 'redis://127.0.0.1:6379'}
+LIVROS_EVENTOS_BACKEND = 'livros.eventos.InMemoryBroker'
+LIVROS_EVENTOS_OPTIONS = {}
+LIVROS_EVENTOS_HEARTBEAT = 15
+
+# Máximo de itens por pedido em POST /livros/alugar/ e /livros/emprestimos/devolver/
+LIVROS_MAX_LOTE = 100
+
+# Prazo de devolução: cada empréstimo sai com data_prevista = agora + prazo
+LIVROS_PRAZO_EMPRESTIMO_DIAS = 14
+
+# Instrumentação (livraria_api.metricas): requisições com mais queries que
+# o orçamento da view (ou o padrão) vão para o log; GET /metrics só
+# responde a estes IPs (None libera para todos).
+METRICAS_ORCAMENTO_QUERIES = 15
+METRICAS_ORCAMENTO_QUERIES_POR_VIEW = {
+    # Desconta o histórico do livro dos resumos e apaga cópias e reservas
+    'DeletarLivroView': 20,
+}
+METRICAS_IPS_PERMITIDOS = ['127.0.0.1', '::1']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Avisos operacionais (ex.: orçamento de queries excedido); os
+        # testes que os provocam de propósito os capturam com assertLogs.
+        'livraria_api': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
+# Modo de autenticação: "token" (rest_framework.authtoken, com cache) ou
+# "jwt" (access/refresh do simplejwt, validados sem acesso ao banco).
+ACCOUNTS_AUTH_MODE = 'token'
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+}
+
+# Cache da autenticação por token (accounts.authentication.CachedTokenAuthentication)
+# e da denylist de refresh tokens do modo JWT
+ACCOUNTS_TOKEN_CACHE = 'default'
+ACCOUNTS_TOKEN_CACHE_TIMEOUT = 300
@@ -4,6 +4,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from .metricas import metricas_view
+
 schema_view = get_schema_view(
    openapi.Info(
       title="API Biblioteca",
@@ -20,6 +22,7 @@ schema_view = get_schema_view(
 urlpatterns = [
     path("accounts/", include("accounts.urls")), 
     path("livros/", include("livros.urls")), 
+    path("metrics", metricas_view),
 
     path('swagger(<format>\.json|\.yaml)', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
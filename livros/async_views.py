@@ -0,0 +1,127 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.exceptions import ValidationError
+
+from accounts.async_views import AsyncAuthenticatedView
+from livraria_api.roteamento import banco_de_leitura, get_janela
+
+from .cache import aget_catalog_version, catalog_cache_key, get_cache, get_etag, get_timeout
+from .eventos import formatar_sse, get_broker
+from .pagination import KeysetPagination
+from .serializacao import (
+    FastJSONRenderer, emprestimo_dict, emprestimos_dicts, emprestimos_values, formatador_de_datas, livro_dict,
+    livros_dicts, livros_values
+)
+from .views import catalogo_queryset, emprestimos_queryset
+
+CHUNK_SIZE = 2000
+
+
+class LivroListAsyncView(AsyncAuthenticatedView):
+    """Variante async de LivroListView, com os mesmos parâmetros e cache."""
+
+    renderer_class = FastJSONRenderer
+    leitura_em_replica = True
+
+    async def get(self, request):
+        versao = await aget_catalog_version()
+        banco = banco_de_leitura()
+        chave = catalog_cache_key(request.GET, versao, banco)
+        etag = get_etag(chave)
+
+        nao_modificado = get_conditional_response(request, etag=etag)
+        if nao_modificado is not None:
+            nao_modificado["ETag"] = etag
+            return nao_modificado
+
+        cache = get_cache()
+        dados = await cache.aget(chave)
+        if dados is None:
+            try:
+                dados = await self.montar_catalogo(request)
+            except ValidationError as exc:
+                return self.render(exc.detail, status=400)
+            timeout = get_timeout() if banco == DEFAULT_DB_ALIAS else min(get_timeout(), get_janela())
+            await cache.aset(chave, dados, timeout)
+
+        response = self.render(dados)
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    async def montar_catalogo(self, request):
+        livros, paginator = catalogo_queryset(request.GET)
+        linhas = livros_values(livros, paginator.ordering)
+
+        if paginator.is_requested(request):
+            pagina = await paginator.apaginate_queryset(linhas, request)
+            return paginator.get_paginated_data(livros_dicts(pagina))
+
+        return [livro_dict(linha) async for linha in linhas.aiterator(chunk_size=CHUNK_SIZE)]
+
+
+class ListaEmprestimosAsyncView(AsyncAuthenticatedView):
+    """Variante async de ListaEmprestimos."""
+
+    renderer_class = FastJSONRenderer
+    leitura_em_replica = True
+
+    async def get(self, request):
+        try:
+            linhas = emprestimos_values(emprestimos_queryset(request.user.id, request.GET.get("status")))
+
+            paginator = KeysetPagination()
+            if paginator.is_requested(request):
+                pagina = await paginator.apaginate_queryset(linhas, request)
+                return self.render(paginator.get_paginated_data(emprestimos_dicts(pagina)))
+        except ValidationError as exc:
+            return self.render(exc.detail, status=400)
+
+        formatar_data = formatador_de_datas()
+        linhas = linhas.order_by("id").aiterator(chunk_size=CHUNK_SIZE)
+        return self.render([emprestimo_dict(linha, formatar_data) async for linha in linhas])
+
+
+
+class EventosDisponibilidadeView(AsyncAuthenticatedView):
+    """
+    Server-sent events com as mudanças de disponibilidade (ver
+    livros.eventos). O cliente carrega o catálogo uma vez e aplica os
+    deltas, em vez de consultar GET /livros/ periodicamente; ao receber
+    `resync` (eventos perdidos), recarrega o catálogo, e ao receber
+    `catalogo` (importação em massa), busca os livros novos em
+    GET /livros/alteracoes/.
+    """
+
+    async def get(self, request):
+        try:
+            livros = self.get_livros(request)
+        except ValueError:
+            return self.render({"erro": "livros deve ser uma lista de ids separados por vírgula."}, status=400)
+
+        response = StreamingHttpResponse(self.stream(livros), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    def get_livros(self, request):
+        valor = request.GET.get("livros", "")
+        return {int(livro_id) for livro_id in valor.split(",") if livro_id.strip()}
+
+    async def stream(self, livros):
+        intervalo = getattr(settings, "LIVROS_EVENTOS_HEARTBEAT", 15)
+
+        broker = get_broker()
+        assinatura = await broker.subscribe(livros)
+        try:
+            # Primeira mensagem: confirma a assinatura e define o intervalo
+            # de reconexão do EventSource.
+            yield "retry: 3000\n\n"
+            while True:
+                evento = await assinatura.proximo(intervalo)
+                # Comentário periódico mantém a conexão viva em proxies.
+                yield ": ping\n\n" if evento is None else formatar_sse(evento)
+        finally:
+            broker.remover(assinatura)
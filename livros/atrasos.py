@@ -0,0 +1,75 @@
+"""
+Marcação dos empréstimos atrasados (`manage.py marcar_atrasados`).
+
+Os empréstimos ativos com a data prevista vencida e ainda não marcados
+recebem `atraso_notificado_em`, em lotes de tamanho fixo, cada um na
+própria transação. Os pendentes são lidos pelo índice parcial
+emprestimo_ativo_prevista_idx, do qual cada empréstimo marcado sai: todo
+lote começa pelo início do índice, sem cursor nem releitura, e o custo de
+uma rodada depende só de quantos venceram desde a anterior, não do
+tamanho da tabela.
+
+Cada lote soma os marcados ao ResumoEmprestimos.atrasados de cada
+usuário, na mesma transação; a devolução de um empréstimo marcado desconta.
+
+Depois do commit de cada lote, o sinal `emprestimos_atrasados` é enviado
+com os ids marcados, para quem for notificar os usuários (e-mail, push).
+"""
+import time
+from collections import Counter
+
+from django.db import connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Emprestimo, ResumoEmprestimos
+
+TAMANHO_LOTE = 1000
+
+# Enviado com sender=Emprestimo e emprestimos=[ids] após cada lote
+emprestimos_atrasados = Signal()
+
+
+def pendentes(agora):
+    return Emprestimo.objects.filter(
+        data_devolucao__isnull=True, atraso_notificado_em__isnull=True, data_prevista__lt=agora
+    ).order_by("data_prevista", "id")
+
+
+def marcar_atrasados(agora=None, tamanho_lote=TAMANHO_LOTE, limite=None, pausa=0):
+    """
+    Marca os empréstimos vencidos até `agora` e retorna quantos foram
+    marcados. `limite` encerra a rodada depois de tantos empréstimos e
+    `pausa` espera entre os lotes, para não disputar o banco com as
+    requisições; o restante fica para a próxima rodada.
+    """
+    agora = agora or timezone.now()
+    total = 0
+
+    while limite is None or total < limite:
+        tamanho = tamanho_lote if limite is None else min(tamanho_lote, limite - total)
+        with transaction.atomic():
+            # As linhas lidas ficam travadas até o UPDATE; as que estão
+            # sendo devolvidas agora são puladas e, se continuarem
+            # ativas, ficam para a próxima rodada.
+            lote = pendentes(agora)
+            if connection.features.has_select_for_update_skip_locked:
+                lote = lote.select_for_update(skip_locked=True)
+            marcados = list(lote.values_list("id", "usuario_id")[:tamanho])
+            if not marcados:
+                break
+            ids = [emprestimo_id for emprestimo_id, _ in marcados]
+            Emprestimo.objects.filter(id__in=ids).update(atraso_notificado_em=agora)
+            por_usuario = Counter(usuario_id for _, usuario_id in marcados)
+            ResumoEmprestimos.objects.aplicar({
+                usuario_id: {"atrasados": quantidade} for usuario_id, quantidade in por_usuario.items()
+            })
+
+        total += len(ids)
+        emprestimos_atrasados.send(sender=Emprestimo, emprestimos=ids)
+        if len(ids) < tamanho:
+            break
+        if pausa:
+            time.sleep(pausa)
+
+    return total
@@ -0,0 +1,82 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+VERSAO_KEY = "livros:catalogo:versao"
+
+# Parâmetros de GET /livros/ que mudam a resposta.
+PARAMETROS = ("q", "page_size", "cursor", "count", "disponivel")
+
+
+def get_cache():
+    return caches[getattr(settings, "LIVROS_CATALOGO_CACHE", "default")]
+
+
+def get_timeout():
+    return getattr(settings, "LIVROS_CATALOGO_CACHE_TIMEOUT", 300)
+
+
+def _agora_ms():
+    return int(time.time() * 1000)
+
+
+def get_catalog_version():
+    """
+    Retorna a versão atual do catálogo. A versão começa no timestamp atual
+    em ms, então um cache reiniciado ou com a chave despejada nunca
+    reaproveita um número de versão antigo.
+
+    Não há Last-Modified: uma data HTTP tem resolução de segundos, e uma
+    alteração no mesmo segundo da leitura anterior renderia um 304
+    desatualizado. A validação é só pelo ETag, derivado da versão.
+    """
+    cache = get_cache()
+    versao = cache.get(VERSAO_KEY)
+    if versao is None:
+        agora = _agora_ms()
+        cache.add(VERSAO_KEY, agora, None)
+        versao = cache.get(VERSAO_KEY, agora)
+    return versao
+
+
+async def aget_catalog_version():
+    cache = get_cache()
+    versao = await cache.aget(VERSAO_KEY)
+    if versao is None:
+        agora = _agora_ms()
+        await cache.aadd(VERSAO_KEY, agora, None)
+        versao = await cache.aget(VERSAO_KEY, agora)
+    return versao
+
+
+def _bump():
+    cache = get_cache()
+    try:
+        cache.incr(VERSAO_KEY)
+    except ValueError:
+        cache.set(VERSAO_KEY, _agora_ms(), None)
+
+
+def bump_catalog_version(using=None):
+    # Invalida já (para a própria requisição que escreveu) e de novo no
+    # commit, descartando o que outro leitor tenha cacheado nesse intervalo.
+    _bump()
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(_bump, using=using)
+
+
+def catalog_cache_key(query_params, versao, banco=DEFAULT_DB_ALIAS):
+    partes = [f"{nome}={query_params.get(nome, '')}" for nome in PARAMETROS]
+    if banco != DEFAULT_DB_ALIAS:
+        # Montado de uma réplica, possivelmente atrasada: não serve a quem
+        # precisa ler do primário.
+        partes.append(f"banco={banco}")
+    digest = hashlib.sha1("&".join(partes).encode()).hexdigest()
+    return f"livros:catalogo:{versao}:{digest}"
+
+
+def get_etag(chave):
+    return '"%s"' % hashlib.sha1(chave.encode()).hexdigest()
@@ -0,0 +1,190 @@
+"""
+Pub/sub das mudanças de disponibilidade, consumido pelo SSE em
+GET /livros/eventos/. As escritas publicam deltas pequenos
+({"livro": id, "disponivel": ..., "copias_disponiveis": ...}) depois do
+commit; cada conexão SSE assina o broker e repassa os deltas ao cliente,
+que assim não precisa reler o catálogo para saber o que mudou.
+
+O broker é configurável (LIVROS_EVENTOS_BACKEND): InMemoryBroker só
+entrega aos assinantes do próprio processo; com vários workers, use o
+RedisBroker (requer o pacote `redis`) para que todos recebam tudo.
+"""
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+CAMPOS = ("id", "disponivel", "copias_disponiveis")
+
+# Evento enviado quando o assinante ficou para trás e perdeu deltas: o
+# cliente deve reler o catálogo.
+RESYNC = {"tipo": "resync"}
+
+
+class Assinatura:
+    def __init__(self, livros=None, tamanho_fila=1000):
+        self.loop = asyncio.get_running_loop()
+        self.fila = asyncio.Queue(maxsize=tamanho_fila)
+        self.livros = set(livros) if livros else None
+
+    def entregar(self, evento):
+        # Roda no loop do assinante (via call_soon_threadsafe).
+        if self.livros is not None and evento.get("livro") not in self.livros:
+            return
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            self.fila.put_nowait(RESYNC)
+
+    async def proximo(self, timeout=None):
+        """Próximo evento, ou None se nada chegar em `timeout` segundos."""
+        try:
+            return await asyncio.wait_for(self.fila.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InMemoryBroker:
+    """
+    Entrega os eventos aos assinantes do processo. `publish` pode ser
+    chamado de qualquer thread (as views síncronas rodam fora do loop).
+    """
+
+    def __init__(self, tamanho_fila=1000):
+        self.tamanho_fila = tamanho_fila
+        self.assinaturas = set()
+        self.lock = threading.Lock()
+
+    def publish(self, eventos):
+        self.distribuir(eventos)
+
+    def distribuir(self, eventos):
+        with self.lock:
+            assinaturas = list(self.assinaturas)
+        for assinatura in assinaturas:
+            for evento in eventos:
+                try:
+                    assinatura.loop.call_soon_threadsafe(assinatura.entregar, evento)
+                except RuntimeError:  # loop já encerrado
+                    self.remover(assinatura)
+                    break
+
+    def remover(self, assinatura):
+        with self.lock:
+            self.assinaturas.discard(assinatura)
+
+    async def subscribe(self, livros=None):
+        """Nova assinatura (só dos `livros` dados, se houver); encerre com `remover`."""
+        assinatura = Assinatura(livros, self.tamanho_fila)
+        with self.lock:
+            self.assinaturas.add(assinatura)
+        await self.iniciar()
+        return assinatura
+
+    async def iniciar(self):
+        pass
+
+
+class RedisBroker(InMemoryBroker):
+    """
+    Publica no canal Redis `canal`; cada processo mantém uma única
+    assinatura do canal e redistribui os eventos aos assinantes locais.
+    """
+
+    def __init__(self, url="redis://127.0.0.1:6379", canal="livros:eventos", tamanho_fila=1000):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("RedisBroker requer o pacote 'redis'.")
+        super().__init__(tamanho_fila)
+        self.url = url
+        self.canal = canal
+        self.cliente = redis.Redis.from_url(url)
+        self.ouvinte = None
+
+    def publish(self, eventos):
+        self.cliente.publish(self.canal, json.dumps(eventos))
+
+    async def iniciar(self):
+        if self.ouvinte is None or self.ouvinte.done():
+            self.ouvinte = asyncio.create_task(self.ouvir())
+
+    async def ouvir(self):
+        import redis.asyncio
+
+        cliente = redis.asyncio.Redis.from_url(self.url)
+        async with cliente.pubsub() as pubsub:
+            await pubsub.subscribe(self.canal)
+            async for mensagem in pubsub.listen():
+                if mensagem["type"] == "message":
+                    self.distribuir(json.loads(mensagem["data"]))
+
+
+_brokers = {}
+
+
+def get_broker():
+    backend = getattr(settings, "LIVROS_EVENTOS_BACKEND", "livros.eventos.InMemoryBroker")
+    if backend not in _brokers:
+        opcoes = getattr(settings, "LIVROS_EVENTOS_OPTIONS", {})
+        _brokers[backend] = import_string(backend)(**opcoes)
+    return _brokers[backend]
+
+
+def evento_livro(livro):
+    if isinstance(livro, dict):
+        return {"livro": livro["id"], "disponivel": livro["disponivel"],
+                "copias_disponiveis": livro["copias_disponiveis"]}
+    return {"livro": livro.id, "disponivel": livro.disponivel, "copias_disponiveis": livro.copias_disponiveis}
+
+
+def publicar(eventos, using=None):
+    # Só depois do commit: quem receber o delta e reler o livro já vê a
+    # mudança. robust=True: uma falha do broker não derruba a requisição.
+    if eventos:
+        transaction.on_commit(lambda: get_broker().publish(eventos), using=using, robust=True)
+
+
+def publicar_disponibilidade(livros, using=None):
+    """
+    Publica o estado atual de `livros`: instâncias de Livro ou um queryset,
+    lido só no commit (para escritas feitas com update(), que não
+    devolvem os valores novos).
+    """
+    if isinstance(livros, (list, tuple)):
+        publicar([evento_livro(livro) for livro in livros], using)
+        return
+
+    def ler_e_publicar():
+        eventos = [evento_livro(linha) for linha in livros.values(*CAMPOS)]
+        if eventos:
+            get_broker().publish(eventos)
+
+    transaction.on_commit(ler_e_publicar, using=using, robust=True)
+
+
+def publicar_remocao(livro_id, using=None):
+    publicar([{"livro": livro_id, "removido": True}], using)
+
+
+def publicar_catalogo(novos, using=None):
+    """
+    Um único evento `catalogo` para uma carga em massa (importação), em
+    vez de um delta por livro, que encheria a fila de cada assinante e
+    forçaria um resync. O cliente busca os livros novos em
+    GET /livros/alteracoes/. Assinantes filtrados por livros não o
+    recebem: os livros novos não estão no filtro deles.
+    """
+    publicar([{"tipo": "catalogo", "novos": novos}], using)
+
+
+def formatar_sse(evento):
+    tipo = evento.get("tipo", "disponibilidade")
+    dados = json.dumps({k: v for k, v in evento.items() if k != "tipo"}, separators=(",", ":"))
+    return f"event: {tipo}\ndata: {dados}\n\n"
@@ -0,0 +1,59 @@
+import csv
+from datetime import datetime
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializacao import CAMPOS_LIVRO, formatador_de_datas
+
+FORMATOS = {
+    "ndjson": "application/x-ndjson; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+}
+CHUNK_SIZE = 2000
+
+CAMPOS_EMPRESTIMO = (
+    "id", "livro_id", "livro__titulo", "copia_id", "usuario_id", "usuario__email",
+    "data_emprestimo", "data_devolucao", "data_prevista",
+)
+
+
+class _Eco:
+    # csv.writer escreve nesta "pseudo-arquivo", que só devolve a linha.
+    def write(self, valor):
+        return valor
+
+
+def _linhas(queryset, campos, chunk_size):
+    # As datas saem no mesmo formato da API (EmprestimoSerializer), tanto
+    # no NDJSON quanto no CSV.
+    formatar_data = formatador_de_datas()
+    for valores in queryset.order_by("id").values_list(*campos).iterator(chunk_size=chunk_size):
+        yield [formatar_data(v) if isinstance(v, datetime) else v for v in valores]
+
+
+def gerar_ndjson(queryset, campos, chunk_size=CHUNK_SIZE):
+    encoder = JSONEncoder(ensure_ascii=False)
+    bloco = []
+    for valores in _linhas(queryset, campos, chunk_size):
+        bloco.append(encoder.encode(dict(zip(campos, valores))))
+        if len(bloco) >= chunk_size:
+            yield "\n".join(bloco) + "\n"
+            bloco = []
+    if bloco:
+        yield "\n".join(bloco) + "\n"
+
+
+def gerar_csv(queryset, campos, chunk_size=CHUNK_SIZE):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(campos)
+    bloco = []
+    for valores in _linhas(queryset, campos, chunk_size):
+        bloco.append(escritor.writerow(valores))
+        if len(bloco) >= chunk_size:
+            yield "".join(bloco)
+            bloco = []
+    if bloco:
+        yield "".join(bloco)
+
+
+GERADORES = {"ndjson": gerar_ndjson, "csv": gerar_csv}
@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+
+from django.db import transaction
+
+from .cache import bump_catalog_version
+from .eventos import publicar_catalogo
+from .models import Copia, Livro, proximas_sequencias
+from .search import get_search_backend
+from .serializers import LivroImportSerializer
+
+FORMATOS = ("csv", "jsonl")
+TAMANHO_LOTE = 1000
+MAX_ERROS_REPORTADOS = 100
+
+
+def detectar_formato(nome):
+    nome = (nome or "").lower()
+    if nome.endswith(".csv"):
+        return "csv"
+    if nome.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return None
+
+
+def _texto(arquivo):
+    if isinstance(arquivo, io.TextIOBase):
+        return arquivo
+    return io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+
+
+def ler_csv(arquivo):
+    leitor = csv.DictReader(_texto(arquivo))
+    # Linha 1 é o cabeçalho; células vazias contam como campo ausente.
+    for numero, linha in enumerate(leitor, start=2):
+        yield numero, {k: v for k, v in linha.items() if k is not None and v not in ("", None)}
+
+
+def ler_jsonl(arquivo):
+    for numero, linha in enumerate(_texto(arquivo), start=1):
+        if not linha.strip():
+            continue
+        try:
+            dados = json.loads(linha)
+        except ValueError:
+            yield numero, None
+            continue
+        yield numero, dados
+
+
+LEITORES = {"csv": ler_csv, "jsonl": ler_jsonl}
+
+
+def importar_livros(arquivo, formato, tamanho_lote=TAMANHO_LOTE):
+    """
+    Lê o arquivo linha a linha e insere os livros válidos com bulk_create
+    em lotes de `tamanho_lote`; a memória usada depende só do lote, não do
+    tamanho do arquivo. Linhas inválidas não interrompem a importação: são
+    contadas e as primeiras MAX_ERROS_REPORTADOS são devolvidas.
+    """
+    resultado = {"importados": 0, "total_erros": 0, "erros": []}
+    lote = []
+
+    def registrar_erro(numero, erros):
+        resultado["total_erros"] += 1
+        if len(resultado["erros"]) < MAX_ERROS_REPORTADOS:
+            resultado["erros"].append({"linha": numero, "erros": erros})
+
+    for numero, dados in LEITORES[formato](arquivo):
+        if not isinstance(dados, dict):
+            registrar_erro(numero, {"linha": ["Linha não é um objeto JSON válido."]})
+            continue
+
+        serializer = LivroImportSerializer(data=dados)
+        if not serializer.is_valid():
+            registrar_erro(numero, serializer.errors)
+            continue
+
+        livro = Livro(**serializer.validated_data)
+        livro.ajustar_disponibilidade()
+        lote.append(livro)
+        if len(lote) >= tamanho_lote:
+            resultado["importados"] += _inserir_lote(lote)
+            lote = []
+
+    if lote:
+        resultado["importados"] += _inserir_lote(lote)
+
+    if resultado["importados"]:
+        bump_catalog_version()
+    return resultado
+
+
+def _inserir_lote(livros):
+    # bulk_create não dispara post_save, então as cópias, o índice de
+    # busca e o evento (um por lote) são feitos aqui, na mesma transação.
+    with transaction.atomic():
+        for livro, sequencia in zip(livros, proximas_sequencias(len(livros))):
+            livro.sequencia = sequencia
+        criados = Livro.objects.bulk_create(livros)
+        Copia.objects.criar_para(criados)
+        get_search_backend().index(criados)
+        publicar_catalogo(len(criados))
+    return len(criados)
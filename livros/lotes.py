@@ -0,0 +1,204 @@
+"""
+Aluguel e devolução de vários livros num só pedido (POST /livros/alugar/
+e POST /livros/emprestimos/devolver/). Cada lote roda numa transação com
+um número fixo de consultas, qualquer que seja o tamanho: os itens são
+lidos numa só consulta, atualizados com um único UPDATE condicional e os
+empréstimos são criados com bulk_create.
+
+Modos:
+  tudo_ou_nada    qualquer item com erro cancela o lote inteiro;
+  melhor_esforco  processa os itens válidos e devolve o erro dos demais.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .eventos import publicar_disponibilidade
+from .models import Copia, Emprestimo, Livro, Reserva, ResumoEmprestimos, proximas_sequencias
+from .serializacao import emprestimos_dicts, emprestimos_values
+
+TUDO_OU_NADA = "tudo_ou_nada"
+MELHOR_ESFORCO = "melhor_esforco"
+MODOS = (TUDO_OU_NADA, MELHOR_ESFORCO)
+
+CANCELADO = {"status": 424, "erro": "Lote cancelado por erro em outro item."}
+
+
+class LoteConcorrente(Exception):
+    """Outra escrita mudou os itens do lote entre a leitura e o UPDATE."""
+
+
+def por_id(ids, valores, output_field):
+    # CASE id WHEN ... THEN ...: um valor diferente por linha no mesmo UPDATE
+    return Case(
+        *[When(id=item_id, then=Value(valores[item_id])) for item_id in ids],
+        output_field=output_field,
+    )
+
+
+def sequencias(livro_ids):
+    # Uma sequência nova por livro. Pedidas no início da transação: o
+    # contador é a primeira trava (ver proximas_sequencias).
+    return dict(zip(livro_ids, proximas_sequencias(len(livro_ids))))
+
+
+def travar_livros(livro_ids, campos=("id",)):
+    # Sempre em ordem de id: lotes com livros em comum esperam um pelo
+    # outro em vez de se travarem mutuamente.
+    return {
+        livro.id: livro
+        for livro in Livro.objects.select_for_update().only(*campos).filter(id__in=livro_ids).order_by("id")
+    }
+
+
+def executar(ids, erros, modo):
+    """Os ids a processar: todos os válidos, ou nenhum se o lote foi cancelado."""
+    validos = [item_id for item_id in ids if item_id not in erros]
+    if erros and modo == TUDO_OU_NADA:
+        erros.update({item_id: CANCELADO for item_id in validos})
+        return []
+    return validos
+
+
+def alugar(usuario_id, livro_ids, modo=TUDO_OU_NADA):
+    """
+    Aluga uma cópia de cada livro para o usuário. Retorna {livro_id:
+    resultado}, em que o resultado tem o status HTTP do item e o
+    empréstimo criado ou o erro.
+    """
+    with transaction.atomic():
+        # Uma sequência por livro pedido; as dos recusados ficam sem uso.
+        numeros = sequencias(livro_ids)
+        # Os livros são lidos já travados: o que foi lido vale até o commit.
+        # O UPDATE continua condicional por segurança.
+        livros = travar_livros(livro_ids, ("id", "copias_disponiveis"))
+
+        erros = {}
+        for livro_id in livro_ids:
+            if livro_id not in livros:
+                erros[livro_id] = {"status": 404, "erro": "Livro não existe."}
+            elif not livros[livro_id].copias_disponiveis:
+                erros[livro_id] = {"status": 409, "erro": "Livro já está emprestado."}
+
+        alugados = executar(livro_ids, erros, modo)
+        if not alugados:
+            transaction.set_rollback(True)
+            return erros
+
+        atualizados = Livro.objects.filter(id__in=alugados, copias_disponiveis__gt=0).update(
+            copias_disponiveis=F("copias_disponiveis") - 1,
+            disponivel=Q(copias_disponiveis__gt=1),
+            sequencia=por_id(alugados, numeros, BigIntegerField()),
+        )
+        if atualizados != len(alugados):
+            raise LoteConcorrente()
+        try:
+            copias = Copia.objects.reservar_lote(alugados)
+        except Copia.DoesNotExist:
+            raise LoteConcorrente()
+
+        criados = Emprestimo.objects.bulk_create([
+            Emprestimo(livro_id=livro_id, copia_id=copias[livro_id], usuario_id=usuario_id)
+            for livro_id in alugados
+        ])
+        ResumoEmprestimos.objects.registrar(usuario_id, ativos=len(criados), quando=criados[0].data_emprestimo)
+        linhas = emprestimos_values(Emprestimo.objects.filter(id__in=[e.id for e in criados]))
+        emprestimos = {linha["livro"]["id"]: linha for linha in emprestimos_dicts(linhas)}
+
+        # bulk_create não dispara o post_save que publica o aluguel avulso
+        bump_catalog_version()
+        publicar_disponibilidade(Livro.objects.filter(id__in=alugados))
+
+    return {
+        **erros,
+        **{livro_id: {"status": 201, "emprestimo": emprestimos[livro_id]} for livro_id in alugados},
+    }
+
+
+def devolver(usuario_id, emprestimo_ids, modo=TUDO_OU_NADA):
+    """
+    Devolve os empréstimos do usuário. Retorna {emprestimo_id: resultado};
+    como na devolução avulsa, a cópia de um livro com fila de reservas
+    vai direto para o primeiro da fila.
+    """
+    agora = timezone.now()
+
+    with transaction.atomic():
+        # Uma sequência por empréstimo, o máximo de livros que podem voltar
+        # à estante; as que sobram ficam sem uso.
+        numeros = proximas_sequencias(len(emprestimo_ids))
+        emprestimos = Emprestimo.objects.filter(usuario_id=usuario_id).only(
+            "id", "livro_id", "copia_id", "data_devolucao", "data_prevista"
+        ).in_bulk(emprestimo_ids)
+
+        erros = {}
+        for emprestimo_id in emprestimo_ids:
+            if emprestimo_id not in emprestimos:
+                erros[emprestimo_id] = {"status": 404, "erro": "Empréstimo não encontrado."}
+            elif emprestimos[emprestimo_id].data_devolucao is not None:
+                erros[emprestimo_id] = {"status": 400, "erro": "Livro já foi devolvido."}
+
+        devolvidos = executar(emprestimo_ids, erros, modo)
+        if not devolvidos:
+            transaction.set_rollback(True)
+            return erros
+
+        # Ordem das travas: contador, empréstimos, livros (como no aluguel),
+        # fila e cópias. A fila só é lida com os livros travados: quem entra
+        # nela confere com o livro travado que não há cópia livre.
+        fechados = Emprestimo.objects.filter(id__in=devolvidos, data_devolucao__isnull=True).update(
+            data_devolucao=agora
+        )
+        if fechados != len(devolvidos):
+            raise LoteConcorrente()
+
+        # Os já marcados por marcar_atrasados saem do contador do resumo.
+        # Lidos depois do UPDATE, que esperou qualquer marcação em andamento
+        # nestas linhas; só os vencidos podem ter sido marcados.
+        vencidos = [
+            i for i in devolvidos
+            if emprestimos[i].data_prevista is not None and emprestimos[i].data_prevista < timezone.now()
+        ]
+        atrasados = 0
+        if vencidos:
+            atrasados = Emprestimo.objects.filter(id__in=vencidos, atraso_notificado_em__isnull=False).count()
+
+        travar_livros({emprestimos[i].livro_id for i in devolvidos})
+
+        # Um livro com fila entrega a cópia ao primeiro dela
+        entregas = Reserva.objects.atender([(emprestimos[i].livro_id, emprestimos[i].copia_id) for i in devolvidos])
+        entregues = {i: entregas[emprestimos[i].copia_id] for i in devolvidos if emprestimos[i].copia_id in entregas}
+
+        liberados = [emprestimos[i] for i in devolvidos if i not in entregues]
+        if liberados:
+            Copia.objects.filter(id__in=[e.copia_id for e in liberados]).update(disponivel=True)
+
+            # Um usuário pode devolver várias cópias do mesmo livro no lote
+            copias_por_livro = Counter(e.livro_id for e in liberados)
+            livro_ids = list(copias_por_livro)
+            Livro.objects.filter(id__in=livro_ids).update(
+                copias_disponiveis=F("copias_disponiveis") + por_id(livro_ids, copias_por_livro, IntegerField()),
+                disponivel=True,
+                sequencia=por_id(livro_ids, dict(zip(livro_ids, numeros)), BigIntegerField()),
+            )
+            bump_catalog_version()
+            publicar_disponibilidade(Livro.objects.filter(id__in=livro_ids))
+
+        # Os resumos por último, como na devolução avulsa
+        resumos = {usuario_id: {"ativos": -len(devolvidos), "devolvidos": len(devolvidos), "atrasados": -atrasados}}
+        for recebedor in entregues.values():
+            resumos.setdefault(recebedor, {"ativos": 0, "devolvidos": 0})["ativos"] += 1
+        ResumoEmprestimos.objects.aplicar(resumos, quando=agora)
+
+    return {
+        **erros,
+        **{
+            emprestimo_id: {
+                "status": 200, "data_devolucao": agora, "entregue_a_reserva": emprestimo_id in entregues
+            }
+            for emprestimo_id in devolvidos
+        },
+    }
@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from livros.importacao import FORMATOS, TAMANHO_LOTE, detectar_formato, importar_livros
+
+
+class Command(BaseCommand):
+    help = "Importa livros em massa de um arquivo CSV ou JSONL, em lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo")
+        parser.add_argument("--formato", choices=FORMATOS)
+        parser.add_argument("--lote", type=int, default=TAMANHO_LOTE)
+
+    def handle(self, *args, **options):
+        formato = options["formato"] or detectar_formato(options["arquivo"])
+        if formato is None:
+            raise CommandError("Não foi possível deduzir o formato; use --formato csv|jsonl.")
+
+        try:
+            arquivo = open(options["arquivo"], encoding="utf-8-sig", newline="")
+        except OSError as exc:
+            raise CommandError(f"Não foi possível abrir o arquivo: {exc}")
+
+        with arquivo:
+            resultado = importar_livros(arquivo, formato, tamanho_lote=options["lote"])
+
+        for erro in resultado["erros"]:
+            self.stderr.write(f"Linha {erro['linha']}: {json.dumps(erro['erros'], ensure_ascii=False)}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['importados']} livros importados, {resultado['total_erros']} linhas com erro."
+        ))
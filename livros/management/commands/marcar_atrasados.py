@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from livros.atrasos import TAMANHO_LOTE, marcar_atrasados
+
+
+class Command(BaseCommand):
+    help = "Marca os empréstimos ativos com a data prevista vencida, em lotes. Feito para rodar periodicamente (cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=TAMANHO_LOTE)
+        parser.add_argument("--limite", type=int, help="máximo de empréstimos marcados nesta rodada")
+        parser.add_argument("--pausa", type=float, default=0, help="segundos de espera entre os lotes")
+
+    def handle(self, *args, **options):
+        if options["lote"] < 1 or (options["limite"] is not None and options["limite"] < 1):
+            raise CommandError("--lote e --limite devem ser positivos.")
+
+        total = marcar_atrasados(tamanho_lote=options["lote"], limite=options["limite"], pausa=options["pausa"])
+        self.stdout.write(self.style.SUCCESS(f"{total} empréstimos marcados como atrasados."))
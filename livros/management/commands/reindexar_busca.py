@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from livros.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o índice de busca textual dos livros a partir da tabela livros_livro."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        with transaction.atomic(using=options["database"]):
+            total = get_search_backend(connection).rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Índice de busca reconstruído ({total} livros)."))
@@ -0,0 +1,64 @@
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS livros_livro_fts USING fts5("
+    "titulo, autor, tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO livros_livro_fts (rowid, titulo, autor) SELECT id, titulo, autor FROM livros_livro",
+]
+
+SQLITE_REVERSE = [
+    "DROP TABLE IF EXISTS livros_livro_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent() não é IMMUTABLE e por isso não pode ser usada em índices;
+    # o wrapper fixa o dicionário e pode ser indexado.
+    "CREATE OR REPLACE FUNCTION livros_unaccent(text) RETURNS text "
+    "AS $$ SELECT public.unaccent('public.unaccent', $1) $$ "
+    "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT",
+    "CREATE INDEX IF NOT EXISTS livros_livro_busca_tsv ON livros_livro "
+    "USING gin (to_tsvector('simple', livros_unaccent(titulo || ' ' || autor)))",
+    "CREATE INDEX IF NOT EXISTS livros_livro_busca_trgm ON livros_livro "
+    "USING gin (livros_unaccent(titulo || ' ' || autor) gin_trgm_ops)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS livros_livro_busca_trgm",
+    "DROP INDEX IF EXISTS livros_livro_busca_tsv",
+    "DROP FUNCTION IF EXISTS livros_unaccent(text)",
+]
+
+SQL = {
+    "sqlite": (SQLITE_FORWARD, SQLITE_REVERSE),
+    "postgresql": (POSTGRES_FORWARD, POSTGRES_REVERSE),
+}
+
+
+def executar(schema_editor, indice):
+    comandos = SQL.get(schema_editor.connection.vendor)
+    if comandos is None:
+        return
+    for sql in comandos[indice]:
+        schema_editor.execute(sql)
+
+
+def criar_indice(apps, schema_editor):
+    executar(schema_editor, 0)
+
+
+def remover_indice(apps, schema_editor):
+    executar(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0002_livro_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(fields=['usuario', 'data_devolucao'], name='emprestimo_usuario_dev_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livro',
+            index=models.Index(condition=models.Q(('disponivel', True)), fields=['id'], name='livro_disponiveis_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livro',
+            index=models.Index(condition=models.Q(('disponivel', False)), fields=['id'], name='livro_emprestados_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livro',
+            index=models.Index(fields=['titulo'], name='livro_titulo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livro',
+            index=models.Index(fields=['autor'], name='livro_autor_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='emprestimo',
+            constraint=models.UniqueConstraint(condition=models.Q(('data_devolucao__isnull', True)), fields=('livro',), name='emprestimo_ativo_unico_por_livro'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0003_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='livro',
+            name='copias_disponiveis',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='Copia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('disponivel', models.BooleanField(default=True)),
+                ('livro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='copias', to='livros.livro')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('disponivel', True)), fields=['livro'], name='copia_livre_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='emprestimo',
+            name='copia',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='emprestimos', to='livros.copia'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+LOTE = 5000
+
+
+def criar_copias(apps, schema_editor):
+    # Cada livro existente vira um título com uma única cópia, livre ou não
+    # conforme `disponivel`; os empréstimos passam a apontar para ela.
+    Livro = apps.get_model("livros", "Livro")
+    Copia = apps.get_model("livros", "Copia")
+    Emprestimo = apps.get_model("livros", "Emprestimo")
+    banco = schema_editor.connection.alias
+
+    Livro.objects.using(banco).filter(disponivel=False).update(copias_disponiveis=0)
+
+    livros = Livro.objects.using(banco).order_by("id").values_list("id", "disponivel")
+    lote = []
+    for livro_id, disponivel in livros.iterator(chunk_size=LOTE):
+        lote.append(Copia(livro_id=livro_id, disponivel=disponivel))
+        if len(lote) >= LOTE:
+            Copia.objects.using(banco).bulk_create(lote)
+            lote = []
+    Copia.objects.using(banco).bulk_create(lote)
+
+    Emprestimo.objects.using(banco).update(
+        copia_id=Subquery(Copia.objects.filter(livro_id=OuterRef("livro_id")).values("id")[:1])
+    )
+
+
+def remover_copias(apps, schema_editor):
+    Livro = apps.get_model("livros", "Livro")
+    Copia = apps.get_model("livros", "Copia")
+    banco = schema_editor.connection.alias
+
+    # Volta ao modelo de um exemplar por livro: disponível se houver cópia livre.
+    Livro.objects.using(banco).update(
+        disponivel=models.Exists(Copia.objects.filter(livro_id=OuterRef("id"), disponivel=True))
+    )
+
+
+# Só o preenchimento: no PostgreSQL, um ALTER TABLE em emprestimo na mesma
+# transação falharia pelas checagens de FK adiadas que este UPDATE deixa
+# pendentes ("pending trigger events"). O campo fica NOT NULL em 0006.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0004_copias'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_copias, remover_copias),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0005_copias_emprestimos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emprestimo',
+            name='copia',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='emprestimos', to='livros.copia'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='emprestimo',
+            name='emprestimo_ativo_unico_por_livro',
+        ),
+        migrations.AddConstraint(
+            model_name='emprestimo',
+            constraint=models.UniqueConstraint(condition=models.Q(('data_devolucao__isnull', True)), fields=('copia',), name='emprestimo_ativo_unico_por_copia'),
+        ),
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(condition=models.Q(('data_devolucao__isnull', True)), fields=['livro'], name='emprestimo_ativo_livro_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:38
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def numerar_livros(apps, schema_editor):
+    # Os livros existentes recebem o próprio id como sequência; o contador
+    # começa no maior deles.
+    Livro = apps.get_model("livros", "Livro")
+    SequenciaCatalogo = apps.get_model("livros", "SequenciaCatalogo")
+    banco = schema_editor.connection.alias
+
+    Livro.objects.using(banco).update(sequencia=F("id"))
+    maior = Livro.objects.using(banco).aggregate(maior=Max("id"))["maior"] or 0
+    SequenciaCatalogo.objects.using(banco).create(id=1, valor=maior)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0007_reservas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LivroRemovido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('livro_id', models.BigIntegerField()),
+                ('sequencia', models.BigIntegerField(db_index=True)),
+                ('removido_em', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SequenciaCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='livro',
+            name='sequencia',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='livro',
+            index=models.Index(fields=['sequencia'], name='livro_sequencia_idx'),
+        ),
+        migrations.RunPython(numerar_livros, migrations.RunPython.noop),
+    ]
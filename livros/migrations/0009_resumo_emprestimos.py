@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_resumos(apps, schema_editor):
+    # Um resumo por usuário com empréstimos, a partir do histórico atual.
+    # INSERT ... SELECT: o banco agrega e grava sem trazer as linhas para
+    # o Python, qualquer que seja o tamanho de emprestimo.
+    Emprestimo = apps.get_model("livros", "Emprestimo")
+    ResumoEmprestimos = apps.get_model("livros", "ResumoEmprestimos")
+    quote = schema_editor.quote_name
+
+    schema_editor.execute(
+        f"INSERT INTO {quote(ResumoEmprestimos._meta.db_table)} (usuario_id, ativos, devolvidos, ultima_atividade) "
+        "SELECT usuario_id, "
+        "COUNT(CASE WHEN data_devolucao IS NULL THEN 1 END), "
+        "COUNT(data_devolucao), "
+        "CASE WHEN MAX(data_devolucao) > MAX(data_emprestimo) THEN MAX(data_devolucao) ELSE MAX(data_emprestimo) END "
+        f"FROM {quote(Emprestimo._meta.db_table)} GROUP BY usuario_id"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0008_sequencia_catalogo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoEmprestimos',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumo_emprestimos', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('ativos', models.PositiveIntegerField(default=0)),
+                ('devolvidos', models.PositiveIntegerField(default=0)),
+                ('ultima_atividade', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:59
+
+from datetime import timedelta
+
+import livros.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def preencher_datas_previstas(apps, schema_editor):
+    # Os empréstimos existentes recebem o prazo atual a partir da data do
+    # empréstimo (o default do campo vale para os novos). Um único UPDATE,
+    # antes do índice, para não mantê-lo durante a atualização.
+    Emprestimo = apps.get_model("livros", "Emprestimo")
+    prazo = timedelta(days=getattr(settings, "LIVROS_PRAZO_EMPRESTIMO_DIAS", 14))
+    Emprestimo.objects.using(schema_editor.connection.alias).update(data_prevista=F("data_emprestimo") + prazo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0009_resumo_emprestimos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emprestimo',
+            name='atraso_notificado_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='emprestimo',
+            name='data_prevista',
+            field=models.DateTimeField(blank=True, default=livros.models.data_prevista_padrao, null=True),
+        ),
+        migrations.RunPython(preencher_datas_previstas, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='emprestimo',
+            index=models.Index(condition=models.Q(('atraso_notificado_em__isnull', True), ('data_devolucao__isnull', True)), fields=['data_prevista'], name='emprestimo_ativo_prevista_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0010_prazo_devolucao'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='livro',
+            name='livro_titulo_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='livro',
+            name='livro_autor_idx',
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:02
+
+from django.db import migrations
+from django.db.models import Max
+
+SEQUENCIA_CATALOGO = "livros_catalogo_seq"
+
+
+def maior_sequencia(apps, banco):
+    maiores = [
+        apps.get_model("livros", modelo).objects.using(banco).aggregate(maior=Max(campo))["maior"] or 0
+        for modelo, campo in (("Livro", "sequencia"), ("LivroRemovido", "sequencia"), ("SequenciaCatalogo", "valor"))
+    ]
+    return max(maiores)
+
+
+def criar_sequencia(apps, schema_editor):
+    # Só o PostgreSQL usa a SEQUENCE; nos outros bancos a próxima sequência
+    # é o maior valor em uso + 1 (ver livros.models.proximas_sequencias).
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"CREATE SEQUENCE {SEQUENCIA_CATALOGO}")
+    maior = maior_sequencia(apps, schema_editor.connection.alias)
+    if maior:
+        schema_editor.execute(f"SELECT setval('{SEQUENCIA_CATALOGO}', %s)", [maior])
+
+
+def restaurar_contador(apps, schema_editor):
+    banco = schema_editor.connection.alias
+    apps.get_model("livros", "SequenciaCatalogo").objects.using(banco).update_or_create(
+        id=1, defaults={"valor": maior_sequencia(apps, banco)}
+    )
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCIA_CATALOGO}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0011_remove_indices_titulo_autor'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_sequencia, restaurar_contador),
+        migrations.DeleteModel(
+            name='SequenciaCatalogo',
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def contar_atrasados(apps, schema_editor):
+    # Os ativos já marcados por marcar_atrasados, por usuário, num único
+    # UPDATE com subconsulta correlacionada
+    Emprestimo = apps.get_model("livros", "Emprestimo")
+    ResumoEmprestimos = apps.get_model("livros", "ResumoEmprestimos")
+    banco = schema_editor.connection.alias
+
+    atrasados = Emprestimo.objects.filter(
+        usuario_id=OuterRef("usuario_id"), data_devolucao__isnull=True, atraso_notificado_em__isnull=False
+    ).order_by().values("usuario_id").annotate(total=Count("id")).values("total")
+    ResumoEmprestimos.objects.using(banco).update(atrasados=Coalesce(Subquery(atrasados), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0012_sequencia_por_linha'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumoemprestimos',
+            name='atrasados',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(contar_atrasados, migrations.RunPython.noop),
+    ]
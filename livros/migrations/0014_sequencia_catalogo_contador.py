@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:40
+
+from django.db import migrations, models
+from django.db.models import Max
+
+SEQUENCIA_CATALOGO = "livros_catalogo_seq"
+
+
+def maior_em_uso(apps, banco):
+    return max(
+        apps.get_model("livros", modelo).objects.using(banco).aggregate(maior=Max("sequencia"))["maior"] or 0
+        for modelo in ("Livro", "LivroRemovido")
+    )
+
+
+def criar_contador(apps, schema_editor):
+    # De volta ao contador em linha única (ver livros.models.SequenciaCatalogo):
+    # a SEQUENCE do PostgreSQL não segue a ordem dos commits.
+    banco = schema_editor.connection.alias
+    apps.get_model("livros", "SequenciaCatalogo").objects.using(banco).create(id=1, valor=maior_em_uso(apps, banco))
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCIA_CATALOGO}")
+
+
+def restaurar_sequencia(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"CREATE SEQUENCE {SEQUENCIA_CATALOGO}")
+    maior = maior_em_uso(apps, schema_editor.connection.alias)
+    if maior:
+        schema_editor.execute(f"SELECT setval('{SEQUENCIA_CATALOGO}', %s)", [maior])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livros', '0013_resumo_atrasados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenciaCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(criar_contador, restaurar_sequencia),
+    ]
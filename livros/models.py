@@ -1,25 +1,457 @@
-from django.db import models
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, models, router, transaction
+from django.db.models.functions import Greatest, RowNumber
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
+
+class SequenciaCatalogo(models.Model):
+    """
+    Contador das alterações do catálogo (linha única). Cada livro criado,
+    alterado, alugado ou devolvido recebe uma sequência, e cada remoção
+    gera um LivroRemovido com a sua: GET /livros/alteracoes/ devolve só o
+    que mudou depois de uma sequência.
+    """
+
+    valor = models.BigIntegerField(default=0)
+
+
+def proximas_sequencias(quantidade=1, using=None):
+    """
+    Reserva `quantidade` sequências do catálogo e devolve a lista delas.
+
+    O UPDATE no contador trava a linha até o fim da transação, e a próxima
+    transação só lê o valor depois do commit desta: as sequências seguem a
+    ordem dos commits, e quem sincronizou até N nunca perde uma alteração
+    confirmada depois com número menor. Por isso deve rodar dentro de
+    transaction.atomic(), na transação da escrita que recebe os números, e
+    antes de travar outras linhas (ver travar_sequencias). No SQLite é
+    também a primeira escrita da transação, que pega o lock do banco.
+    """
+    using = using or DEFAULT_DB_ALIAS
+    conexao = connections[using]
+    tabela = conexao.ops.quote_name(SequenciaCatalogo._meta.db_table)
+    with conexao.cursor() as cursor:
+        # Uma consulta só onde há UPDATE ... RETURNING (PostgreSQL e SQLite
+        # 3.35+, os mesmos que têm INSERT ... RETURNING)
+        if conexao.features.can_return_columns_from_insert:
+            cursor.execute(f"UPDATE {tabela} SET valor = valor + %s WHERE id = 1 RETURNING valor", [quantidade])
+        else:
+            cursor.execute(f"UPDATE {tabela} SET valor = valor + %s WHERE id = 1", [quantidade])
+            cursor.execute(f"SELECT valor FROM {tabela} WHERE id = 1")
+        linha = cursor.fetchone()
+
+    if linha is None:
+        # Contador ausente (banco esvaziado por flush): recomeça do maior
+        # valor em uso. Se outra transação o criou antes, incrementa o dela.
+        em_uso = [
+            modelo.objects.using(using).aggregate(maior=models.Max("sequencia"))["maior"] or 0
+            for modelo in (Livro, LivroRemovido)
+        ]
+        try:
+            with transaction.atomic(using=using):
+                SequenciaCatalogo.objects.using(using).create(id=1, valor=max(em_uso) + quantidade)
+        except IntegrityError:
+            return proximas_sequencias(quantidade, using)
+        linha = (max(em_uso) + quantidade,)
+
+    ultima = linha[0]
+    return list(range(ultima - quantidade + 1, ultima + 1))
+
+
+def travar_sequencias(using=None):
+    """
+    Trava o contador até o fim da transação sem consumir sequências. Para
+    transações que só pedem sequências depois de escrever em outras linhas
+    (a remoção de um livro): o contador é sempre a primeira trava, como no
+    aluguel e na devolução, e duas transações nunca o esperam em ordens
+    diferentes.
+    """
+    proximas_sequencias(0, using)
+
+
 class Livro(models.Model):
     titulo = models.CharField(max_length=200)
     autor = models.CharField(max_length=200)
     ano = models.PositiveIntegerField()
     disponivel = models.BooleanField(default=True)
+    # Cópias livres para empréstimo, mantido com F() no aluguel e na
+    # devolução; `disponivel` equivale a `copias_disponiveis > 0`.
+    copias_disponiveis = models.PositiveIntegerField(default=1)
+    # Sequência da última alteração (ver SequenciaCatalogo)
+    sequencia = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["sequencia"], name="livro_sequencia_idx"),
+            # Índices parciais em vez de (disponivel, id): o Django gera
+            # `WHERE disponivel` / `WHERE NOT disponivel`, que o SQLite só
+            # consegue atender com um índice cuja condição seja a mesma.
+            models.Index(fields=["id"], condition=models.Q(disponivel=True), name="livro_disponiveis_idx"),
+            models.Index(fields=["id"], condition=models.Q(disponivel=False), name="livro_emprestados_idx"),
+        ]
 
     def str(self):
         return f"{self.titulo} - {self.autor}"
-    
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.ajustar_disponibilidade()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "sequencia"}
+        # A sequência e a escrita na mesma transação (ver proximas_sequencias)
+        using = kwargs.get("using") or router.db_for_write(Livro, instance=self)
+        with transaction.atomic(using=using):
+            self.sequencia = proximas_sequencias(using=using)[0]
+            super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        # O LivroRemovido recebe a sequência depois do DELETE (ver
+        # livros.signals); o contador é travado antes.
+        using = using or router.db_for_write(Livro, instance=self)
+        with transaction.atomic(using=using):
+            travar_sequencias(using)
+            return super().delete(using, keep_parents)
+
+    def ajustar_disponibilidade(self):
+        # Na criação, `disponivel=False` significa nenhuma cópia livre.
+        # Depois disso os dois campos só mudam pelo aluguel e pela devolução.
+        if not self.disponivel:
+            self.copias_disponiveis = 0
+        self.disponivel = self.copias_disponiveis > 0
+
+
+class CopiaManager(models.Manager):
+    def criar_para(self, livros):
+        """Cria as cópias livres de cada livro (`copias_disponiveis` de cada um)."""
+        return self.bulk_create([
+            Copia(livro=livro) for livro in livros for _ in range(livro.copias_disponiveis)
+        ])
+
+    def reservar(self, livro_id):
+        """
+        Marca uma cópia livre do livro como emprestada e retorna o id dela.
+        Deve ser chamado depois de decrementar `Livro.copias_disponiveis`,
+        que garante uma cópia livre para cada aluguel em andamento; o UPDATE
+        condicional só resolve qual cópia fica com quem.
+        """
+        livres = self.filter(livro_id=livro_id, disponivel=True)
+        if connection.features.has_select_for_update_skip_locked:
+            livres = livres.select_for_update(skip_locked=True)
+
+        if connection.features.can_return_columns_from_insert:
+            # Escolhe e marca a cópia num UPDATE ... RETURNING só; no
+            # PostgreSQL a subconsulta pula as cópias travadas por outro aluguel.
+            escolhida, params = livres.values("id")[:1].query.sql_with_params()
+            tabela = connection.ops.quote_name(self.model._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {tabela} SET disponivel = %s WHERE id = ({escolhida}) RETURNING id", [False, *params]
+                )
+                linha = cursor.fetchone()
+            if linha is None:
+                raise Copia.DoesNotExist(f"Livro {livro_id} sem cópias livres.")
+            return linha[0]
+
+        while True:
+            copia_id = livres.values_list("id", flat=True).first()
+            if copia_id is None:
+                raise Copia.DoesNotExist(f"Livro {livro_id} sem cópias livres.")
+            if self.filter(id=copia_id, disponivel=True).update(disponivel=False):
+                return copia_id
+
+    def reservar_lote(self, livro_ids):
+        """
+        Versão em lote de `reservar`: marca uma cópia livre de cada livro
+        como emprestada e retorna {livro_id: copia_id}. Como em `reservar`,
+        os contadores dos livros já devem ter sido decrementados. Escolhe a
+        menor cópia livre de cada livro e trava as escolhidas que continuam
+        livres; as tomadas por outro aluguel nesse meio tempo são trocadas
+        na volta seguinte.
+        """
+        escolhidas = {}
+        while len(escolhidas) < len(livro_ids):
+            faltam = [livro_id for livro_id in livro_ids if livro_id not in escolhidas]
+            candidatas = list(
+                self.filter(livro_id__in=faltam, disponivel=True)
+                .values("livro_id").annotate(copia_id=models.Min("id"))
+                .values_list("copia_id", flat=True)
+            )
+            if len(candidatas) != len(faltam):
+                raise Copia.DoesNotExist("Cópias livres mudaram durante a reserva em lote.")
+
+            livres = dict(
+                self.select_for_update().filter(id__in=candidatas, disponivel=True)
+                .order_by("id").values_list("livro_id", "id")
+            )
+            self.filter(id__in=livres.values()).update(disponivel=False)
+            escolhidas.update(livres)
+        return escolhidas
+
+
+class Copia(models.Model):
+    livro = models.ForeignKey(Livro, on_delete=models.CASCADE, related_name="copias")
+    disponivel = models.BooleanField(default=True)
+
+    objects = CopiaManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["livro"], condition=models.Q(disponivel=True), name="copia_livre_idx"),
+        ]
+
+    def str(self):
+        return f"Cópia {self.id} de {self.livro}"
+
+
+def data_prevista_padrao():
+    """Prazo de devolução de um empréstimo feito agora."""
+    return timezone.now() + timedelta(days=getattr(settings, "LIVROS_PRAZO_EMPRESTIMO_DIAS", 14))
+
 
 class Emprestimo(models.Model):
     livro = models.ForeignKey(Livro, on_delete=models.CASCADE)
+    copia = models.ForeignKey(Copia, on_delete=models.CASCADE, related_name="emprestimos")
     usuario = models.ForeignKey(User, on_delete=models.CASCADE)
     data_emprestimo = models.DateTimeField(auto_now_add=True)
     data_devolucao = models.DateTimeField(null=True, blank=True)
+    # Default do campo, e não da view: vale também para o bulk_create dos
+    # lotes e para a entrega ao primeiro da fila de reservas.
+    data_prevista = models.DateTimeField(null=True, blank=True, default=data_prevista_padrao)
+    # Marcado por `manage.py marcar_atrasados` (ver livros.atrasos)
+    atraso_notificado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Empréstimos ativos ainda não marcados como atrasados, por
+            # data prevista: cada rodada de marcar_atrasados só percorre os
+            # que venceram desde a anterior.
+            models.Index(
+                fields=["data_prevista"],
+                condition=models.Q(data_devolucao__isnull=True, atraso_notificado_em__isnull=True),
+                name="emprestimo_ativo_prevista_idx",
+            ),
+            models.Index(fields=["usuario", "data_devolucao"], name="emprestimo_usuario_dev_idx"),
+            # Empréstimos ativos de um livro (DeletarLivroView)
+            models.Index(
+                fields=["livro"], condition=models.Q(data_devolucao__isnull=True), name="emprestimo_ativo_livro_idx"
+            ),
+        ]
+        constraints = [
+            # No máximo um empréstimo ativo por cópia.
+            models.UniqueConstraint(
+                fields=["copia"],
+                condition=models.Q(data_devolucao__isnull=True),
+                name="emprestimo_ativo_unico_por_copia",
+            ),
+        ]
 
     def str(self):
         return f"{self.livro} emprestado por {self.usuario.email}"
 
 
+class ReservaManager(models.Manager):
+    def filas(self, livro_ids, ate):
+        # Os `ate` primeiros da fila de cada livro, com a posição por ordem
+        # de chegada. A numeração percorre reserva_fila_idx (livro, id),
+        # sem ordenar.
+        return self.filter(livro_id__in=livro_ids).annotate(
+            posicao=models.Window(RowNumber(), partition_by=models.F("livro_id"), order_by=models.F("id").asc())
+        ).filter(posicao__lte=ate).order_by()
+
+    def primeiros(self, quantidades):
+        """
+        Os `quantidades[livro_id]` primeiros da fila de cada livro, numa só
+        consulta: {livro_id: [(reserva_id, usuario_id), ...]}, em ordem de
+        chegada.
+        """
+        fila = self.filas(quantidades, max(quantidades.values()))
+        primeiros = {}
+        for reserva_id, livro_id, usuario_id, posicao in sorted(
+            fila.values_list("id", "livro_id", "usuario_id", "posicao"), key=lambda linha: linha[3]
+        ):
+            if posicao <= quantidades[livro_id]:
+                primeiros.setdefault(livro_id, []).append((reserva_id, usuario_id))
+        return primeiros
+
+    def atender(self, copias):
+        """
+        Entrega as cópias recém-devolvidas, [(livro_id, copia_id), ...], aos
+        primeiros da fila de cada livro e retorna {copia_id: usuario_id} das
+        que foram entregues. Deve rodar na transação da devolução, depois de
+        travar os livros.
+
+        Um número fixo de consultas, qualquer que seja o lote: os primeiros
+        de cada fila, a trava e o DELETE das reservas escolhidas e um
+        bulk_create dos empréstimos. Reservas apagadas nesse meio tempo (o
+        usuário saiu da fila) são trocadas pelas seguintes na volta seguinte.
+        """
+        pendentes = {}
+        for livro_id, copia_id in copias:
+            pendentes.setdefault(livro_id, []).append(copia_id)
+
+        entregas, emprestimos = {}, []
+        while pendentes:
+            candidatas = self.primeiros({livro_id: len(restantes) for livro_id, restantes in pendentes.items()})
+            if not candidatas:
+                break
+            ids = [reserva_id for fila in candidatas.values() for reserva_id, _ in fila]
+            # Só as que continuam na fila
+            travadas = set(self.select_for_update().filter(id__in=ids).order_by("id").values_list("id", flat=True))
+            self.filter(id__in=travadas).delete()
+
+            proximos = {}
+            for livro_id, fila in candidatas.items():
+                restantes = pendentes[livro_id]
+                for reserva_id, usuario_id in fila:
+                    if reserva_id in travadas:
+                        copia_id = restantes.pop(0)
+                        entregas[copia_id] = usuario_id
+                        emprestimos.append(Emprestimo(livro_id=livro_id, copia_id=copia_id, usuario_id=usuario_id))
+                # Sobrou cópia porque alguém saiu da fila: pode haver outros depois
+                if restantes and any(reserva_id not in travadas for reserva_id, _ in fila):
+                    proximos[livro_id] = restantes
+            pendentes = proximos
+
+        Emprestimo.objects.bulk_create(emprestimos)
+        return entregas
+
+
+class Reserva(models.Model):
+    # Sem índice próprio: reserva_fila_idx começa por livro.
+    livro = models.ForeignKey(Livro, on_delete=models.CASCADE, related_name="reservas", db_index=False)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE)
+    data_reserva = models.DateTimeField(auto_now_add=True)
+
+    objects = ReservaManager()
+
+    class Meta:
+        indexes = [
+            # A fila de um livro é ordenada por id: o primeiro da fila é
+            # uma única busca neste índice.
+            models.Index(fields=["livro", "id"], name="reserva_fila_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["livro", "usuario"], name="reserva_unica_por_usuario"),
+        ]
+
+    def str(self):
+        return f"{self.usuario.email} na fila de {self.livro}"
+
+    def posicao(self):
+        return Reserva.objects.filter(livro_id=self.livro_id, id__lte=self.id).count()
+
+
+class LivroRemovido(models.Model):
+    """Registro (tombstone) de um livro removido, para a sincronização incremental."""
+
+    livro_id = models.BigIntegerField()
+    sequencia = models.BigIntegerField(db_index=True)
+    removido_em = models.DateTimeField(auto_now_add=True)
+
+    def str(self):
+        return f"Livro {self.livro_id} removido"
+
+
+def por_usuario(deltas, campo):
+    # CASE usuario_id WHEN ... THEN ...: o delta de cada resumo no mesmo UPDATE
+    return models.Case(
+        *[models.When(usuario_id=usuario_id, then=models.Value(delta.get(campo, 0))) for usuario_id, delta in deltas.items()],
+        default=models.Value(0),
+        output_field=models.IntegerField(),
+    )
+
+
+class ResumoManager(models.Manager):
+    def registrar(self, usuario_id, ativos=0, devolvidos=0, atrasados=0, quando=None):
+        """
+        Soma os deltas ao resumo do usuário com um UPDATE atômico, criando
+        o resumo no primeiro empréstimo; `quando`, se informado, vira a
+        última atividade. Deve rodar na transação do aluguel, da devolução
+        ou da marcação de atrasos, depois das demais escritas.
+        """
+        resumo = self.filter(usuario_id=usuario_id)
+        # Nunca abaixo de zero: empréstimos criados por fora destes
+        # caminhos (admin, shell) não entraram no resumo.
+        valores = {
+            "ativos": Greatest(models.F("ativos") + ativos, 0),
+            "devolvidos": Greatest(models.F("devolvidos") + devolvidos, 0),
+            "atrasados": Greatest(models.F("atrasados") + atrasados, 0),
+        }
+        if quando is not None:
+            valores["ultima_atividade"] = quando
+        if resumo.update(**valores):
+            return
+        try:
+            with transaction.atomic():
+                self.create(
+                    usuario_id=usuario_id, ativos=max(ativos, 0), devolvidos=max(devolvidos, 0),
+                    atrasados=max(atrasados, 0), ultima_atividade=quando
+                )
+        except IntegrityError:
+            resumo.update(**valores)
+
+    def aplicar(self, deltas, quando=None):
+        """
+        `registrar` para vários usuários, com deltas {usuario_id: {"ativos":
+        n, "devolvidos": m, ...}}, num número fixo de consultas: cria os
+        resumos que faltam, trava todos na ordem dos ids (para que duas
+        transações que mexem nos mesmos resumos não se bloqueiem
+        mutuamente) e soma os deltas com um único UPDATE.
+        """
+        if len(deltas) <= 1:
+            for usuario_id, delta in deltas.items():
+                self.registrar(usuario_id, quando=quando, **delta)
+            return
+
+        usuarios = sorted(deltas)
+        self.bulk_create([ResumoEmprestimos(usuario_id=usuario_id) for usuario_id in usuarios], ignore_conflicts=True)
+        list(self.select_for_update().filter(usuario_id__in=usuarios).order_by("usuario_id").values_list("pk"))
+
+        valores = {
+            campo: Greatest(models.F(campo) + por_usuario(deltas, campo), 0)
+            for campo in ("ativos", "devolvidos", "atrasados")
+        }
+        if quando is not None:
+            valores["ultima_atividade"] = quando
+        self.filter(usuario_id__in=usuarios).update(**valores)
+
+    def descontos(self, emprestimos):
+        """Os deltas (para `aplicar`) que tiram do resumo de cada usuário os `emprestimos` (queryset)."""
+        por_usuario = emprestimos.values("usuario_id").annotate(
+            ativos=models.Count("id", filter=models.Q(data_devolucao__isnull=True)),
+            devolvidos=models.Count("id", filter=models.Q(data_devolucao__isnull=False)),
+            atrasados=models.Count(
+                "id", filter=models.Q(data_devolucao__isnull=True, atraso_notificado_em__isnull=False)
+            ),
+        )
+        return {
+            linha["usuario_id"]: {
+                "ativos": -linha["ativos"], "devolvidos": -linha["devolvidos"], "atrasados": -linha["atrasados"]
+            }
+            for linha in por_usuario
+        }
+
+
+class ResumoEmprestimos(models.Model):
+    """
+    Contadores dos empréstimos de cada usuário, mantidos incrementalmente
+    pelo aluguel, pela devolução e por marcar_atrasados: o resumo de "Meus
+    Livros" é uma leitura por chave, sem percorrer o histórico em Emprestimo.
+    """
+
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="resumo_emprestimos")
+    ativos = models.PositiveIntegerField(default=0)
+    devolvidos = models.PositiveIntegerField(default=0)
+    # Ativos já marcados por marcar_atrasados
+    atrasados = models.PositiveIntegerField(default=0)
+    ultima_atividade = models.DateTimeField(null=True, blank=True)
+
+    objects = ResumoManager()
+
+    def str(self):
+        return f"Resumo de {self.usuario_id}: {self.ativos} ativos, {self.devolvidos} devolvidos"
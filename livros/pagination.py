@@ -0,0 +1,145 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+
+def encode_cursor(posicao, direcao):
+    dados = json.dumps({"p": posicao, "d": direcao}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, tamanho):
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        dados = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        posicao, direcao = dados["p"], dados["d"]
+    except (ValueError, KeyError, TypeError):
+        raise ValidationError({"erro": "Cursor inválido."})
+
+    if (
+        direcao not in ("n", "p")
+        or not isinstance(posicao, list)
+        or len(posicao) != tamanho
+        or not all(isinstance(v, (int, float)) for v in posicao)
+    ):
+        raise ValidationError({"erro": "Cursor inválido."})
+    return posicao, direcao
+
+
+def keyset_filter(ordering, posicao, lookup):
+    # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+    condicao = Q()
+    iguais = {}
+    for campo, valor in zip(ordering, posicao):
+        condicao |= Q(**iguais, **{f"{campo}__{lookup}": valor})
+        iguais[campo] = valor
+    return condicao
+
+
+class KeysetPagination:
+    """
+    Paginação por cursor (keyset) sobre os campos de `ordering`, por padrão
+    só o `id`: cada página é um `WHERE id > ? ORDER BY id LIMIT n`, então o
+    custo não depende da posição da página nem do tamanho do acervo.
+    """
+
+    page_size_param = "page_size"
+    cursor_param = "cursor"
+    count_param = "count"
+
+    def __init__(self, ordering=("id",)):
+        self.ordering = tuple(ordering)
+        self.page_size = getattr(settings, "LIVROS_PAGE_SIZE", 50)
+        self.max_page_size = getattr(settings, "LIVROS_MAX_PAGE_SIZE", 500)
+
+    def is_requested(self, request):
+        params = request.GET
+        return self.cursor_param in params or self.page_size_param in params
+
+    def get_page_size(self, request):
+        valor = request.GET.get(self.page_size_param)
+        if valor is None:
+            return self.page_size
+        try:
+            tamanho = int(valor)
+        except ValueError:
+            raise ValidationError({"erro": "page_size deve ser um inteiro."})
+        if tamanho < 1:
+            raise ValidationError({"erro": "page_size deve ser maior que zero."})
+        return min(tamanho, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request):
+        page_queryset = self._prepare(queryset, request)
+        self.count = queryset.count() if self._wants_count(request) else None
+        return self._finish(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request):
+        page_queryset = self._prepare(queryset, request)
+        self.count = await queryset.acount() if self._wants_count(request) else None
+        return self._finish([linha async for linha in page_queryset])
+
+    def _prepare(self, queryset, request):
+        self.tamanho = self.get_page_size(request)
+        cursor = request.GET.get(self.cursor_param)
+
+        if cursor:
+            self.posicao, self.direcao = decode_cursor(cursor, len(self.ordering))
+        else:
+            self.posicao, self.direcao = None, "n"
+
+        if self.direcao == "n":
+            if self.posicao is not None:
+                queryset = queryset.filter(keyset_filter(self.ordering, self.posicao, "gt"))
+            return queryset.order_by(*self.ordering)[:self.tamanho + 1]
+
+        queryset = queryset.filter(keyset_filter(self.ordering, self.posicao, "lt"))
+        decrescente = [f"-{campo}" for campo in self.ordering]
+        return queryset.order_by(*decrescente)[:self.tamanho + 1]
+
+    def _finish(self, linhas):
+        tem_mais = len(linhas) > self.tamanho
+        linhas = linhas[:self.tamanho]
+
+        if self.direcao == "n":
+            self.has_next = tem_mais
+            self.has_previous = self.posicao is not None
+        else:
+            linhas = linhas[::-1]
+            self.has_next = True
+            self.has_previous = tem_mais
+
+        self.page = linhas
+        return linhas
+
+    def _wants_count(self, request):
+        valor = request.GET.get(self.count_param, "")
+        return valor.lower() in ("1", "true", "sim")
+
+    def _posicao(self, linha):
+        # Aceita instâncias de modelo e linhas de `.values()`
+        if isinstance(linha, dict):
+            return [linha[campo] for campo in self.ordering]
+        return [getattr(linha, campo) for campo in self.ordering]
+
+    def get_next_cursor(self):
+        if not self.has_next or not self.page:
+            return None
+        return encode_cursor(self._posicao(self.page[-1]), "n")
+
+    def get_previous_cursor(self):
+        if not self.has_previous or not self.page:
+            return None
+        return encode_cursor(self._posicao(self.page[0]), "p")
+
+    def get_paginated_data(self, data):
+        resposta = {
+            "results": data,
+            "next": self.get_next_cursor(),
+            "previous": self.get_previous_cursor(),
+        }
+        if self.count is not None:
+            resposta["count"] = self.count
+        return resposta
@@ -0,0 +1,150 @@
+import re
+import unicodedata
+
+from django.db import connection as default_connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "livros_livro_fts"
+
+
+def remover_acentos(texto):
+    normalizado = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in normalizado if not unicodedata.combining(c))
+
+
+def extrair_termos(q):
+    return re.findall(r"\w+", remover_acentos(q).lower())
+
+
+class SearchBackend:
+    """
+    Busca sem índice: `icontains` em título e autor. Usada em bancos sem
+    suporte a busca textual; os backends abaixo sobrescrevem os métodos.
+    """
+
+    # Campos que definem a ordem dos resultados (usados pela paginação).
+    ordering = ("id",)
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def search(self, queryset, q):
+        return queryset.filter(Q(titulo__icontains=q) | Q(autor__icontains=q))
+
+    def empty(self, queryset):
+        # Resultado vazio com as mesmas colunas de uma busca (rank incluído)
+        campos = {campo: Value(0.0, output_field=FloatField()) for campo in self.ordering if campo == "rank"}
+        return queryset.annotate(**campos).none()
+
+    def index(self, livros):
+        pass
+
+    def remove(self, livro_ids):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """
+    Tabela virtual FTS5 (`livros_livro_fts`) com `rowid` igual ao id do
+    livro. O tokenizer `unicode61 remove_diacritics 2` torna a busca
+    insensível a acentos e cada termo é buscado como prefixo.
+    """
+
+    ordering = ("rank", "id")
+
+    def build_match(self, q):
+        return " ".join(f'"{termo}"*' for termo in extrair_termos(q))
+
+    def search(self, queryset, q):
+        match = self.build_match(q)
+        if not match:
+            return self.empty(queryset)
+
+        return queryset.annotate(
+            rank=RawSQL(f"{FTS_TABLE}.rank", ())
+        ).extra(
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = livros_livro.id", f"{FTS_TABLE} MATCH %s"],
+            params=[match],
+        ).order_by(*self.ordering)
+
+    def index(self, livros):
+        linhas = [(livro.id, livro.titulo, livro.autor) for livro in livros]
+        if not linhas:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(l[0],) for l in linhas])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, titulo, autor) VALUES (%s, %s, %s)", linhas
+            )
+
+    def remove(self, livro_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(i,) for i in livro_ids])
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, titulo, autor) "
+                "SELECT id, titulo, autor FROM livros_livro"
+            )
+            return cursor.rowcount
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Índices de expressão criados na migração: GIN sobre o tsvector de
+    `livros_unaccent(titulo || ' ' || autor)` para termos com prefixo e
+    GIN trigram sobre o mesmo texto para buscas por trechos no meio das
+    palavras. Como o índice é calculado pelo próprio banco, não há nada a
+    sincronizar a cada escrita.
+    """
+
+    ordering = ("rank", "id")
+    documento = "livros_unaccent(titulo || ' ' || autor)"
+
+    def search(self, queryset, q):
+        termos = extrair_termos(q)
+        if not termos:
+            return self.empty(queryset)
+
+        tsquery = " & ".join(f"{termo}:*" for termo in termos)
+        trecho = remover_acentos(q).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+        # ts_rank é maior para os melhores resultados; negamos para que a
+        # ordenação crescente (usada pela paginação) traga os melhores primeiro.
+        return queryset.annotate(
+            rank=RawSQL(
+                f"-ts_rank(to_tsvector('simple', {self.documento}), to_tsquery('simple', %s))",
+                (tsquery,),
+            )
+        ).extra(
+            where=[
+                f"(to_tsvector('simple', {self.documento}) @@ to_tsquery('simple', %s) "
+                f"OR {self.documento} ILIKE %s)"
+            ],
+            params=[tsquery, f"%{trecho}%"],
+        ).order_by(*self.ordering)
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("REINDEX INDEX livros_livro_busca_tsv")
+            cursor.execute("REINDEX INDEX livros_livro_busca_trgm")
+            cursor.execute("SELECT COUNT(*) FROM livros_livro")
+            return cursor.fetchone()[0]
+
+
+BACKENDS = {
+    "sqlite": SQLiteFTSBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_search_backend(connection=None):
+    connection = connection or default_connection
+    return BACKENDS.get(connection.vendor, SearchBackend)(connection)
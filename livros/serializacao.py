@@ -0,0 +1,120 @@
+"""
+Caminho rápido, somente leitura, para as listagens: as linhas vêm de
+`.values()` e os dicts são montados direto, sem instanciar modelos nem
+passar pelos campos do DRF. A saída é idêntica à de LivroSerializer e
+EmprestimoSerializer (mesmas chaves, mesma ordem, mesmo formato de data),
+o que é verificado por um teste diferencial.
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependência opcional
+    orjson = None
+
+CAMPOS_LIVRO = ("id", "titulo", "autor", "ano", "disponivel", "copias_disponiveis")
+
+# Colunas lidas para EmprestimoSerializer (o livro vem aninhado)
+COLUNAS_EMPRESTIMO = (
+    "id", "copia", "data_emprestimo", "data_devolucao", "data_prevista", "atraso_notificado_em", "usuario"
+) + tuple(
+    f"livro__{campo}" for campo in CAMPOS_LIVRO
+)
+
+
+def formatador_de_datas():
+    """
+    Retorna o to_representation de um DateTimeField do DRF com o fuso
+    atual já resolvido: o campo padrão consulta o fuso a cada valor, o que
+    domina o custo de uma lista grande de empréstimos.
+    """
+    fuso = timezone.get_current_timezone() if settings.USE_TZ else None
+    return serializers.DateTimeField(default_timezone=fuso).to_representation
+
+
+def _colunas(colunas, extras):
+    # Campos extras (ex.: o rank da busca, usado pela paginação) são lidos
+    # mas não entram na saída.
+    return colunas + tuple(campo for campo in extras if campo not in colunas)
+
+
+def livros_values(queryset, extras=()):
+    return queryset.values(*_colunas(CAMPOS_LIVRO, extras))
+
+
+def livro_dict(linha):
+    return {
+        "id": linha["id"],
+        "titulo": linha["titulo"],
+        "autor": linha["autor"],
+        "ano": linha["ano"],
+        "disponivel": linha["disponivel"],
+        "copias_disponiveis": linha["copias_disponiveis"],
+    }
+
+
+def livros_dicts(linhas):
+    return [livro_dict(linha) for linha in linhas]
+
+
+def emprestimos_values(queryset, extras=()):
+    return queryset.values(*_colunas(COLUNAS_EMPRESTIMO, extras))
+
+
+def emprestimo_dict(linha, formatar_data):
+    return {
+        "id": linha["id"],
+        "livro": {
+            "id": linha["livro__id"],
+            "titulo": linha["livro__titulo"],
+            "autor": linha["livro__autor"],
+            "ano": linha["livro__ano"],
+            "disponivel": linha["livro__disponivel"],
+            "copias_disponiveis": linha["livro__copias_disponiveis"],
+        },
+        "data_emprestimo": formatar_data(linha["data_emprestimo"]),
+        "data_devolucao": formatar_data(linha["data_devolucao"]),
+        "data_prevista": formatar_data(linha["data_prevista"]),
+        "atraso_notificado_em": formatar_data(linha["atraso_notificado_em"]),
+        "copia": linha["copia"],
+        "usuario": linha["usuario"],
+    }
+
+
+def emprestimos_dicts(linhas):
+    formatar_data = formatador_de_datas()
+    return [emprestimo_dict(linha, formatar_data) for linha in linhas]
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer com orjson, quando instalado, ou um encoder reaproveitado
+    entre respostas. Produz os mesmos bytes do JSONRenderer padrão (UTF-8
+    sem escapes, U+2028/U+2029 escapados); com indentação pedida pelo
+    cliente ou COMPACT_JSON/UNICODE_JSON alterados, usa o renderer padrão.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        indentado = self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        if indentado or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if orjson is not None:
+            try:
+                conteudo = orjson.dumps(data).decode()
+            except TypeError:
+                return super().render(data, accepted_media_type, renderer_context)
+        else:
+            conteudo = _encoder.encode(data)
+
+        conteudo = conteudo.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+        return conteudo.encode()
+
+
+_encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"), allow_nan=False)
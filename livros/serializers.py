@@ -1,10 +1,19 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Livro, Emprestimo
+from .models import Livro, Emprestimo, Reserva, ResumoEmprestimos
+from .lotes import MODOS, TUDO_OU_NADA
 
 class LivroSerializer(serializers.ModelSerializer):
     class Meta:
         model = Livro
-        fields = "__all__"
+        # A sequência só aparece em GET /livros/alteracoes/
+        exclude = ["sequencia"]
+
+    def update(self, instance, validated_data):
+        # Depois da criação, a disponibilidade só muda por aluguel e devolução.
+        validated_data.pop("disponivel", None)
+        validated_data.pop("copias_disponiveis", None)
+        return super().update(instance, validated_data)
 
 
 class AlugarLivroSerializer(serializers.Serializer):
@@ -13,17 +22,71 @@ class AlugarLivroSerializer(serializers.Serializer):
 class DevolverLivroSerializer(serializers.Serializer):
     emprestimo_id = serializers.IntegerField()
 
+
+class LoteSerializer(serializers.Serializer):
+    modo = serializers.ChoiceField(
+        choices=MODOS, default=TUDO_OU_NADA,
+        help_text="'tudo_ou_nada' cancela o lote se algum item falhar; 'melhor_esforco' processa os válidos"
+    )
+
+    def validar_ids(self, ids):
+        limite = getattr(settings, "LIVROS_MAX_LOTE", 100)
+        if len(ids) > limite:
+            raise serializers.ValidationError(f"O lote aceita no máximo {limite} itens.")
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError("Itens repetidos no lote.")
+        return ids
+
+
+class AlugarLoteSerializer(LoteSerializer):
+    livros = serializers.ListField(child=serializers.IntegerField(), min_length=1)
+
+    def validate_livros(self, livros):
+        return self.validar_ids(livros)
+
+
+class DevolverLoteSerializer(LoteSerializer):
+    emprestimos = serializers.ListField(child=serializers.IntegerField(), min_length=1)
+
+    def validate_emprestimos(self, emprestimos):
+        return self.validar_ids(emprestimos)
+
+
 class LivroInputSerializer(serializers.Serializer):
     titulo = serializers.CharField()
     autor = serializers.CharField()
     ano = serializers.IntegerField()
     disponivel = serializers.BooleanField()
+    copias_disponiveis = serializers.IntegerField(min_value=0, required=False)
+
+
+class LivroImportSerializer(LivroInputSerializer):
+    # Mesmas regras de LivroInputSerializer, com os limites do modelo
+    # (o bulk_create não passa pela validação do ModelSerializer).
+    titulo = serializers.CharField(max_length=200)
+    autor = serializers.CharField(max_length=200)
+    ano = serializers.IntegerField(min_value=0)
+    disponivel = serializers.BooleanField(default=True)
+    copias_disponiveis = serializers.IntegerField(min_value=0, default=1)
 
-    
 
 class EmprestimoSerializer(serializers.ModelSerializer):
     livro = LivroSerializer(read_only=True)
 
     class Meta:
         model = Emprestimo
-        fields = "__all__"
\ No newline at end of file
+        fields = "__all__"
+
+
+class ReservaSerializer(serializers.ModelSerializer):
+    posicao = serializers.IntegerField(read_only=True, help_text="Posição na fila (1 é o próximo)")
+
+    class Meta:
+        model = Reserva
+        fields = ["id", "livro", "data_reserva", "posicao"]
+
+
+class ResumoEmprestimosSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ResumoEmprestimos
+        fields = ["ativos", "devolvidos", "atrasados", "ultima_atividade"]
@@ -0,0 +1,60 @@
+from django.db import connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .eventos import publicar_disponibilidade, publicar_remocao
+from .models import Copia, Emprestimo, Livro, LivroRemovido, proximas_sequencias
+from .search import get_search_backend
+
+CAMPOS_INDEXADOS = {"titulo", "autor"}
+
+
+@receiver(post_save, sender=Livro)
+def indexar_livro(sender, instance, update_fields=None, using="default", **kwargs):
+    # Saves parciais que não tocam título/autor (ex.: aluguel) não mudam o índice.
+    if update_fields is not None and not CAMPOS_INDEXADOS & set(update_fields):
+        return
+    get_search_backend(connections[using]).index([instance])
+
+
+@receiver(post_save, sender=Livro)
+def criar_copias(sender, instance, created=False, raw=False, **kwargs):
+    # Livros criados em massa (bulk_create) chamam Copia.objects.criar_para.
+    if created and not raw:
+        Copia.objects.criar_para([instance])
+
+
+@receiver(post_delete, sender=Livro)
+def registrar_remocao(sender, instance, using="default", **kwargs):
+    LivroRemovido.objects.using(using).create(
+        livro_id=instance.pk, sequencia=proximas_sequencias(using=using)[0]
+    )
+
+
+@receiver(post_delete, sender=Livro)
+def remover_livro_do_indice(sender, instance, using="default", **kwargs):
+    get_search_backend(connections[using]).remove([instance.pk])
+
+
+@receiver(post_save, sender=Livro)
+@receiver(post_delete, sender=Livro)
+def invalidar_catalogo(sender, using="default", **kwargs):
+    bump_catalog_version(using)
+
+
+@receiver(post_save, sender=Livro)
+def publicar_livro(sender, instance, using="default", **kwargs):
+    publicar_disponibilidade([instance], using)
+
+
+@receiver(post_delete, sender=Livro)
+def publicar_livro_removido(sender, instance, using="default", **kwargs):
+    publicar_remocao(instance.pk, using)
+
+
+@receiver(post_save, sender=Emprestimo)
+def publicar_emprestimo(sender, instance, created=False, using="default", **kwargs):
+    # O aluguel decrementa o contador com update(); o valor novo é lido no commit.
+    if created:
+        publicar_disponibilidade(Livro.objects.using(using).filter(id=instance.livro_id), using)
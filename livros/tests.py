@@ -1,3 +1,1403 @@
-from django.test import TestCase
+import csv
+import json
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import F, Q
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+
+from rest_framework.authtoken.models import Token
+
+from accounts.authentication import gerar_tokens_jwt
+from livraria_api.checks import cache_do_catalogo
+
+from .atrasos import emprestimos_atrasados, marcar_atrasados, pendentes
+from .models import Copia, Emprestimo, Livro, Reserva, ResumoEmprestimos
+from .serializacao import FastJSONRenderer
+from .serializers import EmprestimoSerializer, LivroSerializer
+
+User = get_user_model()
+
+
+class MaxQueriesContext(CaptureQueriesContext):
+    # Ignora SAVEPOINT/RELEASE, que só existem porque o TestCase envolve
+    # cada teste numa transação.
+    def __init__(self, test_case, maximo):
+        super().__init__(connection)
+        self.test_case = test_case
+        self.maximo = maximo
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return
+        queries = [
+            q["sql"] for q in self.captured_queries
+            if not q["sql"].startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT"))
+        ]
+        self.test_case.assertLessEqual(
+            len(queries), self.maximo,
+            f"{len(queries)} queries executadas, máximo {self.maximo}:\n" + "\n".join(queries)
+        )
+
+
+class LivroTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="leitor@teste.com", password="senha-forte-123",
+            first_name="Leitor", last_name="Teste"
+        )
+        self.client.force_authenticate(self.user)
+
+    def assertMaxQueries(self, maximo):
+        return MaxQueriesContext(self, maximo)
+
+    def criar_livros(self, quantidade, **extra):
+        livros = [Livro(titulo=f"Livro {i}", autor=f"Autor {i}", ano=2000, **extra) for i in range(quantidade)]
+        for livro in livros:
+            livro.ajustar_disponibilidade()
+        livros = Livro.objects.bulk_create(livros)
+        Copia.objects.criar_para(livros)
+        return livros
+
+    def emprestar(self, livro, usuario=None, **extra):
+        # Mesmo efeito de AlugarLivrosView; empréstimos já devolvidos só
+        # apontam para uma cópia do livro.
+        if extra.get("data_devolucao"):
+            copia_id = livro.copias.values_list("id", flat=True).first()
+        else:
+            Livro.objects.filter(id=livro.id).update(
+                copias_disponiveis=F("copias_disponiveis") - 1, disponivel=Q(copias_disponiveis__gt=1)
+            )
+            copia_id = Copia.objects.reservar(livro.id)
+        emprestimo = Emprestimo.objects.create(livro=livro, copia_id=copia_id, usuario=usuario or self.user, **extra)
+        devolvido = bool(extra.get("data_devolucao"))
+        ResumoEmprestimos.objects.registrar(
+            emprestimo.usuario_id, ativos=int(not devolvido), devolvidos=int(devolvido),
+            atrasados=int(not devolvido and bool(extra.get("atraso_notificado_em")))
+        )
+        return emprestimo
+
+
+class PaginacaoLivrosTests(LivroTestCase):
+    def test_sem_parametros_retorna_lista_completa(self):
+        self.criar_livros(3)
+        response = self.client.get("/livros/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 3)
+
+    def test_percorre_paginas_com_cursor(self):
+        self.criar_livros(5)
+        ids = list(Livro.objects.order_by("id").values_list("id", flat=True))
+
+        pagina1 = self.client.get("/livros/", {"page_size": 2}).data
+        self.assertEqual([l["id"] for l in pagina1["results"]], ids[:2])
+        self.assertIsNone(pagina1["previous"])
+        self.assertNotIn("count", pagina1)
+
+        pagina2 = self.client.get("/livros/", {"page_size": 2, "cursor": pagina1["next"]}).data
+        self.assertEqual([l["id"] for l in pagina2["results"]], ids[2:4])
+
+        pagina3 = self.client.get("/livros/", {"page_size": 2, "cursor": pagina2["next"]}).data
+        self.assertEqual([l["id"] for l in pagina3["results"]], ids[4:])
+        self.assertIsNone(pagina3["next"])
+
+        anterior = self.client.get("/livros/", {"page_size": 2, "cursor": pagina3["previous"]}).data
+        self.assertEqual([l["id"] for l in anterior["results"]], ids[2:4])
+
+    def test_count_apenas_quando_pedido(self):
+        self.criar_livros(4)
+        response = self.client.get("/livros/", {"page_size": 2, "count": "true"})
+        self.assertEqual(response.data["count"], 4)
+
+    def test_paginacao_executa_uma_query_sem_count(self):
+        self.criar_livros(10)
+        with self.assertNumQueries(1):
+            self.client.get("/livros/", {"page_size": 3})
+
+    def test_filtra_disponiveis(self):
+        self.criar_livros(2)
+        self.criar_livros(3, disponivel=False)
+        pagina = self.client.get("/livros/", {"page_size": 10, "disponivel": "true"}).data
+        self.assertEqual(len(pagina["results"]), 2)
+        self.assertEqual(len(self.client.get("/livros/", {"disponivel": "false"}).data), 3)
+
+    def test_cursor_invalido(self):
+        response = self.client.get("/livros/", {"cursor": "lixo!"})
+        self.assertEqual(response.status_code, 400)
+
+
+class BuscaLivrosTests(LivroTestCase):
+    def setUp(self):
+        super().setUp()
+        Livro.objects.create(titulo="Admirável Mundo Novo", autor="Aldous Huxley", ano=1932)
+        Livro.objects.create(titulo="A Revolução dos Bichos", autor="George Orwell", ano=1945)
+        Livro.objects.create(titulo="1984", autor="George Orwell", ano=1949)
+
+    def buscar(self, q, **params):
+        return self.client.get("/livros/", {"q": q, **params}).data
+
+    def test_busca_sem_acento_e_por_prefixo(self):
+        self.assertEqual([l["titulo"] for l in self.buscar("revolucao")], ["A Revolução dos Bichos"])
+        self.assertEqual([l["titulo"] for l in self.buscar("Admir")], ["Admirável Mundo Novo"])
+
+    def test_busca_por_autor(self):
+        self.assertEqual(len(self.buscar("orwell")), 2)
+
+    def test_ranking_prioriza_mais_ocorrencias(self):
+        Livro.objects.create(titulo="Orwell por Orwell", autor="George Orwell", ano=2000)
+        self.assertEqual(self.buscar("orwell")[0]["titulo"], "Orwell por Orwell")
+
+    def test_indice_acompanha_edicao_e_exclusao(self):
+        livro = Livro.objects.get(titulo="1984")
+        livro.titulo = "Mil Novecentos e Oitenta e Quatro"
+        livro.save()
+        self.assertEqual(len(self.buscar("novecentos")), 1)
+
+        livro.delete()
+        self.assertEqual(self.buscar("novecentos"), [])
+
+    def test_busca_paginada_por_relevancia(self):
+        pagina1 = self.buscar("orwell", page_size=1)
+        pagina2 = self.buscar("orwell", page_size=1, cursor=pagina1["next"])
+        titulos = {pagina1["results"][0]["titulo"], pagina2["results"][0]["titulo"]}
+        self.assertEqual(titulos, {"A Revolução dos Bichos", "1984"})
+        self.assertIsNone(pagina2["next"])
+
+    def test_busca_sem_termos(self):
+        self.assertEqual(self.buscar("!!!"), [])
+
+    def test_comando_reindexar(self):
+        saida = StringIO()
+        call_command("reindexar_busca", stdout=saida)
+        self.assertIn("3 livros", saida.getvalue())
+        self.assertEqual(len(self.buscar("huxley")), 1)
+
+
+class CacheCatalogoTests(LivroTestCase):
+    def setUp(self):
+        super().setUp()
+        self.livro = Livro.objects.create(titulo="Duna", autor="Frank Herbert", ano=1965)
+
+    def test_segunda_leitura_nao_consulta_o_banco(self):
+        self.client.get("/livros/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/livros/")
+        self.assertEqual(response.data[0]["titulo"], "Duna")
+
+    def test_etag_retorna_304(self):
+        etag = self.client.get("/livros/")["ETag"]
+        response = self.client.get("/livros/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_valida_so_pelo_etag(self):
+        response = self.client.get("/livros/")
+        self.assertNotIn("Last-Modified", response)
+
+        # Alteração no mesmo segundo da leitura: If-Modified-Since não vale
+        self.livro.titulo = "Duna Messias"
+        self.livro.save()
+        response = self.client.get("/livros/", HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["titulo"], "Duna Messias")
+
+    def test_check_exige_cache_compartilhado(self):
+        with override_settings(LIVRARIA_PERMITIR_CACHE_LOCAL=False):
+            self.assertEqual([e.id for e in cache_do_catalogo(None)], ["livraria_api.E001"])
+            with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}):
+                self.assertEqual(cache_do_catalogo(None), [])
+        self.assertEqual(cache_do_catalogo(None), [])
+
+    def test_escrita_invalida_o_cache(self):
+        etag = self.client.get("/livros/")["ETag"]
+
+        self.livro.titulo = "Duna Messias"
+        self.livro.save()
+
+        response = self.client.get("/livros/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["titulo"], "Duna Messias")
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_chave_depende_da_busca(self):
+        Livro.objects.create(titulo="1984", autor="George Orwell", ano=1949)
+        self.assertEqual(len(self.client.get("/livros/").data), 2)
+        self.assertEqual(len(self.client.get("/livros/", {"q": "duna"}).data), 1)
+
+
+class AlugarLivroTests(LivroTestCase):
+    def setUp(self):
+        super().setUp()
+        self.livro = Livro.objects.create(titulo="Duna", autor="Frank Herbert", ano=1965)
+
+    def test_aluga_livro_disponivel(self):
+        response = self.client.post(f"/livros/{self.livro.id}/alugar/")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["livro"]["id"], self.livro.id)
+        self.livro.refresh_from_db()
+        self.assertFalse(self.livro.disponivel)
+
+    @override_settings(ACCOUNTS_AUTH_MODE="jwt")
+    def test_aluga_com_jwt_sem_carregar_usuario(self):
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {gerar_tokens_jwt(self.user)['access']}")
+        response = self.client.post(f"/livros/{self.livro.id}/alugar/")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Emprestimo.objects.get().usuario_id, self.user.id)
+
+    def test_aluguel_usa_no_maximo_sete_queries(self):
+        # Próxima sequência + UPDATE condicional do livro + SELECT do livro
+        # (resposta) + UPDATE ... RETURNING da cópia + INSERT do empréstimo
+        # + UPDATE do resumo + SELECT do livro para o evento, no commit.
+        # O resumo já existe: só o primeiro aluguel do usuário o cria.
+        ResumoEmprestimos.objects.create(usuario=self.user)
+        with self.assertMaxQueries(7), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/livros/{self.livro.id}/alugar/")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["livro"]["copias_disponiveis"], 0)
+
+    def test_aluguel_recusado_usa_no_maximo_tres_queries(self):
+        self.emprestar(self.livro)
+        # Próxima sequência + UPDATE condicional (nenhuma linha) + EXISTS
+        with self.assertMaxQueries(3):
+            response = self.client.post(f"/livros/{self.livro.id}/alugar/")
+        self.assertEqual(response.status_code, 409)
+
+    def test_livro_emprestado_retorna_409(self):
+        self.client.post(f"/livros/{self.livro.id}/alugar/")
+        response = self.client.post(f"/livros/{self.livro.id}/alugar/")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Emprestimo.objects.count(), 1)
+
+    def test_livro_inexistente_retorna_404(self):
+        response = self.client.post("/livros/9999/alugar/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_um_emprestimo_ativo_por_copia(self):
+        emprestimo = self.emprestar(self.livro)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Emprestimo.objects.create(livro=self.livro, copia=emprestimo.copia, usuario=self.user)
+
+    def test_aluguel_invalida_cache_do_catalogo(self):
+        self.client.get("/livros/")
+        self.client.post(f"/livros/{self.livro.id}/alugar/")
+        self.assertFalse(self.client.get("/livros/").data[0]["disponivel"])
+
+
+class AluguelConcorrenteTests(TransactionTestCase):
+    pedidos = 8
+
+    def alugar_concorrentemente(self, livro):
+        return self.concorrentemente(lambda client: client.post(f"/livros/{livro.id}/alugar/"))
+
+    def concorrentemente(self, pedido):
+        usuarios = [
+            User.objects.create_user(
+                email=f"leitor{i}@teste.com", password="senha-forte-123",
+                first_name="Leitor", last_name=str(i)
+            )
+            for i in range(self.pedidos)
+        ]
+        barreira = threading.Barrier(self.pedidos)
+        status = []
+
+        def alugar(usuario):
+            client = APIClient()
+            client.force_authenticate(usuario)
+            barreira.wait()
+            try:
+                status.append(pedido(client).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=alugar, args=(u,)) for u in usuarios]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(status)
+
+    def test_apenas_um_aluguel_concorrente_vence(self):
+        livro = Livro.objects.create(titulo="Duna", autor="Frank Herbert", ano=1965)
+        self.assertEqual(self.alugar_concorrentemente(livro), [201] + [409] * (self.pedidos - 1))
+        self.assertEqual(Emprestimo.objects.filter(livro=livro).count(), 1)
+
+    def test_cada_copia_vai_para_um_aluguel(self):
+        livro = Livro.objects.create(titulo="Duna", autor="Frank Herbert", ano=1965, copias_disponiveis=3)
+        self.assertEqual(self.alugar_concorrentemente(livro), [201] * 3 + [409] * (self.pedidos - 3))
+        copias = Emprestimo.objects.filter(livro=livro).values_list("copia_id", flat=True)
+        self.assertEqual(len(set(copias)), 3)
+        livro.refresh_from_db()
+        self.assertEqual(livro.copias_disponiveis, 0)
+        self.assertFalse(livro.disponivel)
+
+    def test_lotes_concorrentes_sem_database_locked(self):
+        # Sem BEGIN IMMEDIATE: o lote escreve (o contador das sequências)
+        # antes de ler, então os pedidos esperam o lock em vez de falhar.
+        livros = [
+            Livro.objects.create(titulo=titulo, autor="Autor", ano=2000, copias_disponiveis=3)
+            for titulo in ("Duna", "Solaris")
+        ]
+        ids = [livro.id for livro in livros]
+        status = self.concorrentemente(lambda client: client.post("/livros/alugar/", {"livros": ids}, format="json"))
+        self.assertEqual(status, [201] * 3 + [409] * (self.pedidos - 3))
+        self.assertEqual(Emprestimo.objects.count(), 6)
+
+
+class CopiasTests(LivroTestCase):
+    def setUp(self):
+        super().setUp()
+        self.livro = Livro.objects.create(titulo="1984", autor="George Orwell", ano=1949, copias_disponiveis=2)
+
+    def alugar(self):
+        return self.client.post(f"/livros/{self.livro.id}/alugar/")
+
+    def test_criacao_cria_as_copias(self):
+        self.assertEqual(self.livro.copias.filter(disponivel=True).count(), 2)
+        indisponivel = Livro.objects.create(titulo="Duna", autor="Frank Herbert", ano=1965, disponivel=False)
+        self.assertEqual(indisponivel.copias_disponiveis, 0)
+        self.assertFalse(indisponivel.copias.exists())
+
+    def test_aluga_ate_acabarem_as_copias(self):
+        primeiro, segundo = self.alugar(), self.alugar()
+        self.assertEqual((primeiro.status_code, segundo.status_code), (201, 201))
+        self.assertNotEqual(primeiro.data["copia"], segundo.data["copia"])
+        self.assertEqual(self.alugar().status_code, 409)
+
+        self.livro.refresh_from_db()
+        self.assertEqual(self.livro.copias_disponiveis, 0)
+        self.assertFalse(self.livro.disponivel)
+
+    def test_devolucao_libera_a_copia(self):
+        emprestimo = self.alugar().data
+        self.alugar()
+        self.client.post(f"/livros/emprestimo/{emprestimo['id']}/devolver/")
+
+        self.livro.refresh_from_db()
+        self.assertEqual(self.livro.copias_disponiveis, 1)
+        self.assertTrue(self.livro.disponivel)
+        self.assertEqual(self.alugar().data["copia"], emprestimo["copia"])
+
+    def test_catalogo_mostra_o_contador(self):
+        self.alugar()
+        livro = self.client.get("/livros/").data[0]
+        self.assertEqual((livro["copias_disponiveis"], livro["disponivel"]), (1, True))
+
+    def test_atualizacao_nao_altera_disponibilidade(self):
+        self.user.is_superuser = True
+        self.user.save()
+        response = self.client.post(f"/livros/{self.livro.id}/atualizar/", {
+            "titulo": "1984", "autor": "George Orwell", "ano": 1949, "disponivel": False, "copias_disponiveis": 9
+        })
+        self.assertEqual(response.status_code, 200)
+        self.livro.refresh_from_db()
+        self.assertEqual((self.livro.copias_disponiveis, self.livro.disponivel), (2, True))
+
+
+class DevolverLivroTests(LivroTestCase):
+    def setUp(self):
+        super().setUp()
+        self.livro = Livro.objects.create(titulo="Duna", autor="Frank Herbert", ano=1965)
+        self.emprestimo = self.emprestar(self.livro)
+
+    def devolver(self, emprestimo_id=None):
+        return self.client.post(f"/livros/emprestimo/{emprestimo_id or self.emprestimo.id}/devolver/")
+
+    def test_devolve_e_libera_livro(self):
+        response = self.devolver()
+        self.assertEqual(response.status_code, 200)
+        self.emprestimo.refresh_from_db()
+        self.livro.refresh_from_db()
+        self.assertIsNotNone(self.emprestimo.data_devolucao)
+        self.assertTrue(self.livro.disponivel)
+
+    def test_devolucao_usa_no_maximo_oito_queries(self):
+        # O mesmo caminho do lote: SELECT e UPDATE do empréstimo + SELECT
+        # FOR UPDATE do livro + SELECT da fila (vazia) + UPDATE da cópia +
+        # próxima sequência + UPDATE do livro + UPDATE do resumo
+        with self.assertMaxQueries(8):
+            self.devolver()
+
+    def test_devolucao_repetida(self):
+        self.devolver()
+        response = self.devolver()
+        self.assertEqual(response.status_code, 400)
+
+    def test_emprestimo_de_outro_usuario(self):
+        outro = User.objects.create_user(
+            email="outro@teste.com", password="senha-forte-123",
+            first_name="Outro", last_name="Leitor"
+        )
+        self.client.force_authenticate(outro)
+        self.assertEqual(self.devolver().status_code, 404)
+        self.livro.refresh_from_db()
+        self.assertFalse(self.livro.disponivel)
+
+
+class ReservaTests(LivroTestCase):
+    def setUp(self):
+        super().setUp()
+        self.livro = Livro.objects.create(titulo="Duna", autor="Frank Herbert", ano=1965)
+        self.emprestimo = self.emprestar(self.livro)
+        self.leitores = [
+            User.objects.create_user(
+                email=f"fila{i}@teste.com", password="senha-forte-123",
+                first_name="Fila", last_name=str(i)
+            )
+            for i in range(2)
+        ]
+
+    def url(self, livro_id=None):
+        return f"/livros/{livro_id or self.livro.id}/reserva/"
+
+    def reservar(self, usuario):
+        self.client.force_authenticate(usuario)
+        return self.client.post(self.url())
+
+    def devolver(self):
+        self.client.force_authenticate(self.user)
+        return self.client.post(f"/livros/emprestimo/{self.emprestimo.id}/devolver/")
+
+    def test_entra_na_fila_e_ve_a_posicao(self):
+        self.assertEqual(self.reservar(self.leitores[0]).data["posicao"], 1)
+        self.assertEqual(self.reservar(self.leitores[1]).data["posicao"], 2)
+        self.assertEqual(self.client.get(self.url()).data["posicao"], 2)
+
+    def test_nao_entra_duas_vezes(self):
+        self.reservar(self.leitores[0])
+        self.assertEqual(self.reservar(self.leitores[0]).status_code, 409)
+
+    def test_nao_reserva_livro_disponivel_ou_ja_emprestado(self):
+        livre = Livro.objects.create(titulo="1984", autor="George Orwell", ano=1949)
+        self.assertEqual(self.client.post(self.url(livre.id)).status_code, 409)
+        self.assertEqual(self.client.post(self.url()).status_code, 409)
+        self.assertEqual(self.client.post(self.url(9999)).status_code, 404)
+
+    def test_devolucao_entrega_ao_primeiro_da_fila(self):
+        self.reservar(self.leitores[0])
+        self.reservar(self.leitores[1])
+
+        response = self.devolver()
+        self.assertTrue(response.data["entregue_a_reserva"])
+        novo = Emprestimo.objects.get(livro=self.livro, data_devolucao__isnull=True)
+        self.assertEqual((novo.usuario_id, novo.copia_id), (self.leitores[0].id, self.emprestimo.copia_id))
+
+        self.livro.refresh_from_db()
+        self.assertEqual(self.livro.copias_disponiveis, 0)
+        self.client.force_authenticate(self.leitores[1])
+        self.assertEqual(self.client.get(self.url()).data["posicao"], 1)
+
+    def test_sair_da_fila(self):
+        self.reservar(self.leitores[0])
+        self.assertEqual(self.client.delete(self.url()).status_code, 200)
+        self.assertEqual(self.client.delete(self.url()).status_code, 404)
+        self.assertEqual(self.client.get(self.url()).status_code, 404)
+
+        self.assertFalse(self.devolver().data["entregue_a_reserva"])
+        self.livro.refresh_from_db()
+        self.assertTrue(self.livro.disponivel)
+
+    def test_primeiro_da_fila_usa_o_indice(self):
+        # A mesma consulta de ReservaManager.primeiros
+        sql, params = Reserva.objects.filas([1, 2], 1).values_list(
+            "id", "livro_id", "usuario_id", "posicao"
+        ).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plano = " ".join(str(linha[-1]) for linha in cursor.fetchall())
+        self.assertIn("reserva_fila_idx", plano)
+        self.assertNotIn("TEMP B-TREE", plano)
+
+
+class LoteTests(LivroTestCase):
+    def setUp(self):
+        super().setUp()
+        self.livros = self.criar_livros(3)
+        self.emprestado = self.criar_livros(1, disponivel=False)[0]
+
+    def alugar(self, livros, modo="tudo_ou_nada"):
+        return self.client.post("/livros/alugar/", {"livros": livros, "modo": modo}, format="json")
+
+    def devolver(self, emprestimos, modo="tudo_ou_nada"):
+        return self.client.post("/livros/emprestimos/devolver/", {"emprestimos": emprestimos, "modo": modo}, format="json")
+
+    def test_aluga_todos(self):
+        ids = [l.id for l in self.livros]
+        response = self.alugar(ids)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r["livro_id"] for r in response.data["resultados"]], ids)
+
+        emprestimo = response.data["resultados"][0]["emprestimo"]
+        esperado = EmprestimoSerializer(Emprestimo.objects.get(id=emprestimo["id"])).data
+        self.assertEqual(json.loads(FastJSONRenderer().render(emprestimo)), json.loads(JSONRenderer().render(esperado)))
+        self.assertFalse(Livro.objects.filter(id__in=ids, disponivel=True).exists())
+        self.assertFalse(Copia.objects.filter(livro_id__in=ids, disponivel=True).exists())
+
+    def test_tudo_ou_nada_cancela_o_lote(self):
+        response = self.alugar([self.livros[0].id, self.emprestado.id, 9999])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([r["status"] for r in response.data["resultados"]], [424, 409, 404])
+        self.assertFalse(Emprestimo.objects.exists())
+        self.livros[0].refresh_from_db()
+        self.assertEqual(self.livros[0].copias_disponiveis, 1)
+
+    def test_melhor_esforco_processa_os_validos(self):
+        response = self.alugar([self.livros[0].id, self.emprestado.id], "melhor_esforco")
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r["status"] for r in response.data["resultados"]], [201, 409])
+        self.assertEqual(response.data["processados"], 1)
+        self.assertEqual(Emprestimo.objects.get().livro_id, self.livros[0].id)
+
+    def test_lote_invalido(self):
+        self.assertEqual(self.alugar([]).status_code, 400)
+        self.assertEqual(self.alugar([self.livros[0].id] * 2).status_code, 400)
+        self.assertEqual(self.alugar([self.livros[0].id], "parcial").status_code, 400)
+        with override_settings(LIVROS_MAX_LOTE=2):
+            self.assertEqual(self.alugar([l.id for l in self.livros]).status_code, 400)
+
+    def test_aluguel_em_lote_numera_cada_livro(self):
+        self.alugar([l.id for l in self.livros])
+        sequencias = sorted(Livro.objects.filter(id__in=[l.id for l in self.livros]).values_list("sequencia", flat=True))
+        self.assertEqual(len(set(sequencias)), 3)
+        self.assertEqual(sequencias[-1] - sequencias[0], 2)
+
+    def test_quantidade_de_queries_nao_depende_do_lote(self):
+        livros = self.criar_livros(20)
+        emprestimos = [self.emprestar(livro).id for livro in livros[10:]]
+        # Sequências + livros + UPDATE + cópias (3) + INSERT + resumo + leitura dos empréstimos
+        with self.assertMaxQueries(9):
+            self.assertEqual(self.alugar([l.id for l in livros[:10]]).status_code, 201)
+        # Sequências + empréstimos + UPDATE + livros + filas + cópias + livros + resumo
+        with self.assertMaxQueries(8):
+            self.assertEqual(self.devolver(emprestimos).status_code, 200)
+
+    def devolver_com_fila(self, quantidade):
+        # Cada livro devolvido tem outro usuário na fila
+        livros = self.criar_livros(quantidade)
+        emprestimos = [self.emprestar(livro).id for livro in livros]
+        for livro in livros:
+            fila = User.objects.create_user(
+                email=f"fila{livro.id}@teste.com", password="senha-forte-123", first_name="Fila", last_name="Teste"
+            )
+            Reserva.objects.create(livro=livro, usuario=fila)
+
+        with CaptureQueriesContext(connection) as consultas, self.assertNoLogs("livraria_api.metricas"):
+            response = self.devolver(emprestimos)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(r["entregue_a_reserva"] for r in response.data["resultados"]))
+        return len(consultas)
+
+    def test_fila_nao_aumenta_as_queries_da_devolucao(self):
+        self.assertEqual(self.devolver_com_fila(2), self.devolver_com_fila(10))
+
+    def test_devolve_varias_copias_do_mesmo_livro(self):
+        livro = self.criar_livros(1, copias_disponiveis=3)[0]
+        emprestimos = [self.emprestar(livro).id for _ in range(2)]
+        response = self.devolver(emprestimos)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(r["entregue_a_reserva"] is False for r in response.data["resultados"]))
+        livro.refresh_from_db()
+        self.assertEqual((livro.copias_disponiveis, livro.disponivel), (3, True))
+        self.assertFalse(Emprestimo.objects.filter(data_devolucao__isnull=True).exists())
+
+    def test_devolucao_em_lote_atende_a_fila(self):
+        livro = self.livros[0]
+        emprestimo = self.emprestar(livro)
+        outro = User.objects.create_user(
+            email="fila@teste.com", password="senha-forte-123", first_name="Fila", last_name="Teste"
+        )
+        Reserva.objects.create(livro=livro, usuario=outro)
+
+        response = self.devolver([emprestimo.id, 9999], "melhor_esforco")
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r["status"] for r in response.data["resultados"]], [200, 404])
+        self.assertTrue(response.data["resultados"][0]["entregue_a_reserva"])
+        self.assertEqual(Emprestimo.objects.get(data_devolucao__isnull=True).usuario_id, outro.id)
+        livro.refresh_from_db()
+        self.assertEqual(livro.copias_disponiveis, 0)
+
+    def test_devolucao_repetida_cancela_o_lote(self):
+        devolvido = self.emprestar(self.livros[0], data_devolucao=timezone.now())
+        ativo = self.emprestar(self.livros[1])
+        response = self.devolver([ativo.id, devolvido.id])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([r["status"] for r in response.data["resultados"]], [424, 400])
+        ativo.refresh_from_db()
+        self.assertIsNone(ativo.data_devolucao)
+
+
+class ListaEmprestimosTests(LivroTestCase):
+    def setUp(self):
+        super().setUp()
+        agora = timezone.now()
+        for i, livro in enumerate(self.criar_livros(4)):
+            self.emprestar(livro, data_devolucao=agora if i % 2 else None)
+
+    def test_filtra_por_status(self):
+        pendentes = self.client.get("/livros/meus-emprestimos/", {"status": "pendente"}).data
+        devolvidos = self.client.get("/livros/meus-emprestimos/", {"status": "devolvido"}).data
+        self.assertEqual(len(pendentes), 2)
+        self.assertEqual(len(devolvidos), 2)
+        self.assertTrue(all(e["data_devolucao"] is None for e in pendentes))
+
+    def test_status_invalido(self):
+        response = self.client.get("/livros/meus-emprestimos/", {"status": "x"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_paginacao(self):
+        pagina = self.client.get("/livros/meus-emprestimos/", {"page_size": 3}).data
+        self.assertEqual(len(pagina["results"]), 3)
+        resto = self.client.get("/livros/meus-emprestimos/", {"page_size": 3, "cursor": pagina["next"]}).data
+        self.assertEqual(len(resto["results"]), 1)
+        self.assertIn("titulo", resto["results"][0]["livro"])
+
+
+class ResumoEmprestimosTests(LivroTestCase):
+    url = "/livros/meus-emprestimos/resumo/"
+
+    def setUp(self):
+        super().setUp()
+        self.livros = self.criar_livros(3)
+
+    def alugar(self, livro):
+        return self.client.post(f"/livros/{livro.id}/alugar/").data["id"]
+
+    def resumo(self):
+        return self.client.get(self.url).data
+
+    def test_sem_emprestimos(self):
+        with self.assertMaxQueries(1):
+            resumo = self.resumo()
+        self.assertEqual(resumo, {"ativos": 0, "devolvidos": 0, "atrasados": 0, "ultima_atividade": None})
+
+    def test_aluguel_e_devolucao_atualizam_o_resumo(self):
+        emprestimo_id = self.alugar(self.livros[0])
+        self.alugar(self.livros[1])
+        self.assertEqual(self.resumo()["ativos"], 2)
+
+        devolucao = self.client.post(f"/livros/emprestimo/{emprestimo_id}/devolver/").data["data_devolucao"]
+        resumo = ResumoEmprestimos.objects.get(usuario=self.user)
+        self.assertEqual((resumo.ativos, resumo.devolvidos), (1, 1))
+        self.assertEqual(resumo.ultima_atividade, devolucao)
+        self.client.post(f"/livros/emprestimo/{emprestimo_id}/devolver/")
+        self.assertEqual(ResumoEmprestimos.objects.get(usuario=self.user).devolvidos, 1)
+
+    def test_lotes_e_fila_de_reservas(self):
+        leitor = User.objects.create_user(
+            email="fila@teste.com", password="senha-forte-123", first_name="Fila", last_name="Teste"
+        )
+        ids = [l.id for l in self.livros]
+        emprestimos = [
+            r["emprestimo"]["id"]
+            for r in self.client.post("/livros/alugar/", {"livros": ids}, format="json").data["resultados"]
+        ]
+        Reserva.objects.create(livro=self.livros[0], usuario=leitor)
+        self.client.post("/livros/emprestimos/devolver/", {"emprestimos": emprestimos[:2]}, format="json")
+
+        resumo = self.resumo()
+        self.assertEqual((resumo["ativos"], resumo["devolvidos"]), (1, 2))
+        self.assertEqual(ResumoEmprestimos.objects.get(usuario=leitor).ativos, 1)
+
+    def test_atrasados(self):
+        emprestimo_id = self.alugar(self.livros[0])
+        self.alugar(self.livros[1])
+        Emprestimo.objects.filter(id=emprestimo_id).update(data_prevista=timezone.now() - timezone.timedelta(days=1))
+        # Só conta depois da marcação, e sem consultar os empréstimos
+        self.assertEqual(self.resumo()["atrasados"], 0)
+
+        marcar_atrasados()
+        with self.assertMaxQueries(1):
+            self.assertEqual(self.resumo()["atrasados"], 1)
+
+        self.client.post(f"/livros/emprestimo/{emprestimo_id}/devolver/")
+        self.assertEqual(self.resumo()["atrasados"], 0)
+
+    def test_devolucao_em_lote_desconta_os_atrasados(self):
+        ontem = timezone.now() - timezone.timedelta(days=1)
+        ids = [self.emprestar(livro, data_prevista=ontem).id for livro in self.livros[:2]]
+        self.emprestar(self.livros[2])
+        marcar_atrasados()
+        self.assertEqual(self.resumo()["atrasados"], 2)
+
+        self.client.post("/livros/emprestimos/devolver/", {"emprestimos": ids[:1]}, format="json")
+        self.assertEqual(self.resumo()["atrasados"], 1)
+
+    def test_remocao_do_livro_desconta_o_historico(self):
+        emprestimo_id = self.alugar(self.livros[0])
+        self.client.post(f"/livros/emprestimo/{emprestimo_id}/devolver/")
+        atrasado_id = self.alugar(self.livros[0])
+        self.alugar(self.livros[1])
+        Emprestimo.objects.filter(id=atrasado_id).update(data_prevista=timezone.now() - timezone.timedelta(days=1))
+        marcar_atrasados()
+
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.delete(f"/livros/{self.livros[0].id}/deletar/")
+        resumo = self.resumo()
+        self.assertEqual((resumo["ativos"], resumo["devolvidos"]), (1, 0))
+        self.assertEqual(resumo["atrasados"], 0)
+
+
+class AtrasosTests(LivroTestCase):
+    def setUp(self):
+        super().setUp()
+        self.livros = self.criar_livros(6)
+        self.ontem = timezone.now() - timezone.timedelta(days=1)
+
+    def test_aluguel_define_a_data_prevista(self):
+        response = self.client.post(f"/livros/{self.livros[0].id}/alugar/")
+        emprestimo = Emprestimo.objects.get(id=response.data["id"])
+        self.assertAlmostEqual(
+            emprestimo.data_prevista - emprestimo.data_emprestimo, timezone.timedelta(days=14),
+            delta=timezone.timedelta(seconds=1)
+        )
+        with override_settings(LIVROS_PRAZO_EMPRESTIMO_DIAS=7):
+            response = self.client.post("/livros/alugar/", {"livros": [self.livros[1].id]}, format="json")
+        emprestimo = Emprestimo.objects.get(id=response.data["resultados"][0]["emprestimo"]["id"])
+        self.assertLess(emprestimo.data_prevista, timezone.now() + timezone.timedelta(days=8))
+
+    def test_marca_so_os_ativos_vencidos_em_lotes(self):
+        vencidos = [self.emprestar(livro, data_prevista=self.ontem).id for livro in self.livros[:5]]
+        self.emprestar(self.livros[5])
+        self.emprestar(self.livros[0], data_prevista=self.ontem, data_devolucao=timezone.now())
+
+        lotes = []
+        receptor = lambda sender, emprestimos, **kwargs: lotes.append(emprestimos)
+        emprestimos_atrasados.connect(receptor)
+        self.addCleanup(emprestimos_atrasados.disconnect, receptor)
+
+        saida = StringIO()
+        call_command("marcar_atrasados", "--lote", "2", stdout=saida)
+        self.assertIn("5 empréstimos", saida.getvalue())
+        self.assertEqual([len(lote) for lote in lotes], [2, 2, 1])
+        self.assertCountEqual(
+            Emprestimo.objects.filter(atraso_notificado_em__isnull=False).values_list("id", flat=True), vencidos
+        )
+        self.assertEqual(marcar_atrasados(), 0)
+
+    def test_limite_deixa_o_resto_para_a_proxima_rodada(self):
+        for livro in self.livros[:3]:
+            self.emprestar(livro, data_prevista=self.ontem)
+        self.assertEqual(marcar_atrasados(tamanho_lote=2, limite=2), 2)
+        self.assertEqual(marcar_atrasados(tamanho_lote=2, limite=2), 1)
+
+    def test_pendentes_usam_o_indice(self):
+        sql, params = pendentes(timezone.now()).values("id")[:100].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plano = " ".join(str(linha[-1]) for linha in cursor.fetchall())
+        self.assertIn("emprestimo_ativo_prevista_idx", plano)
+        self.assertNotIn("TEMP B-TREE", plano)
+
+
+class QueriesPorEndpointTests(LivroTestCase):
+    """
+    O número de queries dos endpoints de listagem não pode crescer com o
+    número de linhas (N+1).
+    """
+
+    def setUp(self):
+        super().setUp()
+        for livro in self.criar_livros(20):
+            self.emprestar(livro)
+
+    def assertQueriesConstantes(self, url, params=None, maximo=1):
+        cache.clear()
+        with self.assertMaxQueries(maximo):
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+
+    def test_lista_de_livros(self):
+        self.assertQueriesConstantes("/livros/")
+
+    def test_lista_de_livros_paginada(self):
+        self.assertQueriesConstantes("/livros/", {"page_size": 5})
+        self.assertQueriesConstantes("/livros/", {"page_size": 5, "count": "true"}, maximo=2)
+
+    def test_busca_de_livros(self):
+        self.assertQueriesConstantes("/livros/", {"q": "livro"})
+
+    def test_meus_emprestimos(self):
+        self.assertQueriesConstantes("/livros/meus-emprestimos/")
+        self.assertQueriesConstantes("/livros/meus-emprestimos/", {"status": "pendente"})
+        self.assertQueriesConstantes("/livros/meus-emprestimos/", {"page_size": 5})
+
+
+class ImportarLivrosTests(LivroTestCase):
+    CSV = (
+        "titulo,autor,ano,disponivel\n"
+        "Admirável Mundo Novo,Aldous Huxley,1932,true\n"
+        "Sem ano,Autor,,true\n"
+        "1984,George Orwell,1949,\n"
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.user.is_superuser = True
+        self.user.save()
+
+    def importar(self, nome, conteudo, **extra):
+        arquivo = SimpleUploadedFile(nome, conteudo.encode())
+        return self.client.post("/livros/importar/", {"arquivo": arquivo, **extra}, format="multipart")
+
+    def test_importa_csv_e_reporta_linhas_invalidas(self):
+        response = self.importar("livros.csv", self.CSV)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["importados"], 2)
+        self.assertEqual(response.data["total_erros"], 1)
+        self.assertEqual(response.data["erros"][0]["linha"], 3)
+        self.assertTrue(Livro.objects.get(titulo="1984").disponivel)
+
+    def test_importa_jsonl(self):
+        conteudo = (
+            '{"titulo": "Duna", "autor": "Frank Herbert", "ano": 1965, "disponivel": false}\n'
+            "não é json\n"
+            '{"titulo": "' + "x" * 201 + '", "autor": "A", "ano": 1}\n'
+        )
+        response = self.importar("livros.txt", conteudo, formato="jsonl")
+        self.assertEqual(response.data["importados"], 1)
+        self.assertEqual([e["linha"] for e in response.data["erros"]], [2, 3])
+        self.assertFalse(Livro.objects.get(titulo="Duna").disponivel)
+
+    def test_importa_copias(self):
+        conteudo = '{"titulo": "Duna", "autor": "Frank Herbert", "ano": 1965, "copias_disponiveis": 3}\n'
+        self.importar("livros.jsonl", conteudo)
+        livro = Livro.objects.get(titulo="Duna")
+        self.assertEqual(livro.copias_disponiveis, 3)
+        self.assertEqual(livro.copias.filter(disponivel=True).count(), 3)
+
+    def test_livros_importados_entram_na_busca(self):
+        self.importar("livros.csv", self.CSV)
+        response = self.client.get("/livros/", {"q": "admiravel"})
+        self.assertEqual(len(response.data), 1)
+
+    def test_apenas_bibliotecario(self):
+        self.user.is_superuser = False
+        self.user.save()
+        self.assertEqual(self.importar("livros.csv", self.CSV).status_code, 403)
+
+    def test_formato_desconhecido(self):
+        self.assertEqual(self.importar("livros.xls", self.CSV).status_code, 400)
+
+    def test_comando_import_livros_em_lotes(self):
+        linhas = "".join(f"Livro {i},Autor,2000,true\n" for i in range(25))
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", encoding="utf-8") as arquivo:
+            arquivo.write("titulo,autor,ano,disponivel\n" + linhas)
+            arquivo.flush()
+            saida = StringIO()
+            call_command("import_livros", arquivo.name, "--lote", "10", stdout=saida)
+        self.assertIn("25 livros importados", saida.getvalue())
+        self.assertEqual(Livro.objects.count(), 25)
+
+
+class ExportacaoTests(LivroTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.is_superuser = True
+        self.user.save()
+        self.livros = self.criar_livros(3)
+        self.emprestar(self.livros[0])
+
+    def conteudo(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_exporta_livros_em_ndjson(self):
+        response = self.client.get("/livros/exportar/")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        linhas = [json.loads(l) for l in self.conteudo(response).splitlines()]
+        self.assertEqual([l["id"] for l in linhas], [l.id for l in self.livros])
+        self.assertEqual(set(linhas[0]), {"id", "titulo", "autor", "ano", "disponivel", "copias_disponiveis"})
+
+    def test_exporta_emprestimos_em_csv(self):
+        response = self.client.get("/livros/emprestimos/exportar/", {"formato": "csv"})
+        linhas = list(csv.DictReader(self.conteudo(response).splitlines()))
+        self.assertEqual(len(linhas), 1)
+        self.assertEqual(linhas[0]["usuario__email"], self.user.email)
+        self.assertEqual(linhas[0]["data_devolucao"], "")
+
+    def test_datas_iguais_nos_dois_formatos(self):
+        ndjson = json.loads(self.conteudo(self.client.get("/livros/emprestimos/exportar/")))
+        csv_ = next(csv.DictReader(self.conteudo(
+            self.client.get("/livros/emprestimos/exportar/", {"formato": "csv"})
+        ).splitlines()))
+        api = self.client.get("/livros/meus-emprestimos/").data[0]
+        self.assertEqual(ndjson["data_emprestimo"], csv_["data_emprestimo"])
+        self.assertEqual(ndjson["data_emprestimo"], api["data_emprestimo"])
+        self.assertEqual(ndjson["data_prevista"], csv_["data_prevista"])
+
+    def test_blocos_respeitam_chunk_size(self):
+        from .exportacao import CAMPOS_LIVRO, gerar_ndjson
+        blocos = list(gerar_ndjson(Livro.objects.all(), CAMPOS_LIVRO, chunk_size=2))
+        self.assertEqual(len(blocos), 2)
+
+    def test_formato_invalido(self):
+        self.assertEqual(self.client.get("/livros/exportar/", {"formato": "xml"}).status_code, 400)
+
+    def test_apenas_bibliotecario(self):
+        self.user.is_superuser = False
+        self.user.save()
+        self.assertEqual(self.client.get("/livros/exportar/").status_code, 403)
+
+
+class AsyncViewsTests(LivroTestCase):
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.user)
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        livros = self.criar_livros(5)
+        Livro.objects.create(titulo="Revolução", autor="Autor", ano=1990)
+        self.emprestar(livros[0])
+        self.emprestar(livros[1], data_devolucao=timezone.now())
+
+    def get_async(self, url, params=None, **headers):
+        headers.setdefault("Authorization", f"Token {self.token.key}")
+        return async_to_sync(self.async_client.get)(url, params or {}, headers=headers)
+
+    def assertRespostasIguais(self, url_sync, url_async, params=None):
+        cache.clear()
+        sync = self.client.get(url_sync, params or {})
+        cache.clear()
+        assincrona = self.get_async(url_async, params)
+        self.assertEqual(assincrona.status_code, sync.status_code)
+        self.assertEqual(assincrona.content, sync.content)
+
+    def test_catalogo_async_igual_ao_sync(self):
+        self.assertRespostasIguais("/livros/", "/livros/async/")
+        self.assertRespostasIguais("/livros/", "/livros/async/", {"page_size": 2, "count": "true"})
+        self.assertRespostasIguais("/livros/", "/livros/async/", {"q": "revolucao"})
+        self.assertRespostasIguais("/livros/", "/livros/async/", {"cursor": "lixo"})
+
+    def test_emprestimos_async_igual_ao_sync(self):
+        url_async = "/livros/async/meus-emprestimos/"
+        self.assertRespostasIguais("/livros/meus-emprestimos/", url_async)
+        self.assertRespostasIguais("/livros/meus-emprestimos/", url_async, {"status": "pendente"})
+        self.assertRespostasIguais("/livros/meus-emprestimos/", url_async, {"page_size": 1})
+        self.assertRespostasIguais("/livros/meus-emprestimos/", url_async, {"status": "x"})
+
+    def test_me_async_igual_ao_sync(self):
+        self.assertRespostasIguais("/accounts/me/", "/accounts/async/me/")
+
+    def test_catalogo_async_usa_etag(self):
+        etag = self.get_async("/livros/async/")["ETag"]
+        self.assertEqual(self.get_async("/livros/async/", If_None_Match=etag).status_code, 304)
+
+    def test_sem_credenciais(self):
+        self.assertEqual(self.get_async("/livros/async/", Authorization="").status_code, 401)
+        self.assertEqual(self.get_async("/accounts/async/me/", Authorization="Token x").status_code, 401)
+
+    @override_settings(ACCOUNTS_AUTH_MODE="jwt")
+    def test_async_com_jwt(self):
+        access = gerar_tokens_jwt(self.user)["access"]
+        response = self.get_async("/accounts/async/me/", Authorization=f"Bearer {access}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["email"], self.user.email)
+
+
+class SerializacaoRapidaTests(LivroTestCase):
+    # A saída do caminho rápido deve ser byte a byte igual à dos serializers.
+    def setUp(self):
+        super().setUp()
+        livros = self.criar_livros(4)
+        livros.append(Livro.objects.create(titulo='Ação "entre aspas"\u2028', autor="Ünïcødé \\ 🦉", ano=1))
+        self.emprestar(livros[0])
+        self.emprestar(livros[4], data_devolucao=timezone.now())
+
+    def renderizar(self, dados):
+        return JSONRenderer().render(dados)
+
+    def assertIgualAosSerializers(self, url, esperado, params=None):
+        cache.clear()
+        response = self.client.get(url, params or {}, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.renderizar(esperado))
+
+    def test_catalogo(self):
+        livros = Livro.objects.order_by("id")
+        self.assertIgualAosSerializers("/livros/", LivroSerializer(livros, many=True).data)
+
+        pagina = LivroSerializer(livros[:2], many=True).data
+        response = self.client.get("/livros/", {"page_size": 2})
+        self.assertEqual(
+            json.dumps(response.json()["results"], ensure_ascii=False, separators=(",", ":")).encode(),
+            self.renderizar(pagina)
+        )
+
+    def test_busca(self):
+        livros = Livro.objects.filter(autor__startswith="Ü")
+        self.assertIgualAosSerializers("/livros/", LivroSerializer(livros, many=True).data, {"q": "acao"})
+
+    def test_meus_emprestimos(self):
+        emprestimos = Emprestimo.objects.order_by("id")
+        self.assertIgualAosSerializers("/livros/meus-emprestimos/", EmprestimoSerializer(emprestimos, many=True).data)
+
+    def test_renderer_sem_orjson(self):
+        dados = EmprestimoSerializer(Emprestimo.objects.order_by("id"), many=True).data
+        with mock.patch("livros.serializacao.orjson", None):
+            self.assertEqual(FastJSONRenderer().render(dados), self.renderizar(dados))
+        self.assertEqual(FastJSONRenderer().render(dados), self.renderizar(dados))
+
+
+class BrokerFalso:
+    def __init__(self):
+        self.publicados = []
+
+    def publish(self, eventos):
+        self.publicados.extend(eventos)
+
+
+class EventosTests(LivroTestCase):
+    def setUp(self):
+        super().setUp()
+        self.livro = Livro.objects.create(titulo="Duna", autor="Frank Herbert", ano=1965)
+        self.broker = BrokerFalso()
+        patcher = mock.patch("livros.eventos.get_broker", return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_aluguel_e_devolucao_publicam_deltas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            emprestimo = self.client.post(f"/livros/{self.livro.id}/alugar/").data
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/livros/emprestimo/{emprestimo['id']}/devolver/")
+
+        self.assertEqual(self.broker.publicados, [
+            {"livro": self.livro.id, "disponivel": False, "copias_disponiveis": 0},
+            {"livro": self.livro.id, "disponivel": True, "copias_disponiveis": 1},
+        ])
+
+    def test_nada_e_publicado_sem_commit(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.post(f"/livros/{self.livro.id}/alugar/")
+        self.assertEqual(self.broker.publicados, [])
+
+    def test_remocao(self):
+        self.user.is_superuser = True
+        self.user.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/livros/{self.livro.id}/deletar/")
+        self.assertEqual(self.broker.publicados, [{"livro": self.livro.id, "removido": True}])
+
+    def test_importacao_publica_um_evento_por_lote(self):
+        from .importacao import importar_livros
+
+        linhas = "".join(f"Livro {i},Autor,2000\n" for i in range(5))
+        with self.captureOnCommitCallbacks(execute=True):
+            importar_livros(StringIO("titulo,autor,ano\n" + linhas), "csv", tamanho_lote=3)
+        self.assertEqual(self.broker.publicados, [{"tipo": "catalogo", "novos": 3}, {"tipo": "catalogo", "novos": 2}])
+
+
+class InMemoryBrokerTests(LivroTestCase):
+    def test_entrega_aos_assinantes_filtrando_por_livro(self):
+        from .eventos import InMemoryBroker
+
+        broker = InMemoryBroker()
+
+        async def assinar():
+            assinatura = await broker.subscribe({1})
+            # publish vem de outra thread, como nas views síncronas
+            thread = threading.Thread(target=broker.publish, args=([{"livro": 2}, {"livro": 1}],))
+            thread.start()
+            thread.join()
+            primeiro = await assinatura.proximo(1)
+            segundo = await assinatura.proximo(0.01)
+            broker.remover(assinatura)
+            return primeiro, segundo
+
+        self.assertEqual(async_to_sync(assinar)(), ({"livro": 1}, None))
+        self.assertEqual(broker.assinaturas, set())
+
+    def test_assinante_atrasado_recebe_resync(self):
+        from .eventos import RESYNC, InMemoryBroker
+
+        broker = InMemoryBroker(tamanho_fila=2)
+
+        async def assinar():
+            assinatura = await broker.subscribe()
+            for livro_id in range(3):
+                assinatura.entregar({"livro": livro_id})
+            return await assinatura.proximo(1)
+
+        self.assertEqual(async_to_sync(assinar)(), RESYNC)
+
+    def test_endpoint_sse(self):
+        from .eventos import get_broker
+
+        token = Token.objects.create(user=self.user)
+
+        async def ler():
+            response = await self.async_client.get(
+                "/livros/eventos/", {"livros": "7"}, headers={"Authorization": f"Token {token.key}"}
+            )
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            conteudo = aiter(response.streaming_content)
+            primeiro = await anext(conteudo)
+            get_broker().publish([{"livro": 7, "disponivel": False, "copias_disponiveis": 0}])
+            segundo = await anext(conteudo)
+            await conteudo.aclose()
+            return primeiro, segundo
+
+        primeiro, segundo = async_to_sync(ler)()
+        self.assertEqual(primeiro, b"retry: 3000\n\n")
+        self.assertEqual(
+            segundo, b'event: disponibilidade\ndata: {"livro":7,"disponivel":false,"copias_disponiveis":0}\n\n'
+        )
+
+
+class MetricasTests(LivroTestCase):
+    def setUp(self):
+        super().setUp()
+        self.criar_livros(3)
+
+    def server_timing(self, response):
+        partes = [parte.strip().split(";") for parte in response["Server-Timing"].split(",")]
+        return {nome: dict(p.split("=", 1) for p in resto) for nome, *resto in partes}
+
+    def metricas(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/livros/")
+        tempos = self.server_timing(response)
+        self.assertEqual(set(tempos), {"total", "db", "serializacao"})
+        self.assertEqual(tempos["db"]["desc"], f'"{len(queries)} queries"')
+        self.assertGreater(float(tempos["serializacao"]["dur"]), 0)
+        self.assertGreaterEqual(float(tempos["total"]["dur"]), float(tempos["db"]["dur"]))
+
+    def test_histogramas_por_view(self):
+        self.client.get("/livros/")
+        texto = self.metricas()
+        self.assertIn("# TYPE livraria_requisicao_segundos histogram", texto)
+        self.assertRegex(texto, r'livraria_queries_count\{view="LivroListView"\} [1-9]')
+        self.assertRegex(texto, r'livraria_resposta_bytes_bucket\{view="LivroListView",le="\+Inf"\} [1-9]')
+
+    def test_view_async_conta_queries(self):
+        token = Token.objects.create(user=self.user)
+        response = async_to_sync(self.async_client.get)(
+            "/livros/async/", headers={"Authorization": f"Token {token.key}"}
+        )
+        self.assertEqual(response.status_code, 200)
+        tempos = self.server_timing(response)
+        self.assertNotEqual(tempos["db"]["desc"], '"0 queries"')
+        self.assertGreater(float(tempos["serializacao"]["dur"]), 0)
+
+    def test_orcamento_de_queries(self):
+        with override_settings(METRICAS_ORCAMENTO_QUERIES=0), self.assertLogs("livraria_api.metricas") as logs:
+            self.client.get("/livros/")
+        self.assertIn("LivroListView", logs.output[0])
+        self.assertRegex(self.metricas(), r'livraria_orcamento_queries_excedido_total\{view="LivroListView"\} [1-9]')
+
+    @override_settings(METRICAS_ORCAMENTO_QUERIES=0, METRICAS_ORCAMENTO_QUERIES_POR_VIEW={"LivroListView": 5})
+    def test_orcamento_por_view(self):
+        with self.assertNoLogs("livraria_api.metricas"):
+            self.client.get("/livros/")
+        with self.assertLogs("livraria_api.metricas"):
+            self.client.get("/livros/meus-emprestimos/")
+
+    def test_metricas_restritas_por_ip(self):
+        response = self.client.get("/metrics", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, 403)
+
+
+class PerfilBancoTests(SimpleTestCase):
+    def test_pragmas_aplicados_a_cada_conexao(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            configuracao = {**connections.settings["default"], "NAME": f"{pasta}/perfil.sqlite3"}
+            conexao = connections["default"].__class__(configuracao, alias="perfil")
+            pragmas = {"journal_mode": "WAL", "synchronous": "NORMAL", "busy_timeout": 1234}
+            try:
+                with override_settings(SQLITE_PRAGMAS=pragmas):
+                    conexao.ensure_connection()
+                with conexao.cursor() as cursor:
+                    valores = []
+                    for nome in pragmas:
+                        cursor.execute(f"PRAGMA {nome}")
+                        valores.append(cursor.fetchone()[0])
+            finally:
+                conexao.close()
+        self.assertEqual(valores, ["wal", 1, 1234])
+
+
+@override_settings(LIVRARIA_REPLICAS=["replica"])
+class ReplicaTests(APITransactionTestCase):
+    """
+    O alias `replica` é um espelho do banco de teste (ver settings), com
+    conexão própria. Sem a transação do TestCase, que essa conexão não
+    enxergaria, as duas veem os mesmos dados: os testes conferem por qual
+    delas cada requisição leu.
+    """
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.user, self.outro = [
+            User.objects.create_user(
+                email=f"{nome}@teste.com", password="senha-forte-123", first_name=nome, last_name="Leitor"
+            )
+            for nome in ("leitor", "outro")
+        ]
+        self.client.force_authenticate(self.user)
+        self.livro = Livro.objects.create(titulo="Duna", autor="Frank Herbert", ano=1965)
+
+    def leituras_na_replica(self, url, **params):
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            self.assertEqual(self.client.get(url, params).status_code, 200)
+        return len(replica)
+
+    def test_listagens_leem_da_replica(self):
+        for url in ("/livros/", "/livros/meus-emprestimos/", "/livros/meus-emprestimos/resumo/"):
+            self.assertGreater(self.leituras_na_replica(url), 0, url)
+
+    def test_views_async_leem_da_replica(self):
+        token = Token.objects.create(user=self.user)
+        for url in ("/livros/async/", "/livros/async/meus-emprestimos/"):
+            with CaptureQueriesContext(connections["replica"]) as replica:
+                response = async_to_sync(self.async_client.get)(url, headers={"Authorization": f"Token {token.key}"})
+            self.assertEqual(response.status_code, 200)
+            self.assertGreater(len(replica), 0, url)
+
+    def test_escrita_vai_para_o_primario_e_fixa_o_usuario(self):
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            self.assertEqual(self.client.post(f"/livros/{self.livro.id}/alugar/").status_code, 201)
+        self.assertEqual(len(replica), 0)
+
+        # Quem escreveu lê do primário; os demais seguem na réplica
+        self.assertEqual(self.leituras_na_replica("/livros/meus-emprestimos/"), 0)
+        self.assertEqual(self.leituras_na_replica("/livros/"), 0)
+        self.client.force_authenticate(self.outro)
+        self.assertGreater(self.leituras_na_replica("/livros/"), 0)
+
+    def test_fixacao_expira_com_a_janela(self):
+        with override_settings(LIVRARIA_REPLICA_JANELA=0):
+            self.client.post(f"/livros/{self.livro.id}/alugar/")
+            self.assertGreater(self.leituras_na_replica("/livros/meus-emprestimos/"), 0)
+
+    def test_escrita_com_erro_nao_fixa(self):
+        self.assertEqual(self.client.post("/livros/9999/alugar/").status_code, 404)
+        self.assertGreater(self.leituras_na_replica("/livros/"), 0)
+
+    def test_outras_views_leem_do_primario(self):
+        self.assertEqual(self.leituras_na_replica("/livros/alteracoes/", desde=0), 0)
+
+
+class AlteracoesCatalogoTests(LivroTestCase):
+    def setUp(self):
+        super().setUp()
+        self.livros = [
+            Livro.objects.create(titulo=f"Livro {i}", autor="Autor", ano=2000) for i in range(3)
+        ]
+
+    def alteracoes(self, desde=0, **params):
+        response = self.client.get("/livros/alteracoes/", {"desde": desde, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_primeira_sincronizacao_traz_tudo(self):
+        dados = self.alteracoes()
+        self.assertEqual([l["id"] for l in dados["livros"]], [l.id for l in self.livros])
+        self.assertEqual(dados["removidos"], [])
+        self.assertTrue(dados["completo"])
+        self.assertEqual(dados["sequencia"], self.livros[-1].sequencia)
+
+    def test_traz_so_o_que_mudou(self):
+        desde = self.alteracoes()["sequencia"]
+        self.assertEqual(self.alteracoes(desde)["livros"], [])
+
+        self.client.post(f"/livros/{self.livros[1].id}/alugar/")
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.delete(f"/livros/{self.livros[0].id}/deletar/")
+
+        dados = self.alteracoes(desde)
+        self.assertEqual([(l["id"], l["disponivel"]) for l in dados["livros"]], [(self.livros[1].id, False)])
+        self.assertEqual([r["id"] for r in dados["removidos"]], [self.livros[0].id])
+        self.assertGreater(dados["removidos"][0]["sequencia"], dados["livros"][0]["sequencia"])
+
+    def test_aluguel_recusado_nao_muda_a_sequencia(self):
+        self.assertEqual(self.client.post(f"/livros/{self.livros[0].id}/alugar/").status_code, 201)
+        desde = self.alteracoes()["sequencia"]
+
+        self.assertEqual(self.client.post(f"/livros/{self.livros[0].id}/alugar/").status_code, 409)
+        self.assertEqual(self.client.post("/livros/9999/alugar/").status_code, 404)
+        self.assertEqual(self.alteracoes(desde)["livros"], [])
+
+    def test_pagina_pela_sequencia(self):
+        primeira = self.alteracoes(page_size=2)
+        self.assertEqual(len(primeira["livros"]), 2)
+        self.assertFalse(primeira["completo"])
+        resto = self.alteracoes(primeira["sequencia"], page_size=2)
+        self.assertEqual([l["id"] for l in resto["livros"]], [self.livros[2].id])
+        self.assertTrue(resto["completo"])
+
+    def test_importacao_numera_cada_livro(self):
+        from .importacao import importar_livros
+
+        desde = self.alteracoes()["sequencia"]
+        importar_livros(StringIO("titulo,autor,ano\nA,B,1\nC,D,2\n"), "csv")
+        sequencias = [l["sequencia"] for l in self.alteracoes(desde)["livros"]]
+        self.assertEqual(sequencias, [desde + 1, desde + 2])
+
+    def test_desde_invalido(self):
+        self.assertEqual(self.client.get("/livros/alteracoes/").status_code, 400)
+        self.assertEqual(self.client.get("/livros/alteracoes/", {"desde": -1}).status_code, 400)
+
+
+class SequenciaConcorrenteTests(TransactionTestCase):
+    def test_sequencias_seguem_a_ordem_dos_commits(self):
+        lento, rapido = [
+            Livro.objects.create(titulo=titulo, autor="Autor", ano=2000) for titulo in ("Lento", "Rápido")
+        ]
+        numerado, liberar, terminou = threading.Event(), threading.Event(), threading.Event()
+
+        def escritor_lento():
+            # Pega a sequência e só confirma depois que o outro tentou escrever
+            try:
+                with transaction.atomic():
+                    lento.save()
+                    numerado.set()
+                    liberar.wait(5)
+            finally:
+                connection.close()
+
+        def escritor_rapido():
+            try:
+                numerado.wait(5)
+                rapido.save()
+                terminou.set()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=escritor_lento), threading.Thread(target=escritor_rapido)]
+        for thread in threads:
+            thread.start()
+        numerado.wait(5)
+        # O segundo escritor espera o contador, travado até o commit do primeiro
+        self.assertFalse(terminou.wait(0.5))
+        liberar.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(terminou.is_set())
+        self.assertGreater(rapido.sequencia, lento.sequencia)
+        sequencias = list(Livro.objects.order_by("sequencia").values_list("titulo", flat=True))
+        self.assertEqual(sequencias, ["Lento", "Rápido"])
@@ -1,13 +1,25 @@
 from django.urls import path 
 from .views import *
+from .async_views import EventosDisponibilidadeView, LivroListAsyncView, ListaEmprestimosAsyncView
 
 urlpatterns = [
     path("", LivroListView.as_view()),
+    path("async/", LivroListAsyncView.as_view()),
+    path("async/meus-emprestimos/", ListaEmprestimosAsyncView.as_view()),
+    path("eventos/", EventosDisponibilidadeView.as_view()),
+    path("alteracoes/", AlteracoesCatalogoView.as_view()),
     path("adicionar/", AdicionarLivroView.as_view()), 
+    path("importar/", ImportarLivrosView.as_view()),
+    path("exportar/", ExportarLivrosView.as_view()),
+    path("alugar/", AlugarLoteView.as_view()),
+    path("emprestimos/devolver/", DevolverLoteView.as_view()),
+    path("emprestimos/exportar/", ExportarEmprestimosView.as_view()),
     path("<int:livro_id>/atualizar/", AtualizaLivroView.as_view()), 
     path("<int:livro_id>/deletar/", DeletarLivroView.as_view()),
     path("<int:livro_id>/alugar/", AlugarLivrosView.as_view()), 
+    path("<int:livro_id>/reserva/", ReservaView.as_view()),
     path("meus-emprestimos/", ListaEmprestimos.as_view()),
+    path("meus-emprestimos/resumo/", ResumoEmprestimosView.as_view()),
     path("emprestimo/<int:emprestimo_id>/devolver/", DevolverLivro.as_view())
 ]
 
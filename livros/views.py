@@ -1,16 +1,64 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Livro, Emprestimo
-from .serializers import LivroSerializer, EmprestimoSerializer, AlugarLivroSerializer, DevolverLivroSerializer, LivroInputSerializer
+from rest_framework.parsers import MultiPartParser
+from .models import Copia, Livro, LivroRemovido, Emprestimo, Reserva, ResumoEmprestimos, proximas_sequencias, travar_sequencias
+from .serializers import LivroSerializer, EmprestimoSerializer, AlugarLivroSerializer, DevolverLivroSerializer, LivroInputSerializer, ReservaSerializer, AlugarLoteSerializer, DevolverLoteSerializer, ResumoEmprestimosSerializer
 from django.utils import timezone
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework import serializers
+from .pagination import KeysetPagination
+from .importacao import FORMATOS, detectar_formato, importar_livros
+from .exportacao import CAMPOS_EMPRESTIMO, CAMPOS_LIVRO, GERADORES, FORMATOS as EXPORT_FORMATOS
+from django.http import StreamingHttpResponse
+from .search import get_search_backend
+from .cache import bump_catalog_version, get_cache, get_catalog_version, catalog_cache_key, get_etag, get_timeout
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.renderers import BrowsableAPIRenderer
+from .serializacao import FastJSONRenderer, emprestimos_dicts, emprestimos_values, livro_dict, livros_dicts, livros_values
+from . import lotes
+from django.db import DEFAULT_DB_ALIAS
+from livraria_api.roteamento import LeituraEmReplicaMixin, banco_de_leitura, get_janela
 
 
-class LivroListView(APIView):
+def catalogo_queryset(params):
+    q = params.get("q", "")
+
+    # Se houver busca, usa o índice textual (título/autor) ordenado por relevância
+    if q:
+        backend = get_search_backend()
+        livros = backend.search(Livro.objects.all(), q)
+        paginator = KeysetPagination(ordering=backend.ordering)
+    else:
+        livros = Livro.objects.all()
+        paginator = KeysetPagination()
+
+    disponivel = params.get("disponivel")
+    if disponivel is not None:
+        livros = livros.filter(disponivel=disponivel.lower() in ("1", "true", "sim"))
+
+    return livros, paginator
+
+
+def emprestimos_queryset(usuario_id, status=None):
+    emprestimos = Emprestimo.objects.filter(usuario_id=usuario_id).select_related("livro")
+
+    if status == "pendente":
+        emprestimos = emprestimos.filter(data_devolucao__isnull=True)
+    elif status == "devolvido":
+        emprestimos = emprestimos.filter(data_devolucao__isnull=False)
+    elif status:
+        raise serializers.ValidationError({"erro": "Status deve ser 'pendente' ou 'devolvido'."})
+
+    return emprestimos
+
+
+class LivroListView(LeituraEmReplicaMixin, APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
     @swagger_auto_schema(
         operation_description="Lista todos os livros ou busca por título/autor.",
@@ -20,25 +68,133 @@ class LivroListView(APIView):
                 openapi.IN_QUERY,
                 description="Texto para busca por título ou autor",
                 type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'page_size',
+                openapi.IN_QUERY,
+                description="Ativa a paginação por cursor com o tamanho de página informado",
+                type=openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'cursor',
+                openapi.IN_QUERY,
+                description="Cursor opaco retornado em 'next' ou 'previous'",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'count',
+                openapi.IN_QUERY,
+                description="Se 'true', inclui o total de livros na resposta paginada",
+                type=openapi.TYPE_BOOLEAN
+            ),
+            openapi.Parameter(
+                'disponivel',
+                openapi.IN_QUERY,
+                description="Se 'true', lista apenas livros disponíveis; se 'false', apenas emprestados",
+                type=openapi.TYPE_BOOLEAN
             )
         ],
         responses={200: LivroSerializer(many=True)}
     )
     def get(self, request):
-        q = request.query_params.get("q", "")
-
-        # Se houver busca, filtrar por título ou autor
-        if q:
-            livros = Livro.objects.filter(
-                titulo__icontains=q
-            ) | Livro.objects.filter(
-                autor__icontains=q
+        versao = get_catalog_version()
+        banco = banco_de_leitura()
+        chave = catalog_cache_key(request.query_params, versao, banco)
+        etag = get_etag(chave)
+
+        nao_modificado = get_conditional_response(request, etag=etag)
+        if nao_modificado is not None:
+            nao_modificado["ETag"] = etag
+            return nao_modificado
+
+        cache = get_cache()
+        dados = cache.get(chave)
+        if dados is None:
+            dados = self.montar_catalogo(request)
+            # O que veio de uma réplica expira com a janela de leitura do
+            # primário, limitando o atraso que um leitor pode ver.
+            timeout = get_timeout() if banco == DEFAULT_DB_ALIAS else min(get_timeout(), get_janela())
+            cache.set(chave, dados, timeout)
+
+        response = Response(dados)
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def montar_catalogo(self, request):
+        # Somente leitura: linhas de .values() viram dicts direto, com a
+        # mesma saída de LivroSerializer (ver livros.serializacao).
+        livros, paginator = catalogo_queryset(request.query_params)
+        linhas = livros_values(livros, paginator.ordering)
+
+        if paginator.is_requested(request):
+            pagina = paginator.paginate_queryset(linhas, request)
+            return paginator.get_paginated_data(livros_dicts(pagina))
+
+        return livros_dicts(linhas)
+
+
+class AlteracoesCatalogoView(APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Sincronização incremental do catálogo: livros criados ou alterados e livros removidos "
+            "depois da sequência `desde`, em ordem de sequência. Comece com desde=0 e repita com a "
+            "`sequencia` devolvida até `completo` ser verdadeiro."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'desde',
+                openapi.IN_QUERY,
+                description="Última sequência já sincronizada pelo cliente (0 para tudo)",
+                type=openapi.TYPE_INTEGER,
+                required=True
+            ),
+            openapi.Parameter(
+                'page_size',
+                openapi.IN_QUERY,
+                description="Máximo de alterações por resposta",
+                type=openapi.TYPE_INTEGER
             )
-        else:
-            livros = Livro.objects.all()
+        ],
+        responses={200: "livros, removidos, sequencia e completo", 400: "Parâmetros inválidos"}
+    )
+    def get(self, request):
+        try:
+            desde = int(request.query_params.get("desde", ""))
+        except ValueError:
+            return Response({"erro": "desde deve ser um inteiro."}, status=400)
+        if desde < 0:
+            return Response({"erro": "desde não pode ser negativo."}, status=400)
+        limite = KeysetPagination().get_page_size(request)
+
+        # As sequências são únicas entre livros e remoções: busca até
+        # `limite` + 1 de cada lado e junta pela ordem de sequência.
+        livros = list(livros_values(
+            Livro.objects.filter(sequencia__gt=desde).order_by("sequencia"), ["sequencia"]
+        )[:limite + 1])
+        removidos = list(
+            LivroRemovido.objects.filter(sequencia__gt=desde).order_by("sequencia")
+            .values("livro_id", "sequencia")[:limite + 1]
+        )
+        alteracoes = sorted(livros + removidos, key=lambda linha: linha["sequencia"])
+        completo = len(alteracoes) <= limite
+        alteracoes = alteracoes[:limite]
 
-        serializer = LivroSerializer(livros, many=True)
-        return Response(serializer.data)
+        return Response({
+            "livros": [
+                {**livro_dict(linha), "sequencia": linha["sequencia"]}
+                for linha in alteracoes if "livro_id" not in linha
+            ],
+            "removidos": [
+                {"id": linha["livro_id"], "sequencia": linha["sequencia"]}
+                for linha in alteracoes if "livro_id" in linha
+            ],
+            "sequencia": alteracoes[-1]["sequencia"] if alteracoes else desde,
+            "completo": completo
+        })
 
 
 class AlugarLivrosView(APIView):
@@ -47,38 +203,135 @@ class AlugarLivrosView(APIView):
     @swagger_auto_schema(
         operation_description="Aluga um livro específico.",
         request_body=AlugarLivroSerializer,
-        responses={201: EmprestimoSerializer(), 400: "Erro"}
+        responses={201: EmprestimoSerializer(), 404: "Livro não existe", 409: "Livro já está emprestado"}
     )
 
     def post(self, request, livro_id):
-        try:
+        with transaction.atomic():
+            # A sequência primeiro: é a primeira trava da transação (e, no
+            # SQLite, a escrita que pega o lock do banco).
+            sequencia = proximas_sequencias()[0]
+            # UPDATE condicional: só os pedidos que encontram cópia livre
+            # decrementam o contador, sem ler a linha antes.
+            alugado = Livro.objects.filter(id=livro_id, copias_disponiveis__gt=0).update(
+                copias_disponiveis=F("copias_disponiveis") - 1,
+                disponivel=Q(copias_disponiveis__gt=1),
+                sequencia=sequencia,
+            )
+            if not alugado:
+                # Sem aluguel, a sequência volta para o contador
+                existe = Livro.objects.filter(id=livro_id).exists()
+                transaction.set_rollback(True)
+                if not existe:
+                    return Response({"erro": "Livro não existe."}, status=404)
+                return Response({"erro": "Livro já está emprestado."}, status=409)
+
+            # Já com os valores novos; serve à resposta e ao evento do aluguel.
             livro = Livro.objects.get(id=livro_id)
-        except Livro.DoesNotExist:
-            return Response({"erro": "Livro não existe."}, status=404)
+            emprestimo = Emprestimo.objects.create(
+                livro=livro, copia_id=Copia.objects.reservar(livro_id), usuario_id=request.user.id
+            )
+            ResumoEmprestimos.objects.registrar(request.user.id, ativos=1, quando=emprestimo.data_emprestimo)
 
-        if not livro.disponivel:
-            return Response({"erro": "Livro já está emprestado."}, status=400)
-        
+        bump_catalog_version()
+        return Response(EmprestimoSerializer(emprestimo).data, status=201)
 
-        emprestimo = Emprestimo.objects.create(
-            livro = livro, 
-            usuario = request.user
-        )
 
-        livro.disponivel = False
-        livro.save()
-        
-        serializer = EmprestimoSerializer(emprestimo)
-        return Response(serializer.data, status=201)
-    
+def resposta_lote(ids, resultados, campo, sucesso):
+    # Resultados na ordem do pedido. O status geral é o de sucesso se todos
+    # os itens passaram, 207 se só parte deles e 409 se nenhum.
+    itens = [{campo: item_id, **resultados[item_id]} for item_id in ids]
+    processados = sum(item["status"] == sucesso for item in itens)
+    if processados == len(itens):
+        status = sucesso
+    else:
+        status = 207 if processados else 409
+    return Response({"resultados": itens, "processados": processados}, status=status)
+
+
+class AlugarLoteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Aluga vários livros de uma vez, numa única transação. "
+                              "Cada item do resultado traz o próprio status e o empréstimo ou o erro.",
+        request_body=AlugarLoteSerializer,
+        responses={
+            201: "Todos os livros alugados",
+            207: "Parte dos livros alugada (modo melhor_esforco)",
+            400: "Lote inválido",
+            409: "Nenhum livro alugado"
+        }
+    )
+    def post(self, request):
+        serializer = AlugarLoteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        livro_ids = serializer.validated_data["livros"]
+
+        try:
+            resultados = lotes.alugar(request.user.id, livro_ids, serializer.validated_data["modo"])
+        except lotes.LoteConcorrente:
+            return Response({"erro": "O catálogo mudou durante o lote; tente novamente."}, status=409)
+        return resposta_lote(livro_ids, resultados, "livro_id", 201)
+
+
+class ListaEmprestimos(LeituraEmReplicaMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    @swagger_auto_schema(
+        operation_description="Lista os empréstimos do usuário autenticado.",
+        manual_parameters=[
+            openapi.Parameter(
+                'status',
+                openapi.IN_QUERY,
+                description="'pendente' (não devolvidos) ou 'devolvido'",
+                type=openapi.TYPE_STRING,
+                enum=["pendente", "devolvido"]
+            ),
+            openapi.Parameter(
+                'page_size',
+                openapi.IN_QUERY,
+                description="Ativa a paginação por cursor com o tamanho de página informado",
+                type=openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'cursor',
+                openapi.IN_QUERY,
+                description="Cursor opaco retornado em 'next' ou 'previous'",
+                type=openapi.TYPE_STRING
+            )
+        ],
+        responses={200: EmprestimoSerializer(many=True), 400: "Status inválido"}
+    )
+    def get(self, request):
+        emprestimos = emprestimos_queryset(request.user.id, request.query_params.get("status"))
+        linhas = emprestimos_values(emprestimos)
+
+        paginator = KeysetPagination()
+        if paginator.is_requested(request):
+            pagina = paginator.paginate_queryset(linhas, request)
+            return Response(paginator.get_paginated_data(emprestimos_dicts(pagina)))
+
+        return Response(emprestimos_dicts(linhas.order_by("id")))
 
-class ListaEmprestimos(APIView):
+
+class ResumoEmprestimosView(LeituraEmReplicaMixin, APIView):
     permission_classes = [IsAuthenticated]
 
+    @swagger_auto_schema(
+        operation_description="Resumo dos empréstimos do usuário autenticado: ativos, devolvidos, "
+                              "atrasados e data da última atividade.",
+        responses={200: ResumoEmprestimosSerializer()}
+    )
     def get(self, request):
-        emprestimos = Emprestimo.objects.filter(usuario=request.user)
-        serializer = EmprestimoSerializer(emprestimos, many=True)
-        return Response(serializer.data) 
+        # Os contadores vêm prontos do resumo (uma busca por chave); os
+        # atrasados são os marcados pela última rodada de marcar_atrasados.
+        resumo = ResumoEmprestimos.objects.filter(usuario_id=request.user.id).first()
+        if resumo is None:
+            resumo = ResumoEmprestimos(usuario_id=request.user.id)
+        return Response(ResumoEmprestimosSerializer(resumo).data)
 
 
 class DevolverLivro(APIView):
@@ -87,28 +340,117 @@ class DevolverLivro(APIView):
     @swagger_auto_schema(
         operation_description="Devolve um livro previamente alugado.",
         request_body=DevolverLivroSerializer,
-        responses={200: "Livro devolvido com sucesso.", 400: "Erro"}
+        responses={200: "Livro devolvido com sucesso (e entregue ao próximo da fila, se houver).", 400: "Erro"}
     )
 
     def post(self, request, emprestimo_id):
+        # Mesmo caminho da devolução em lote, com um item só; havendo fila
+        # de reservas, a cópia passa direto para o primeiro.
         try:
-            emprestimo = Emprestimo.objects.get(id=emprestimo_id, usuario=request.user)
-        except Emprestimo.DoesNotExist:
-            return Response({"erro": "Empréstimo não encontrado."}, status=404)
-        
-        if emprestimo.data_devolucao:
+            resultado = lotes.devolver(request.user.id, [emprestimo_id])[emprestimo_id]
+        except lotes.LoteConcorrente:
             return Response({"erro": "Livro já foi devolvido."}, status=400)
-        
-        emprestimo.data_devolucao = timezone.now()
-        emprestimo.save()
-
-        emprestimo.livro.disponivel = True
-        emprestimo.livro.save()
 
+        if resultado["status"] != 200:
+            return Response({"erro": resultado["erro"]}, status=resultado["status"])
         return Response({
             "mensagem": "Livro devolvido com sucesso.",
-                "data_devolucao": emprestimo.data_devolucao
-                }, status=200)
+            "data_devolucao": resultado["data_devolucao"],
+            "entregue_a_reserva": resultado["entregue_a_reserva"]
+        }, status=200)
+
+
+class DevolverLoteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Devolve vários empréstimos de uma vez, numa única transação. "
+                              "Cópias de livros com fila de reservas vão direto para o primeiro da fila.",
+        request_body=DevolverLoteSerializer,
+        responses={
+            200: "Todos os empréstimos devolvidos",
+            207: "Parte dos empréstimos devolvida (modo melhor_esforco)",
+            400: "Lote inválido",
+            409: "Nenhum empréstimo devolvido"
+        }
+    )
+    def post(self, request):
+        serializer = DevolverLoteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        emprestimo_ids = serializer.validated_data["emprestimos"]
+
+        try:
+            resultados = lotes.devolver(request.user.id, emprestimo_ids, serializer.validated_data["modo"])
+        except lotes.LoteConcorrente:
+            return Response({"erro": "Os empréstimos mudaram durante o lote; tente novamente."}, status=409)
+        return resposta_lote(emprestimo_ids, resultados, "emprestimo_id", 200)
+
+
+class ReservaView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def resposta(self, reserva, status=200):
+        reserva.posicao = reserva.posicao()
+        return Response(ReservaSerializer(reserva).data, status=status)
+
+    @swagger_auto_schema(
+        operation_description="Mostra a posição do usuário autenticado na fila de reservas do livro.",
+        responses={200: ReservaSerializer(), 404: "Usuário não está na fila"}
+    )
+    def get(self, request, livro_id):
+        reserva = Reserva.objects.filter(livro_id=livro_id, usuario_id=request.user.id).first()
+        if reserva is None:
+            return Response({"erro": "Você não está na fila deste livro."}, status=404)
+        return self.resposta(reserva)
+
+    @swagger_auto_schema(
+        operation_description="Entra na fila de reservas de um livro sem cópias disponíveis. "
+                              "Na devolução, o livro é emprestado automaticamente ao primeiro da fila.",
+        responses={
+            201: ReservaSerializer(),
+            404: "Livro não existe",
+            409: "Livro disponível, já emprestado ao usuário ou usuário já na fila"
+        }
+    )
+    def post(self, request, livro_id):
+        # O INSERT vem primeiro, para que a transação comece escrevendo (no
+        # SQLite, uma leitura não pode ser promovida a escrita com outro
+        # escritor ativo). A conferência vem depois, com o livro travado: a
+        # devolução trava o livro antes de ler a fila, então nenhuma cópia
+        # é liberada entre as duas e ninguém fica na fila de um livro
+        # disponível. Se a conferência recusar, o INSERT é desfeito.
+        try:
+            with transaction.atomic():
+                reserva = Reserva.objects.create(livro_id=livro_id, usuario_id=request.user.id)
+                erro = self.conferir(livro_id, request.user.id)
+                if erro is not None:
+                    transaction.set_rollback(True)
+                    return erro
+        except IntegrityError:
+            return Response({"erro": "Você já está na fila deste livro."}, status=409)
+
+        return self.resposta(reserva, status=201)
+
+    def conferir(self, livro_id, usuario_id):
+        livro = Livro.objects.select_for_update().filter(id=livro_id).values("copias_disponiveis").first()
+        if livro is None:
+            return Response({"erro": "Livro não existe."}, status=404)
+        if livro["copias_disponiveis"] > 0:
+            return Response({"erro": "Livro disponível; alugue-o diretamente."}, status=409)
+        if Emprestimo.objects.filter(livro_id=livro_id, usuario_id=usuario_id, data_devolucao__isnull=True).exists():
+            return Response({"erro": "Você já está com este livro."}, status=409)
+        return None
+
+    @swagger_auto_schema(
+        operation_description="Sai da fila de reservas do livro.",
+        responses={200: "Saiu da fila.", 404: "Usuário não está na fila"}
+    )
+    def delete(self, request, livro_id):
+        removidas, _ = Reserva.objects.filter(livro_id=livro_id, usuario_id=request.user.id).delete()
+        if not removidas:
+            return Response({"erro": "Você não está na fila deste livro."}, status=404)
+        return Response({"mensagem": "Você saiu da fila."}, status=200)
 
 
 class DeletarLivroView(APIView):
@@ -132,13 +474,17 @@ class DeletarLivroView(APIView):
         except Livro.DoesNotExist:
             return Response({"detail": "Livro não encontrado."}, status=404)
         
-        emprestimo_ativo = Emprestimo.objects.filter(livro=livro, data_devolucao__isnull=True).first()
-
-        if emprestimo_ativo:
-            emprestimo_ativo.data_devolucao = timezone.now()
-            emprestimo_ativo.save()
-        
-        livro.delete()
+        # O histórico do livro sai junto (CASCADE): os empréstimos são
+        # contados antes e descontados do resumo de cada usuário depois da
+        # remoção. O contador das sequências é travado primeiro, como em
+        # todas as escritas do catálogo (ver proximas_sequencias).
+        with transaction.atomic():
+            travar_sequencias()
+            descontos = ResumoEmprestimos.objects.descontos(Emprestimo.objects.filter(livro=livro))
+            Emprestimo.objects.filter(livro=livro, data_devolucao__isnull=True).update(data_devolucao=timezone.now())
+
+            livro.delete()
+            ResumoEmprestimos.objects.aplicar(descontos)
 
         return Response({"detail": "Livro excluído com sucesso."}, status=200)
 
@@ -209,4 +555,114 @@ class AtualizaLivroView(APIView):
         
         return Response(serializer.errors, status=400)
 
-    
\ No newline at end of file
+
+class ImportarLivrosView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    @swagger_auto_schema(
+        operation_description="Importa livros em massa a partir de um arquivo CSV ou JSONL. Apenas bibliotecários podem importar.",
+        manual_parameters=[
+            openapi.Parameter(
+                'arquivo',
+                openapi.IN_FORM,
+                description="Arquivo .csv (com cabeçalho titulo,autor,ano,disponivel e, opcionalmente, copias_disponiveis) ou .jsonl",
+                type=openapi.TYPE_FILE,
+                required=True
+            ),
+            openapi.Parameter(
+                'formato',
+                openapi.IN_FORM,
+                description="'csv' ou 'jsonl'; se omitido, é deduzido pela extensão do arquivo",
+                type=openapi.TYPE_STRING
+            )
+        ],
+        responses={
+            200: "Resumo da importação (importados, total_erros, erros)",
+            400: "Arquivo ausente ou formato desconhecido",
+            403: "Permissão negada"
+        }
+    )
+
+    def post(self, request):
+        if not request.user.is_superuser:
+            return Response({"detail": "Apenas bibliotecários podem importar livros."}, status=403)
+
+        arquivo = request.FILES.get("arquivo")
+        if arquivo is None:
+            return Response({"erro": "Envie o arquivo no campo 'arquivo'."}, status=400)
+
+        formato = request.data.get("formato") or detectar_formato(arquivo.name)
+        if formato not in FORMATOS:
+            return Response({"erro": "Formato deve ser 'csv' ou 'jsonl'."}, status=400)
+
+        resultado = importar_livros(arquivo, formato)
+        return Response(resultado, status=200)
+
+
+class ExportacaoView(APIView):
+    """
+    Base das exportações: as linhas são lidas com QuerySet.iterator() e
+    enviadas em blocos por um StreamingHttpResponse, então a memória não
+    cresce com o tamanho da tabela e o primeiro byte sai logo.
+    """
+
+    permission_classes = [IsAuthenticated]
+    queryset = Livro.objects.none()
+    campos = ()
+    nome_arquivo = ""
+
+    def get_queryset(self):
+        return self.queryset.all()
+
+    def get(self, request):
+        if not request.user.is_superuser:
+            return Response({"detail": "Apenas bibliotecários podem exportar dados."}, status=403)
+
+        formato = request.query_params.get("formato", "ndjson")
+        if formato not in EXPORT_FORMATOS:
+            return Response({"erro": "Formato deve ser 'ndjson' ou 'csv'."}, status=400)
+
+        response = StreamingHttpResponse(
+            GERADORES[formato](self.get_queryset(), self.campos),
+            content_type=EXPORT_FORMATOS[formato]
+        )
+        response["Content-Disposition"] = f'attachment; filename="{self.nome_arquivo}.{formato}"'
+        return response
+
+
+PARAMETRO_FORMATO_EXPORTACAO = openapi.Parameter(
+    'formato',
+    openapi.IN_QUERY,
+    description="'ndjson' (padrão) ou 'csv'",
+    type=openapi.TYPE_STRING,
+    enum=["ndjson", "csv"]
+)
+
+
+class ExportarLivrosView(ExportacaoView):
+    queryset = Livro.objects.all()
+    campos = CAMPOS_LIVRO
+    nome_arquivo = "livros"
+
+    @swagger_auto_schema(
+        operation_description="Exporta todo o acervo em NDJSON ou CSV (streaming). Apenas bibliotecários.",
+        manual_parameters=[PARAMETRO_FORMATO_EXPORTACAO],
+        responses={200: "Arquivo com um livro por linha", 400: "Formato inválido", 403: "Permissão negada"}
+    )
+    def get(self, request):
+        return super().get(request)
+
+
+class ExportarEmprestimosView(ExportacaoView):
+    queryset = Emprestimo.objects.all()
+    campos = CAMPOS_EMPRESTIMO
+    nome_arquivo = "emprestimos"
+
+    @swagger_auto_schema(
+        operation_description="Exporta o histórico de empréstimos em NDJSON ou CSV (streaming). Apenas bibliotecários.",
+        manual_parameters=[PARAMETRO_FORMATO_EXPORTACAO],
+        responses={200: "Arquivo com um empréstimo por linha", 400: "Formato inválido", 403: "Permissão negada"}
+    )
+    def get(self, request):
+        return super().get(request)